@@ -35,10 +35,10 @@ class ProductAdmin(admin.ModelAdmin):
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
     extra = 0
-    readonly_fields = ('package', 'quantity')
+    readonly_fields = ('package', 'quantity', 'unit_price')
 
 class OrderAdmin(admin.ModelAdmin):
-    list_display = ('code', 'user', 'total_amount', 'status', 'created_at')
+    list_display = ('code', 'user', 'total_amount', 'status', 'created_at', 'coverage_end')
     list_filter = ('status', 'created_at')
     search_fields = ('code', 'user__username')
     inlines = [OrderItemInline]
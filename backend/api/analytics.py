@@ -0,0 +1,142 @@
+from django.db import transaction
+from django.db.models import DecimalField, F, Sum
+from django.db.models.functions import TruncDate, TruncMonth, TruncWeek
+
+from .models import DailySalesBucket, Order, OrderItem
+
+# Giá chốt lúc đặt (OrderItem.unit_price): trừ đi đúng bằng số đã cộng khi đơn đổi trạng thái
+ITEM_REVENUE = Sum(F('unit_price') * F('quantity'), output_field=DecimalField(max_digits=20, decimal_places=0))
+
+PERIODS = {
+    'day': F('date'),
+    'week': TruncWeek('date'),
+    'month': TruncMonth('date'),
+}
+
+GROUP_FIELDS = {
+    'category': ['category_id', 'category__name'],
+    'target_audience': ['target_audience'],
+}
+
+GROUP_KEY = ['package__product__category_id', 'package__product__target_audience']
+
+
+def order_groups(items, with_status=False):
+    """1 dòng / (đơn, danh mục, đối tượng): ngày đặt, số item, doanh thu"""
+    fields = ['order_id', 'date', *GROUP_KEY] + (['order__status'] if with_status else [])
+    return (
+        items.annotate(date=TruncDate('order__created_at'))
+        .values(*fields)
+        .annotate(items=Sum('quantity'), revenue=ITEM_REVENUE)
+        .order_by('order_id', *GROUP_KEY)
+    )
+
+
+def bucket_deltas(rows, status=None):
+    """
+    Gom dòng của order_groups theo bucket -> {(date, category_id, target_audience, status): [orders, primary, items, revenue]}.
+    Dòng đầu tiên của mỗi đơn (category_id, target_audience nhỏ nhất) nhận primary_order_count.
+    """
+    deltas, last_order = {}, None
+    for row in rows:
+        key = (row['date'], row['package__product__category_id'], row['package__product__target_audience'],
+               status or row['order__status'])
+        delta = deltas.setdefault(key, [0, 0, 0, 0])
+        delta[0] += 1
+        if row['order_id'] != last_order:
+            delta[1] += 1
+            last_order = row['order_id']
+        delta[2] += row['items']
+        delta[3] += row['revenue'] or 0
+    return deltas
+
+
+def bucket_key(key):
+    return dict(zip(['date', 'category_id', 'target_audience', 'status'], key))
+
+
+def apply_bucket_delta(key, orders, primary_orders, items, revenue):
+    updated = DailySalesBucket.objects.filter(**key).update(
+        order_count=F('order_count') + orders,
+        primary_order_count=F('primary_order_count') + primary_orders,
+        item_count=F('item_count') + items,
+        revenue=F('revenue') + revenue,
+    )
+    if not updated:
+        DailySalesBucket.objects.get_or_create(**key)
+        apply_bucket_delta(key, orders, primary_orders, items, revenue)
+
+
+def record_order_sales(order_id, status, sign=1):
+    """Cộng (sign=1) / trừ (sign=-1) các item của 1 đơn vào bucket của `status` (1 query gom nhóm)"""
+    for key, delta in bucket_deltas(order_groups(OrderItem.objects.filter(order_id=order_id)), status).items():
+        apply_bucket_delta(bucket_key(key), *(sign * value for value in delta))
+
+
+def record_sales_status_changed(order, previous_status):
+    if previous_status == order.status:
+        return
+    record_order_sales(order.pk, previous_status, sign=-1)
+    record_order_sales(order.pk, order.status)
+
+
+def record_sales_deleted(order):
+    # Gọi ở pre_delete: item chưa bị cascade xóa
+    status = getattr(order, '_loaded_metrics', (order.status, None))[0]
+    record_order_sales(order.pk, status, sign=-1)
+
+
+def item_orders(item, saving=True):
+    """(id, trạng thái) các đơn có bucket đổi khi lưu / xóa item (cả đơn cũ nếu item bị chuyển đơn)"""
+    order_ids = {item.order_id}
+    if saving and not item._state.adding:
+        order_ids.update(OrderItem.objects.filter(pk=item.pk).values_list('order_id', flat=True))
+    return list(Order.objects.filter(pk__in=order_ids).values_list('pk', 'status'))
+
+
+def record_item_changes(orders, sign):
+    """
+    Thêm / sửa / xóa OrderItem làm đổi cả số item, doanh thu lẫn số đơn của từng nhóm (danh mục, đối tượng)
+    -> trừ phần của đơn trước khi ghi (sign=-1), cộng lại phần tính từ item mới sau khi ghi (sign=1).
+    """
+    for order_id, status in orders:
+        record_order_sales(order_id, status, sign)
+
+
+def move_sales_status(order_ids, source, target):
+    """Chuyển bucket của nhiều đơn từ `source` sang `target` (cho UPDATE hàng loạt, không qua signal)"""
+    deltas = bucket_deltas(order_groups(OrderItem.objects.filter(order_id__in=order_ids)), source)
+    for key, delta in deltas.items():
+        apply_bucket_delta(bucket_key(key), *(-value for value in delta))
+        apply_bucket_delta(bucket_key(key[:3] + (target,)), *delta)
+
+
+def rebuild_sales_buckets(batch_size=2000):
+    """Tính lại toàn bộ bucket từ lịch sử OrderItem"""
+    rows = order_groups(OrderItem.objects.all(), with_status=True).iterator(chunk_size=batch_size)
+    with transaction.atomic():
+        DailySalesBucket.objects.all().delete()
+        buckets = [
+            DailySalesBucket(
+                **bucket_key(key), order_count=orders, primary_order_count=primary_orders, item_count=items, revenue=revenue,
+            )
+            for key, (orders, primary_orders, items, revenue) in bucket_deltas(rows).items()
+        ]
+        DailySalesBucket.objects.bulk_create(buckets, batch_size=batch_size)
+    return len(buckets)
+
+
+def sales_series(start, end, granularity='day', group_by=None, statuses=None):
+    """Doanh thu / số đơn theo kỳ trong [start, end], chỉ đọc bảng bucket (index theo date)"""
+    queryset = DailySalesBucket.objects.filter(date__range=(start, end))
+    if statuses:
+        queryset = queryset.filter(status__in=statuses)
+    fields = ['period'] + GROUP_FIELDS.get(group_by, [])
+    # Không theo nhóm: đơn có nhiều danh mục chỉ đếm 1 lần
+    orders = Sum('order_count') if group_by in GROUP_FIELDS else Sum('primary_order_count')
+    return list(
+        queryset.annotate(period=PERIODS[granularity])
+        .values(*fields)
+        .annotate(revenue=Sum('revenue'), order_count=orders, item_count=Sum('item_count'))
+        .order_by(*fields)
+    )
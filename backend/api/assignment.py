@@ -0,0 +1,134 @@
+"""
+Tự động giao tư vấn cho staff đúng chuyên môn, ít việc nhất (hòa thì xoay vòng).
+
+StaffLoadIndex giữ số tư vấn đang mở của từng staff trong bộ nhớ process:
+- nạp 1 lần bằng 2 query gom nhóm, nạp lại sau STAFF_LOAD_INDEX_TTL giây (sửa lệch giữa các worker);
+- giao việc / đóng / đổi người chỉ cộng trừ trong bộ nhớ (qua signal), không COUNT bảng tư vấn.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Count
+
+from .models import ConsultationRequest, User
+
+CLOSED_STATUSES = ('closed', 'resolved', 'cancelled')
+
+
+def is_open(status):
+    return status not in CLOSED_STATUSES
+
+
+class StaffLoadIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.invalidate()
+
+    def invalidate(self):
+        with self._lock:
+            self._loads = None        # {specialization: {staff_id: số tư vấn đang mở}}
+            self._specialization = {}  # {staff_id: specialization}
+            self._last_picked = {}     # {specialization: staff_id giao gần nhất} -> xoay vòng
+            self._loaded_at = 0
+
+    def _ensure_loaded(self):
+        ttl = getattr(settings, 'STAFF_LOAD_INDEX_TTL', 60)
+        if self._loads is not None and time.monotonic() - self._loaded_at < ttl:
+            return
+        staff = User.objects.filter(role='staff', is_active=True, specialization__isnull=False)
+        loads, specialization = {}, {}
+        for staff_id, code in staff.values_list('id', 'specialization'):
+            loads.setdefault(code, {})[staff_id] = 0
+            specialization[staff_id] = code
+        open_counts = (
+            ConsultationRequest.objects.filter(assigned_staff__in=staff)
+            .exclude(status__in=CLOSED_STATUSES)
+            .values_list('assigned_staff').annotate(total=Count('id')).order_by()
+        )
+        for staff_id, total in open_counts:
+            loads[specialization[staff_id]][staff_id] = total
+        self._loads, self._specialization, self._loaded_at = loads, specialization, time.monotonic()
+
+    def pick(self, specialization):
+        """Chọn staff ít tư vấn mở nhất của chuyên môn và tính luôn việc mới cho người đó"""
+        with self._lock:
+            self._ensure_loaded()
+            candidates = self._loads.get(specialization)
+            if not candidates:
+                return None
+            lowest = min(candidates.values())
+            tied = sorted(staff_id for staff_id, load in candidates.items() if load == lowest)
+            last = self._last_picked.get(specialization)
+            chosen = next((staff_id for staff_id in tied if last is None or staff_id > last), tied[0])
+            candidates[chosen] += 1
+            self._last_picked[specialization] = chosen
+            return chosen
+
+    def adjust(self, staff_id, delta):
+        with self._lock:
+            if self._loads is None or staff_id not in self._specialization:
+                return
+            candidates = self._loads[self._specialization[staff_id]]
+            candidates[staff_id] = max(0, candidates[staff_id] + delta)
+
+    def tracks(self, staff_id):
+        with self._lock:
+            return staff_id in self._specialization
+
+    def snapshot(self):
+        with self._lock:
+            self._ensure_loaded()
+            return {code: dict(candidates) for code, candidates in self._loads.items()}
+
+
+staff_load_index = StaffLoadIndex()
+
+
+def assign_on_create(consultation):
+    """Tư vấn mới chưa có staff -> giao cho staff đúng chuyên môn đang ít tư vấn mở nhất (gọi từ pre_save)"""
+    if consultation.assigned_staff_id or consultation.product_id is None or not is_open(consultation.status):
+        return
+    staff_id = staff_load_index.pick(consultation.product.category.specialization_code)
+    if staff_id is not None:
+        consultation.assigned_staff_id = staff_id
+        consultation._load_counted = True
+
+
+def _open_assignment(staff_id, status):
+    return staff_id if staff_id and is_open(status) else None
+
+
+def record_consultation_saved(consultation, created):
+    """Cập nhật tải khi tư vấn được tạo / đổi người / đóng (gọi từ post_save)"""
+    current = (consultation.assigned_staff_id, consultation.status)
+    if created:
+        # pick() đã tính việc này rồi
+        previous = current if getattr(consultation, '_load_counted', False) else (None, None)
+    else:
+        previous = getattr(consultation, '_loaded_assignment', current)
+
+    before, after = _open_assignment(*previous), _open_assignment(*current)
+    if before != after:
+        if before:
+            staff_load_index.adjust(before, -1)
+        if after:
+            staff_load_index.adjust(after, 1)
+    consultation._loaded_assignment = current
+    consultation._load_counted = False
+
+
+def record_consultation_deleted(consultation):
+    previous = getattr(consultation, '_loaded_assignment', (consultation.assigned_staff_id, consultation.status))
+    staff_id = _open_assignment(*previous)
+    if staff_id:
+        staff_load_index.adjust(staff_id, -1)
+
+
+def record_staff_changed(user, update_fields=None):
+    """Staff thêm / xóa / đổi chuyên môn, vai trò, trạng thái -> nạp lại index (bỏ qua lưu last_login)"""
+    if user.role != 'staff' and not staff_load_index.tracks(user.pk):
+        return
+    if update_fields is not None and not {'role', 'specialization', 'is_active'} & set(update_fields):
+        return
+    staff_load_index.invalidate()
@@ -0,0 +1,197 @@
+"""
+Xác thực JWT không cần query User ở mỗi request.
+
+- Token (access + refresh) mang sẵn claim role / specialization / user_type
+  -> frontend và các service khác đọc quyền ngay từ token.
+- CachedJWTAuthentication tìm User theo 2 tầng cache:
+  L1 trong process (AUTH_USER_CACHE_TTL giây, vài giây) -> L2 cache dùng chung giữa các worker
+  (AUTH_USER_CACHE_ALIAS, AUTH_USER_SHARED_CACHE_TTL giây) -> DB. Lưu / xóa User thì xóa ngay cả 2 tầng;
+  L1 ở process khác tự hết hạn sau vài giây (User bị khóa ở worker khác bị chặn chậm nhất chừng đó).
+- Token đã thu hồi (refresh đã xoay vòng, đăng xuất) bị chặn qua kho api/tokens.py.
+"""
+import copy
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import update_last_login
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenObtainSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .tokens import is_revoked, revoke_token
+
+CLAIM_FIELDS = ('role', 'specialization', 'user_type')
+
+
+def set_claims(token, user):
+    for field in CLAIM_FIELDS:
+        token[field] = getattr(user, field)
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        set_claims(token, user)
+        return token
+
+    @classmethod
+    def token_data(cls, user):
+        refresh = cls.get_token(user)
+        if api_settings.UPDATE_LAST_LOGIN:
+            update_last_login(None, user)
+        return {
+            'refresh': str(refresh),
+            'access': str(refresh.access_token),
+            # Giữ các trường CustomLoginView (DRF Token) cũ trả về cho frontend
+            'user_id': user.pk,
+            'role': user.role,
+            'email': user.email,
+        }
+
+    def validate(self, attrs):
+        # /api/login/ không đi qua đây (LoginView xác thực async qua PooledModelBackend, xem api/passwords.py)
+        TokenObtainSerializer.validate(self, attrs)
+        return self.token_data(self.user)
+
+
+# --- CACHE USER ---
+class LocalTTLCache:
+    """Dict có hạn dùng + giới hạn số phần tử (bỏ phần tử cũ nhất khi đầy)"""
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._data[key]
+                return None
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data.pop(key, None)
+            if len(self._data) >= self.maxsize:
+                del self._data[next(iter(self._data))]
+            self._data[key] = (time.monotonic() + ttl, value)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+local_user_cache = LocalTTLCache()
+
+
+def shared_cache():
+    return caches[getattr(settings, 'AUTH_USER_CACHE_ALIAS', 'auth')]
+
+
+def user_cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def get_cached_user(user_id):
+    key = user_cache_key(user_id)
+    user = local_user_cache.get(key)
+    if user is None:
+        user = shared_cache().get(key)
+        if user is not None:
+            local_user_cache.set(key, user, getattr(settings, 'AUTH_USER_CACHE_TTL', 5))
+    # Bản sao: view có thể sửa request.user, không được sửa object dùng chung giữa các request
+    return copy.copy(user) if user is not None else None
+
+
+def cache_user(user):
+    key = user_cache_key(user.pk)
+    shared_cache().set(key, user, getattr(settings, 'AUTH_USER_SHARED_CACHE_TTL', 60))
+    local_user_cache.set(key, copy.copy(user), getattr(settings, 'AUTH_USER_CACHE_TTL', 5))
+
+
+def invalidate_cached_user(user_id):
+    key = user_cache_key(user_id)
+    local_user_cache.delete(key)
+    shared_cache().delete(key)
+
+
+def load_user(user_id):
+    user = get_cached_user(user_id)
+    if user is None:
+        user = get_user_model().objects.filter(**{api_settings.USER_ID_FIELD: user_id}).first()
+        if user is not None:
+            cache_user(user)
+    return user
+
+
+class RotatingTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Refresh token dùng 1 lần: xoay vòng thì thu hồi token cũ (thay cho app token_blacklist).
+    Claim role / specialization / user_type lấy lại theo User hiện tại.
+    """
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        if is_revoked(refresh):
+            raise InvalidToken(_('Token is blacklisted'))
+
+        user = load_user(refresh.payload.get(api_settings.USER_ID_CLAIM))
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+        set_claims(refresh, user)
+
+        data = {'access': str(refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            # 2 request cùng refresh 1 token: INSERT jti unique -> chỉ 1 request thắng
+            if api_settings.BLACKLIST_AFTER_ROTATION and not revoke_token(refresh):
+                raise InvalidToken(_('Token is blacklisted'))
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data['refresh'] = str(refresh)
+        return data
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+        # Access token của phiên đã đăng xuất; thường trúng cache, không query
+        if is_revoked(token):
+            raise InvalidToken(_('Token is blacklisted'))
+        return token
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_('Token contained no recognizable user identification')) from e
+
+        user = get_cached_user(user_id)
+        if user is None:
+            # Lần đầu / cache hết hạn: JWTAuthentication query DB và tự kiểm tra is_active, revoke
+            user = super().get_user(validated_token)
+            cache_user(user)
+            return user
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+        return user
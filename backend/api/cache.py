@@ -0,0 +1,92 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+CATALOG_VERSION_KEY = 'catalog:version'
+
+
+def catalog_cache():
+    return caches[getattr(settings, 'CATALOG_CACHE_ALIAS', 'default')]
+
+
+def catalog_timeout():
+    return getattr(settings, 'CATALOG_CACHE_TIMEOUT', 60 * 60)
+
+
+def get_catalog_version():
+    """Trả về (version, thời điểm thay đổi) của catalog, khởi tạo nếu cache bị mất"""
+    current = catalog_cache().get(CATALOG_VERSION_KEY)
+    if current is None:
+        current = bump_catalog_version()
+    return current
+
+
+def bump_catalog_version():
+    """Đổi version -> toàn bộ payload cũ không còn được đọc tới (tự hết hạn theo TTL)"""
+    now = time.time()
+    current = ('%x' % time.time_ns(), now)
+    catalog_cache().set(CATALOG_VERSION_KEY, current, None)
+    return current
+
+
+def is_admin_request(request):
+    user = request.user
+    return user.is_authenticated and getattr(user, 'role', None) in ['admin', 'super_admin']
+
+
+class CatalogCacheMixin:
+    """
+    Read-through cache cho các API đọc public của catalog.
+    Payload đã serialize được lưu theo (version, admin/public, URL đầy đủ gồm scheme + host,
+    vì URL ảnh / srcset trong payload là URL tuyệt đối);
+    response có ETag/Last-Modified để client gửi conditional GET.
+    """
+    catalog_cache_actions = ['list', 'retrieve']
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, lambda: super(CatalogCacheMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, lambda: super(CatalogCacheMixin, self).retrieve(request, *args, **kwargs))
+
+    def cached_response(self, request, build):
+        if self.action not in self.catalog_cache_actions:
+            return build()
+
+        version, modified = get_catalog_version()
+        # Admin thấy provider_name -> cache riêng với khách
+        variant = 'admin' if is_admin_request(request) else 'public'
+        etag = quote_etag(f'{version}-{variant}')
+
+        if self.is_not_modified(request, etag, modified):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            key = f'catalog:{version}:{variant}:{request.build_absolute_uri()}'
+            cache = catalog_cache()
+            data = cache.get(key)
+            if data is None:
+                response = build()
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                cache.set(key, response.data, catalog_timeout())
+            else:
+                response = Response(data)
+
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(modified)
+        response['Cache-Control'] = 'private, no-cache' if variant == 'admin' else 'public, no-cache'
+        response['Vary'] = 'Authorization'
+        return response
+
+    @staticmethod
+    def is_not_modified(request, etag, modified):
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match:
+            etags = parse_etags(if_none_match)
+            return '*' in etags or etag in etags
+        if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+        return if_modified_since is not None and int(modified) <= if_modified_since
@@ -0,0 +1,247 @@
+"""
+Chat tư vấn real-time qua WebSocket (ASGI thuần, không cần Channels).
+
+    ws://<host>/ws/consultations/<id>/?token=<JWT access token>
+    client -> {"message": "..."}
+    server -> {"type": "message", "id": ..., "consultation": ..., "sender": ..., "sender_name": ..., "message": ..., "timestamp": ...}
+
+Mỗi ConsultationRequest là 1 phòng. Tin nhắn được gom lại và lưu bằng bulk_create
+(tối đa CHAT_BATCH_SIZE tin hoặc sau CHAT_FLUSH_INTERVAL giây), sau đó mới phát tới
+mọi kết nối trong phòng (khách, staff được giao, admin) -> client nhận tin đã có id.
+Channel layer mặc định là in-memory (1 process); nhiều process cần layer dùng chung
+có cùng interface (subscribe / unsubscribe / publish), cấu hình qua CHAT_CHANNEL_LAYER.
+"""
+import asyncio
+import json
+import re
+import threading
+import weakref
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.utils.module_loading import import_string
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from .authentication import CachedJWTAuthentication
+from .models import ChatMessage, ConsultationRequest
+from .permissions import is_consultation_participant
+
+ROOM_PATH = re.compile(r'^/ws/consultations/(?P<pk>\d+)/?$')
+
+CLOSE_UNAUTHORIZED = 4401
+CLOSE_FORBIDDEN = 4403
+CLOSE_NOT_FOUND = 4404
+
+
+def max_message_length():
+    return getattr(settings, 'CHAT_MAX_MESSAGE_LENGTH', 4000)
+
+
+# --- KẾT NỐI DB ---
+def close_old_connections():
+    """Như django.db.close_old_connections nhưng bỏ qua kết nối đang trong transaction (atomic bên ngoài, TestCase)"""
+    for conn in connections.all(initialized_only=True):
+        if not conn.in_atomic_block:
+            conn.close_if_unusable_or_obsolete()
+
+
+def database_sync_to_async(func):
+    """
+    Như channels.db.database_sync_to_async: WebSocket sống lâu không có request_started / request_finished
+    -> tự đóng kết nối hỏng / quá CONN_MAX_AGE trước và sau mỗi lần chạm DB, không giữ kết nối chết mãi.
+    """
+    def run(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return sync_to_async(run)
+
+
+# --- CHANNEL LAYER ---
+class InMemoryChannelLayer:
+    """Pub/sub trong process: mỗi kết nối là 1 asyncio.Queue trong phòng của nó"""
+
+    def __init__(self):
+        self.rooms = {}
+
+    def subscribe(self, room):
+        queue = asyncio.Queue()
+        self.rooms.setdefault(room, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, room, queue):
+        members = self.rooms.get(room)
+        if members is not None:
+            members.discard(queue)
+            if not members:
+                del self.rooms[room]
+
+    async def publish(self, room, payload):
+        for queue in list(self.rooms.get(room, ())):
+            queue.put_nowait(payload)
+
+
+# --- THÔNG BÁO CHO LONG-POLL ---
+class MessageNotifier:
+    """Đánh số phiên bản theo phòng: request long-poll (thread) chờ tới khi số này đổi"""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._versions = {}
+
+    def version(self, room):
+        with self._condition:
+            return self._versions.get(room, 0)
+
+    def notify(self, room):
+        with self._condition:
+            self._versions[room] = self._versions.get(room, 0) + 1
+            self._condition.notify_all()
+
+    def wait(self, room, seen_version, timeout):
+        with self._condition:
+            return self._condition.wait_for(lambda: self._versions.get(room, 0) != seen_version, timeout)
+
+
+message_notifier = MessageNotifier()
+
+
+# --- LƯU THEO LÔ ---
+class MessageBatcher:
+    def __init__(self, layer, batch_size, flush_interval):
+        self.layer = layer
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.pending = []
+        self.flush_task = None
+
+    async def add(self, consultation_id, sender, text):
+        self.pending.append(ChatMessage(consultation_id=consultation_id, sender=sender, message=text))
+        if len(self.pending) >= self.batch_size:
+            await self.flush()
+        elif self.flush_task is None:
+            self.flush_task = asyncio.ensure_future(self.flush_later())
+
+    async def flush_later(self):
+        await asyncio.sleep(self.flush_interval)
+        self.flush_task = None
+        await self.flush()
+
+    async def flush(self):
+        batch, self.pending = self.pending, []
+        if not batch:
+            return
+        saved = await database_sync_to_async(ChatMessage.objects.bulk_create)(batch)
+        for message in saved:
+            await self.layer.publish(message.consultation_id, message_payload(message))
+        for room in {message.consultation_id for message in saved}:
+            message_notifier.notify(room)
+
+
+def message_payload(message):
+    return {
+        'type': 'message',
+        'id': message.pk,
+        'consultation': message.consultation_id,
+        'sender': message.sender_id,
+        'sender_name': message.sender.username,
+        'message': message.message,
+        'timestamp': message.timestamp.isoformat(),
+    }
+
+
+# Queue/Task gắn với event loop -> mỗi loop có layer + batcher riêng
+_loop_state = weakref.WeakKeyDictionary()
+
+
+def get_chat_state():
+    loop = asyncio.get_running_loop()
+    state = _loop_state.get(loop)
+    if state is None:
+        layer = import_string(getattr(settings, 'CHAT_CHANNEL_LAYER', 'api.chat.InMemoryChannelLayer'))()
+        batcher = MessageBatcher(
+            layer,
+            batch_size=getattr(settings, 'CHAT_BATCH_SIZE', 50),
+            flush_interval=getattr(settings, 'CHAT_FLUSH_INTERVAL', 0.05),
+        )
+        state = _loop_state[loop] = (layer, batcher)
+    return state
+
+
+def broadcast_saved_message(message):
+    """Tin gửi qua REST (thread đồng bộ): báo long-poll và đẩy tới các kết nối WebSocket của process"""
+    payload = message_payload(message)
+    for loop, (layer, _) in list(_loop_state.items()):
+        if not loop.is_closed():
+            loop.call_soon_threadsafe(asyncio.ensure_future, layer.publish(message.consultation_id, payload))
+    message_notifier.notify(message.consultation_id)
+
+
+# --- WEBSOCKET ---
+def authenticate_token(raw_token):
+    auth = CachedJWTAuthentication()
+    try:
+        return auth.get_user(auth.get_validated_token(raw_token))
+    except (InvalidToken, TokenError, AuthenticationFailed):
+        return None
+
+
+def load_consultation(pk):
+    return ConsultationRequest.objects.filter(pk=pk).first()
+
+
+async def websocket_application(scope, receive, send):
+    event = await receive()
+    if event['type'] != 'websocket.connect':
+        return
+
+    match = ROOM_PATH.match(scope['path'])
+    if not match:
+        await send({'type': 'websocket.close', 'code': CLOSE_NOT_FOUND})
+        return
+    token = parse_qs(scope.get('query_string', b'').decode()).get('token', [''])[0]
+    user = await database_sync_to_async(authenticate_token)(token) if token else None
+    if user is None:
+        await send({'type': 'websocket.close', 'code': CLOSE_UNAUTHORIZED})
+        return
+    consultation = await database_sync_to_async(load_consultation)(match['pk'])
+    if consultation is None:
+        await send({'type': 'websocket.close', 'code': CLOSE_NOT_FOUND})
+        return
+    if not is_consultation_participant(user, consultation):
+        await send({'type': 'websocket.close', 'code': CLOSE_FORBIDDEN})
+        return
+
+    layer, batcher = get_chat_state()
+    queue = layer.subscribe(consultation.pk)
+    await send({'type': 'websocket.accept'})
+
+    async def forward():
+        while True:
+            payload = await queue.get()
+            await send({'type': 'websocket.send', 'text': json.dumps(payload)})
+
+    forwarder = asyncio.ensure_future(forward())
+    try:
+        while True:
+            event = await receive()
+            if event['type'] == 'websocket.disconnect':
+                break
+            if event['type'] != 'websocket.receive':
+                continue
+            try:
+                text = str(json.loads(event.get('text') or '{}').get('message', '')).strip()
+            except (ValueError, AttributeError):
+                text = ''
+            if not text or len(text) > max_message_length():
+                await send({'type': 'websocket.send', 'text': json.dumps({'type': 'error', 'error': 'Tin nhắn không hợp lệ'})})
+                continue
+            await batcher.add(consultation.pk, user, text)
+    finally:
+        forwarder.cancel()
+        layer.unsubscribe(consultation.pk, queue)
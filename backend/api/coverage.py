@@ -0,0 +1,118 @@
+"""
+Thời gian hiệu lực của đơn, người thụ hưởng (OrderBeneficiary) và tra cứu hiệu lực theo nhân viên.
+
+- Đơn có coverage_start / coverage_end, đặt khi đơn được xác nhận (không phải lúc tạo: thời gian chờ duyệt
+  không bị trừ vào thời gian hiệu lực), dài bằng gói dài nhất trong đơn.
+- process_order_coverage: confirmed -> active khi tới coverage_start, active -> expired khi qua coverage_end,
+  bằng UPDATE theo lô (index (status, coverage_*)), tự cập nhật OrderStatusSummary / DailySalesBucket.
+- Tra cứu "nhân viên X có đang được bảo hiểm không, đến khi nào" là 1 query theo index (employee, order).
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .analytics import move_sales_status
+from .metrics import move_order_metrics
+from .models import EnterpriseEmployee, Order, OrderBeneficiary, OrderItem
+
+# Trạng thái đã có hiệu lực (hoặc sắp có) -> cần coverage_start / coverage_end
+COVERED_STATUSES = ('confirmed', 'active')
+# (trạng thái hiện tại, trạng thái mới, mốc thời gian)
+TRANSITIONS = (
+    ('confirmed', 'active', 'coverage_start'),
+    ('active', 'expired', 'coverage_end'),
+)
+
+
+# --- THỜI GIAN HIỆU LỰC ---
+def coverage_window(duration_days, start=None):
+    start = start or timezone.now()
+    return {'coverage_start': start, 'coverage_end': start + timedelta(days=duration_days or 0)}
+
+
+def open_coverage(order):
+    """
+    Gọi trước khi lưu đơn chuyển sang confirmed / active: hiệu lực từ lúc xác nhận (hoặc coverage_start
+    Admin đã nhập sẵn) theo gói dài nhất trong đơn. Đơn chưa có item -> để trống.
+    """
+    if order.status not in COVERED_STATUSES or order.coverage_end is not None or order.pk is None:
+        return
+    duration_days = OrderItem.objects.filter(order_id=order.pk).aggregate(days=Max('package__duration_days'))['days']
+    if duration_days is None:
+        return
+    window = coverage_window(duration_days, order.coverage_start)
+    order.coverage_start, order.coverage_end = window['coverage_start'], window['coverage_end']
+
+
+def transition_due_orders(source, target, field, now, chunk_size):
+    """Chuyển các đơn `source` có `field` <= now sang `target`, mỗi lô 1 transaction. Trả số đơn đã chuyển"""
+    moved = 0
+    while True:
+        with transaction.atomic():
+            due = Order.objects.select_for_update().filter(status=source, **{f'{field}__lte': now}).order_by(field)
+            ids = list(due.values_list('pk', flat=True)[:chunk_size])
+            if not ids:
+                return moved
+            # UPDATE hàng loạt không chạy signal -> tự chuyển số liệu dashboard / analytics
+            move_order_metrics(ids, source, target)
+            move_sales_status(ids, source, target)
+            moved += Order.objects.filter(pk__in=ids).update(status=target)
+
+
+def process_order_coverage(now=None, chunk_size=1000):
+    now = now or timezone.now()
+    return {
+        f'{source}->{target}': transition_due_orders(source, target, field, now, chunk_size)
+        for source, target, field in TRANSITIONS
+    }
+
+
+def expiring_orders(days, queryset=None, now=None):
+    """Đơn đang hiệu lực sẽ hết hạn trong `days` ngày tới (chiến dịch tái tục)"""
+    now = now or timezone.now()
+    queryset = Order.objects.all() if queryset is None else queryset
+    return queryset.filter(status='active', coverage_end__gt=now, coverage_end__lte=now + timedelta(days=days))
+
+
+# --- NGƯỜI THỤ HƯỞNG ---
+def assign_beneficiaries(order, employee_ids, order_item=None):
+    """Gán hàng loạt nhân viên (của DN đặt đơn) cho đơn. Trả (số gán mới, các id không hợp lệ)"""
+    requested = set(employee_ids)
+    valid = set(
+        EnterpriseEmployee.objects.filter(enterprise_id=order.user_id, pk__in=requested).values_list('pk', flat=True)
+    )
+    existing = set(order.beneficiaries.filter(employee_id__in=valid).values_list('employee_id', flat=True))
+    OrderBeneficiary.objects.bulk_create(
+        [
+            OrderBeneficiary(order=order, order_item=order_item, employee_id=employee_id)
+            for employee_id in sorted(valid - existing)
+        ],
+        ignore_conflicts=True,  # Gán đồng thời -> unique (order, employee) chặn dòng trùng
+        batch_size=500,
+    )
+    return len(valid - existing), sorted(requested - valid)
+
+
+def remove_beneficiaries(order, employee_ids):
+    deleted, _ = order.beneficiaries.filter(employee_id__in=employee_ids).delete()
+    return deleted
+
+
+def employee_coverage(enterprise, employee_id, now=None):
+    """Các đơn đang hiệu lực của nhân viên và ngày hết hạn xa nhất (1 query)"""
+    now = now or timezone.now()
+    rows = (
+        OrderBeneficiary.objects
+        .filter(employee_id=employee_id, employee__enterprise=enterprise, order__status='active', order__coverage_end__gt=now)
+        .order_by('order__coverage_end')
+        .values_list('order_id', 'order__code', 'order__coverage_start', 'order__coverage_end')
+    )
+    policies = [{'order': order_id, 'code': code, 'start': start, 'end': end} for order_id, code, start, end in rows]
+    return {
+        'employee': employee_id,
+        'covered': bool(policies),
+        'covered_until': policies[-1]['end'] if policies else None,
+        'policies': policies,
+    }
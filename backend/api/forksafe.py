@@ -0,0 +1,77 @@
+"""
+Tài nguyên của từng process, an toàn khi gunicorn fork worker từ master.
+
+- LazyExecutor: ThreadPoolExecutor tạo ở lần dùng đầu; thread không đi theo sang process con -> con tạo pool mới.
+- SQLiteFileStore: 1 file SQLite (WAL) dùng chung giữa các worker; mỗi thread / process mở kết nối riêng.
+"""
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+
+class LazyExecutor:
+    """Gọi executor() -> ThreadPoolExecutor (số thread đọc từ settings[workers_setting] ở lần tạo đầu)"""
+
+    def __init__(self, thread_name_prefix, workers_setting=None, default_workers=1):
+        self.thread_name_prefix = thread_name_prefix
+        self.workers_setting = workers_setting
+        self.default_workers = default_workers
+        self.reset()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self.reset)
+
+    def reset(self):
+        self._executor, self._lock = None, threading.Lock()
+
+    def __call__(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    workers = getattr(settings, self.workers_setting, self.default_workers) \
+                        if self.workers_setting else self.default_workers
+                    self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=self.thread_name_prefix)
+        return self._executor
+
+
+class SQLiteFileStore:
+    """Lớp con khai báo TABLE, SCHEMA (CREATE TABLE IF NOT EXISTS ...) và PRAGMAS thêm nếu cần"""
+
+    TABLE = None
+    SCHEMA = None
+    PRAGMAS = ()
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._local = threading.local()
+
+    @classmethod
+    def shared(cls, path):
+        """1 store / (lớp, file) trong process"""
+        key = (cls, str(path))
+        store = cls._instances.get(key)
+        if store is None:
+            with cls._instances_lock:
+                store = cls._instances.setdefault(key, cls(path))
+        return store
+
+    def connection(self):
+        local = self._local
+        # Sau khi fork phải mở kết nối mới, không dùng lại của process cha
+        if getattr(local, 'pid', None) != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            for pragma in self.PRAGMAS:
+                conn.execute(f'PRAGMA {pragma}')
+            conn.execute(self.SCHEMA)
+            local.conn, local.pid = conn, os.getpid()
+        return local.conn
+
+    def clear(self):
+        self.connection().execute(f'DELETE FROM {self.TABLE}')
@@ -0,0 +1,125 @@
+"""
+Sinh ảnh thu nhỏ + WebP cho ảnh upload (ProductImage, News, avatar User), ngoài request.
+
+Sau khi transaction commit, ảnh gốc được đưa vào ThreadPoolExecutor (IMAGE_WORKERS thread):
+mỗi chiều rộng trong IMAGE_VARIANT_WIDTHS (nhỏ hơn ảnh gốc) -> 1 bản JPEG + 1 bản WebP,
+lưu cạnh ảnh gốc trong thư mục variants/. Kết quả ghi vào JSONField bằng UPDATE (không gọi lại signal):
+
+    {"source": "products/a.jpg", "width": 1200, "height": 1600,
+     "webp": {"320": "products/variants/a_320.webp", ...}, "jpeg": {"320": "products/variants/a_320.jpg", ...}}
+
+IMAGE_PROCESSING_SYNC = True (test) -> xử lý ngay trong on_commit, không qua thread.
+"""
+import io
+import logging
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+
+from .authentication import invalidate_cached_user
+from .cache import bump_catalog_version
+from .forksafe import LazyExecutor
+from .models import News, ProductImage, User
+
+logger = logging.getLogger(__name__)
+
+# key -> (định dạng Pillow, đuôi file, tham số nén)
+FORMATS = {
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+}
+
+
+def variant_widths():
+    return getattr(settings, 'IMAGE_VARIANT_WIDTHS', (320, 640, 1280))
+
+
+# --- SINH ẢNH ---
+def encode(image, image_format, options):
+    buffer = io.BytesIO()
+    image.save(buffer, image_format, **options)
+    return ContentFile(buffer.getvalue())
+
+
+def generate_variants(field_file):
+    """Đọc ảnh gốc từ storage, trả dict variants (đã lưu các file mới vào cùng storage)"""
+    storage = field_file.storage
+    with storage.open(field_file.name, 'rb') as source:
+        image = ImageOps.exif_transpose(Image.open(source))
+        image.load()
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+
+    directory, filename = os.path.split(field_file.name)
+    stem, extension = os.path.splitext(filename)
+    source_is_jpeg = extension.lower() in ('.jpg', '.jpeg')
+    variants = {'source': field_file.name, 'width': image.width, 'height': image.height, 'webp': {}, 'jpeg': {}}
+    # Luôn có ít nhất 1 bản WebP ở kích thước gốc (nhẹ hơn JPEG điện thoại nhiều)
+    widths = sorted({width for width in variant_widths() if width < image.width} | {image.width})
+    for width in widths:
+        resized = image if width == image.width else image.resize(
+            (width, round(image.height * width / image.width)), Image.Resampling.LANCZOS
+        )
+        for key, (image_format, suffix, options) in FORMATS.items():
+            if key == 'jpeg' and width == image.width and source_is_jpeg:
+                variants[key][str(width)] = field_file.name  # Ảnh gốc đã là bản JPEG lớn nhất
+                continue
+            name = storage.save(
+                os.path.join(directory, 'variants', f'{stem}_{width}.{suffix}'),
+                encode(resized, image_format, options),
+            )
+            variants[key][str(width)] = name
+    return variants
+
+
+def process_image(model, pk, field, variants_field, in_worker=False):
+    """Sinh variants cho 1 object và ghi lại bằng UPDATE (worker thread hoặc lệnh generate_image_variants)"""
+    try:
+        instance = model.objects.filter(pk=pk).only(field).first()
+        field_file = getattr(instance, field, None) if instance else None
+        if not field_file:
+            return
+        variants = generate_variants(field_file)
+        # Chỉ ghi nếu ảnh chưa bị thay trong lúc xử lý
+        updated = model.objects.filter(pk=pk, **{field: field_file.name}).update(**{variants_field: variants})
+        if updated and model in (ProductImage, News):
+            bump_catalog_version()
+        elif updated and model is User:
+            invalidate_cached_user(pk)
+    except Exception:
+        logger.exception('Không xử lý được ảnh %s #%s', model.__name__, pk)
+    finally:
+        # Worker thread có kết nối DB riêng -> đóng sau mỗi ảnh
+        if in_worker:
+            connection.close()
+
+
+# --- HÀNG ĐỢI ---
+get_executor = LazyExecutor('image-variants', 'IMAGE_WORKERS', 2)
+
+
+def schedule_variants(instance, field, variants_field):
+    """Gọi sau khi lưu: ảnh mới / đổi ảnh -> xử lý sau khi commit"""
+    field_file = getattr(instance, field)
+    if not field_file or (getattr(instance, variants_field) or {}).get('source') == field_file.name:
+        return
+    model, pk = type(instance), instance.pk
+
+    def submit():
+        if getattr(settings, 'IMAGE_PROCESSING_SYNC', False):
+            process_image(model, pk, field, variants_field)
+        else:
+            get_executor().submit(process_image, model, pk, field, variants_field, in_worker=True)
+    transaction.on_commit(submit)
+
+
+def srcset(field_file, variants, key, request=None):
+    """'url 320w, url 640w' cho thẻ <img srcset> / <source type="image/webp">"""
+    entries = []
+    for width, name in sorted((variants or {}).get(key, {}).items(), key=lambda item: int(item[0])):
+        url = field_file.storage.url(name)
+        entries.append(f'{request.build_absolute_uri(url) if request else url} {width}w')
+    return ', '.join(entries)
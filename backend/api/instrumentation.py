@@ -0,0 +1,347 @@
+"""
+Đo từng request: thời gian, số câu SQL, thời gian SQL, câu SQL lặp lại (N+1) theo view + action.
+
+- InstrumentationMiddleware đo thời gian mọi request; chỉ request được lấy mẫu (INSTRUMENTATION_QUERY_SAMPLE_RATE)
+  mới gắn execute_wrapper: mỗi query tốn 2 lần perf_counter + 1 lần cộng dict, gom SQL lặp làm 1 lần cuối request.
+  Histogram số câu / thời gian SQL vì vậy chỉ gồm các request được lấy mẫu.
+- Số liệu gộp vào histogram trong process, định kỳ (INSTRUMENTATION_FLUSH_INTERVAL) thread nền ghi snapshot vào
+  file SQLite chung (như store throttle) -> /api/metrics/ cộng snapshot của mọi worker, trả text Prometheus.
+- Request chậm hơn INSTRUMENTATION_SLOW_REQUEST_MS -> log 'api.slow_requests'; một phần trong số đó
+  (INSTRUMENTATION_EXPLAIN_SAMPLE_RATE) được EXPLAIN câu SQL chậm nhất ở thread nền, không làm chậm response.
+"""
+import copy
+import json
+import logging
+import os
+import random
+import re
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from .forksafe import LazyExecutor, SQLiteFileStore
+
+logger = logging.getLogger(__name__)
+slow_logger = logging.getLogger('api.slow_requests')
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+# tên metric -> (mô tả, buckets)
+HISTOGRAMS = {
+    'http_request_duration_seconds': ('Thời gian xử lý request (giây)', DURATION_BUCKETS),
+    'http_request_db_queries': ('Số câu SQL / request', QUERY_BUCKETS),
+    'http_request_db_seconds': ('Tổng thời gian SQL / request (giây)', DURATION_BUCKETS),
+}
+# "IN (%s, %s, %s)" dài ngắn khác nhau vẫn là 1 câu
+IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+MAX_SQL_LOG = 500
+MAX_REPORTED_DUPLICATES = 1000
+
+
+# --- GHI QUERY ---
+class QueryRecorder:
+    """Dùng với connection.execute_wrapper; giữ số câu, tổng thời gian, số lần mỗi câu SQL và câu chậm nhất"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = {}
+        self.slowest = (0.0, None, None, None)
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.duration += elapsed
+            # SQL của ORM đã tham số hóa (%s) -> dùng luôn làm khóa, chuẩn hóa sau
+            self.statements[sql] = self.statements.get(sql, 0) + 1
+            if elapsed > self.slowest[0] and not many:
+                self.slowest = (elapsed, sql, params, context['connection'].alias)
+
+    def duplicates(self):
+        """
+        {fingerprint: số lần} của các câu SELECT chạy > 1 lần. INSERT / UPDATE lặp lại không tính:
+        bulk_create chia lô cũng sinh nhiều câu INSERT giống nhau nhưng không phải N+1.
+        """
+        fingerprints = {}
+        for sql, count in self.statements.items():
+            if sql.lstrip()[:6].upper() != 'SELECT':
+                continue
+            fingerprint = IN_LIST.sub('IN (%s)', sql)
+            fingerprints[fingerprint] = fingerprints.get(fingerprint, 0) + count
+        return {fingerprint: count for fingerprint, count in fingerprints.items() if count > 1}
+
+
+# --- HISTOGRAM ---
+def new_series():
+    return {
+        'requests': {},
+        'duplicates': 0,
+        **{name: {'counts': [0] * (len(buckets) + 1), 'sum': 0.0} for name, (_, buckets) in HISTOGRAMS.items()},
+    }
+
+
+class MetricsRegistry:
+    """Số liệu của process hiện tại, khóa theo 'view\\taction'"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.series = {}
+            self.worker = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+            self.flushed_at = time.monotonic()
+
+    def observe(self, view, action, status, values, duplicates):
+        key = f'{view}\t{action}'
+        with self._lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = new_series()
+            series['requests'][status] = series['requests'].get(status, 0) + 1
+            series['duplicates'] += duplicates
+            for name, value in values.items():
+                histogram = series[name]
+                histogram['counts'][bisect_left(HISTOGRAMS[name][1], value)] += 1
+                histogram['sum'] += value
+
+    def snapshot(self):
+        with self._lock:
+            return copy.deepcopy(self.series)
+
+
+registry = MetricsRegistry()
+
+
+def _reset_after_fork():
+    # Số liệu của process cha không tính lại lần nữa ở process con
+    global _reported_lock
+    registry._lock = threading.Lock()
+    registry.reset()
+    _reported_lock = threading.Lock()
+    _reported_duplicates.clear()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+# --- GỘP GIỮA CÁC WORKER ---
+class MetricsStore(SQLiteFileStore):
+    """Snapshot của từng worker trong 1 file SQLite; worker chết vẫn giữ số liệu (counter không bị giảm)"""
+
+    MAX_AGE = 7 * 86400
+    TABLE = 'snapshots'
+    SCHEMA = 'CREATE TABLE IF NOT EXISTS snapshots (worker TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)'
+
+    def save(self, worker, series):
+        self.connection().execute(
+            'INSERT INTO snapshots (worker, data, updated_at) VALUES (?, ?, ?) '
+            'ON CONFLICT (worker) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at',
+            (worker, json.dumps(series), time.time()),
+        )
+
+    def load(self):
+        conn = self.connection()
+        conn.execute('DELETE FROM snapshots WHERE updated_at < ?', (time.time() - self.MAX_AGE,))
+        return [json.loads(data) for (data,) in conn.execute('SELECT data FROM snapshots')]
+
+
+def get_store():
+    path = getattr(settings, 'INSTRUMENTATION_STORE_PATH', os.path.join(settings.BASE_DIR, '.cache', 'metrics.sqlite3'))
+    return MetricsStore.shared(path)
+
+
+def flush():
+    registry.flushed_at = time.monotonic()
+    try:
+        get_store().save(registry.worker, registry.snapshot())
+    except sqlite3.Error:
+        logger.exception('Không ghi được số liệu request')
+
+
+def merge(snapshots):
+    merged = {}
+    for series_by_key in snapshots:
+        for key, series in series_by_key.items():
+            target = merged.setdefault(key, new_series())
+            for status, count in series['requests'].items():
+                target['requests'][status] = target['requests'].get(status, 0) + count
+            target['duplicates'] += series['duplicates']
+            for name in HISTOGRAMS:
+                target[name]['counts'] = [a + b for a, b in zip(target[name]['counts'], series[name]['counts'])]
+                target[name]['sum'] += series[name]['sum']
+    return merged
+
+
+# --- PROMETHEUS ---
+def label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_prometheus(series_by_key):
+    keys = sorted(series_by_key)
+    labels = {key: 'view="{}",action="{}"'.format(*map(label_value, key.split('\t'))) for key in keys}
+    lines = [
+        '# HELP http_requests_total Số request theo view, action, nhóm mã HTTP',
+        '# TYPE http_requests_total counter',
+    ]
+    for key in keys:
+        for status, count in sorted(series_by_key[key]['requests'].items()):
+            lines.append(f'http_requests_total{{{labels[key]},status="{status}"}} {count}')
+    lines += [
+        '# HELP http_request_duplicate_queries_total Số lần chạy lặp lại cùng 1 câu SQL trong 1 request (N+1)',
+        '# TYPE http_request_duplicate_queries_total counter',
+    ]
+    lines += [f'http_request_duplicate_queries_total{{{labels[key]}}} {series_by_key[key]["duplicates"]}' for key in keys]
+    for name, (description, buckets) in HISTOGRAMS.items():
+        lines += [f'# HELP {name} {description}', f'# TYPE {name} histogram']
+        for key in keys:
+            histogram = series_by_key[key][name]
+            cumulative = 0
+            for bound, count in zip(list(buckets) + ['+Inf'], histogram['counts']):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{labels[key]},le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_sum{{{labels[key]}}} {histogram["sum"]:.6f}')
+            lines.append(f'{name}_count{{{labels[key]}}} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+def collect():
+    """Text Prometheus của mọi worker (ghi snapshot của process này trước)"""
+    flush()
+    return render_prometheus(merge(get_store().load()))
+
+
+# --- THREAD NỀN: LOG REQUEST CHẬM, GHI STORE ---
+# EXPLAIN câu chậm + ghi snapshot vào store, ngoài thread của request
+get_executor = LazyExecutor('instrumentation')
+
+
+def explain(alias, sql, params, label):
+    connection = connections[alias]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+            plan = ' | '.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+        slow_logger.warning('Query plan %s: %s -> %s', label, sql[:MAX_SQL_LOG], plan)
+    except Exception:
+        logger.exception('Không EXPLAIN được câu SQL chậm của %s', label)
+    finally:
+        connection.close()
+
+
+def log_slow_request(request, label, duration, recorder, duplicates, explain_sample_rate):
+    if recorder is None:
+        slow_logger.warning(
+            'Request chậm %s %s (%s): %.0f ms (không lấy mẫu SQL)', request.method, request.path, label, duration * 1000,
+        )
+        return
+    top = sorted(duplicates.items(), key=lambda item: -item[1])[:3]
+    slow_logger.warning(
+        'Request chậm %s %s (%s): %.0f ms, %d query, %.0f ms SQL, SQL lặp: %s',
+        request.method, request.path, label, duration * 1000, recorder.count, recorder.duration * 1000,
+        '; '.join(f'{count}x {sql[:MAX_SQL_LOG]}' for sql, count in top) or 'không',
+    )
+    _, sql, params, alias = recorder.slowest
+    if sql and sql.lstrip().upper().startswith('SELECT') and random.random() < explain_sample_rate:
+        get_executor().submit(explain, alias, sql, params, label)
+
+
+# --- MIDDLEWARE ---
+_reported_duplicates = set()
+_reported_lock = threading.Lock()
+
+
+def report_duplicates(label, duplicates, threshold):
+    """Mỗi câu N+1 chỉ cảnh báo 1 lần / process"""
+    for sql, count in duplicates.items():
+        if count < threshold:
+            continue
+        with _reported_lock:
+            if (label, sql) in _reported_duplicates or len(_reported_duplicates) >= MAX_REPORTED_DUPLICATES:
+                continue
+            _reported_duplicates.add((label, sql))
+        logger.warning('Có thể N+1 ở %s: %d lần %s', label, count, sql[:MAX_SQL_LOG])
+
+
+def view_labels(request):
+    """(view, action): tên class ViewSet/APIView + action (list, buy_now...) hoặc method HTTP"""
+    match = getattr(request, 'resolver_match', None)
+    method = request.method.lower()
+    if match is None:
+        return 'unresolved', method
+    func = match.func
+    view_class = getattr(func, 'cls', None) or getattr(func, 'view_class', None)
+    view = view_class.__name__ if view_class else getattr(func, '__name__', 'unknown')
+    actions = getattr(func, 'actions', None) or {}
+    return view, actions.get(method, method)
+
+
+class InstrumentationMiddleware:
+    """
+    Cấu hình đọc 1 lần khi nạp middleware; INSTRUMENTATION_ENABLED = False -> bỏ hẳn khỏi chuỗi middleware.
+    Mọi request: thời gian + mã HTTP. Chỉ request được lấy mẫu (INSTRUMENTATION_QUERY_SAMPLE_RATE) mới gắn
+    execute_wrapper để đếm / gom SQL -> request thường chỉ tốn 2 lần perf_counter + 1 lần cộng histogram.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'INSTRUMENTATION_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'INSTRUMENTATION_QUERY_SAMPLE_RATE', 0.1)
+        self.slow_seconds = getattr(settings, 'INSTRUMENTATION_SLOW_REQUEST_MS', 1000) / 1000
+        self.flush_interval = getattr(settings, 'INSTRUMENTATION_FLUSH_INTERVAL', 10)
+        self.explain_sample_rate = getattr(settings, 'INSTRUMENTATION_EXPLAIN_SAMPLE_RATE', 0.1)
+        self.duplicate_threshold = getattr(settings, 'INSTRUMENTATION_DUPLICATE_THRESHOLD', 5)
+
+    def __call__(self, request):
+        recorder = QueryRecorder() if random.random() < self.sample_rate else None
+        start = time.perf_counter()
+        if recorder is None:
+            response = self.get_response(request)
+        else:
+            # Gắn thẳng vào execute_wrappers (như connection.execute_wrapper, không qua ExitStack)
+            wrapped = [connection.execute_wrappers for connection in connections.all()]
+            for wrappers in wrapped:
+                wrappers.append(recorder)
+            try:
+                response = self.get_response(request)
+            finally:
+                for wrappers in wrapped:
+                    wrappers.remove(recorder)
+        duration = time.perf_counter() - start
+
+        view, action = view_labels(request)
+        values = {'http_request_duration_seconds': duration}
+        duplicates = {}
+        if recorder is not None:
+            duplicates = recorder.duplicates()
+            values['http_request_db_queries'] = recorder.count
+            values['http_request_db_seconds'] = recorder.duration
+        registry.observe(
+            view, action, f'{response.status_code // 100}xx', values, sum(count - 1 for count in duplicates.values()),
+        )
+
+        if recorder is not None or duration >= self.slow_seconds:
+            label = f'{view}.{action}'
+            report_duplicates(label, duplicates, self.duplicate_threshold)
+            if duration >= self.slow_seconds:
+                log_slow_request(request, label, duration, recorder, duplicates, self.explain_sample_rate)
+        if time.monotonic() - registry.flushed_at >= self.flush_interval:
+            # Ghi store ở thread nền; đặt mốc trước để các request kế tiếp không gửi thêm
+            registry.flushed_at = time.monotonic()
+            get_executor().submit(flush)
+        return response
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from api.images import process_image
+from api.models import News, ProductImage, User
+
+TARGETS = [(ProductImage, 'image', 'variants'), (News, 'image', 'variants'), (User, 'avatar', 'avatar_variants')]
+
+
+class Command(BaseCommand):
+    help = 'Sinh ảnh thu nhỏ / WebP cho ảnh đã upload trước đây (hoặc tất cả với --all)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Sinh lại cả ảnh đã có variants')
+
+    def handle(self, *args, **options):
+        for model, field, variants_field in TARGETS:
+            queryset = model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+            if not options['all']:
+                queryset = queryset.filter(**{variants_field: {}})
+            count = 0
+            for pk in queryset.values_list('pk', flat=True).iterator():
+                process_image(model, pk, field, variants_field)
+                count += 1
+            self.stdout.write(self.style.SUCCESS(f'{model.__name__}: đã xử lý {count} ảnh'))
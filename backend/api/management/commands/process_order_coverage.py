@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from api.coverage import process_order_coverage
+
+
+class Command(BaseCommand):
+    help = 'Chuyển trạng thái đơn theo thời gian hiệu lực: confirmed -> active, active -> expired (chạy định kỳ bằng cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        result = process_order_coverage(chunk_size=options['chunk_size'])
+        for transition, count in result.items():
+            self.stdout.write(self.style.SUCCESS(f'{transition}: {count} đơn'))
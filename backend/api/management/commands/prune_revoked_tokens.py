@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api.tokens import prune_revoked_tokens
+
+
+class Command(BaseCommand):
+    help = 'Xóa token thu hồi đã hết hạn khỏi bảng RevokedToken (chạy định kỳ bằng cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        deleted = prune_revoked_tokens(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Đã xóa {deleted} token hết hạn'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api.metrics import rebuild_order_metrics
+
+
+class Command(BaseCommand):
+    help = 'Tính lại bảng OrderStatusSummary (Dashboard) từ dữ liệu Order hiện có'
+
+    def handle(self, *args, **options):
+        count = rebuild_order_metrics()
+        self.stdout.write(self.style.SUCCESS(f'Đã tổng hợp {count} trạng thái đơn hàng'))
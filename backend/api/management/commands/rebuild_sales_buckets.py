@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api.analytics import rebuild_sales_buckets
+
+
+class Command(BaseCommand):
+    help = 'Tính lại bảng DailySalesBucket (analytics doanh thu) từ lịch sử Order/OrderItem'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        count = rebuild_sales_buckets(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Đã tạo {count} bucket doanh thu theo ngày'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api.search import reindex_all
+
+
+class Command(BaseCommand):
+    help = 'Tạo lại toàn bộ ProductSearchDocument (index tìm kiếm sản phẩm)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        count = reindex_all(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Đã index {count} sản phẩm'))
@@ -0,0 +1,66 @@
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from .models import Order, OrderStatusSummary
+
+REVENUE_STATUSES = ('active', 'expired')
+
+
+def apply_order_delta(status, count, amount):
+    """Cộng dồn thay đổi vào dòng tổng hợp của 1 trạng thái (UPDATE nguyên tử bằng F())"""
+    if not count and not amount:
+        return
+    updated = OrderStatusSummary.objects.filter(status=status).update(
+        order_count=F('order_count') + count,
+        total_amount=F('total_amount') + amount,
+    )
+    if not updated:
+        OrderStatusSummary.objects.get_or_create(status=status)
+        apply_order_delta(status, count, amount)
+
+
+def record_order_saved(order, created):
+    previous = getattr(order, '_loaded_metrics', None)
+    current = (order.status, order.total_amount or 0)
+    if created:
+        apply_order_delta(current[0], 1, current[1])
+    elif previous is not None and previous != current:
+        apply_order_delta(previous[0], -1, -(previous[1] or 0))
+        apply_order_delta(current[0], 1, current[1])
+    order._loaded_metrics = current
+
+
+def record_order_deleted(order):
+    status, amount = getattr(order, '_loaded_metrics', (order.status, order.total_amount))
+    apply_order_delta(status, -1, -(amount or 0))
+
+
+def rebuild_order_metrics():
+    """Tính lại toàn bộ từ bảng Order (backfill / sửa lệch)"""
+    with transaction.atomic():
+        rows = list(Order.objects.values('status').annotate(order_count=Count('id'), total_amount=Sum('total_amount')))
+        OrderStatusSummary.objects.all().delete()
+        OrderStatusSummary.objects.bulk_create([
+            OrderStatusSummary(status=row['status'], order_count=row['order_count'], total_amount=row['total_amount'] or 0)
+            for row in rows
+        ])
+    return len(rows)
+
+
+def move_order_metrics(order_ids, source, target):
+    """Chuyển tổng của nhiều đơn từ `source` sang `target` (cho UPDATE hàng loạt, không qua signal)"""
+    totals = Order.objects.filter(pk__in=order_ids).aggregate(order_count=Count('id'), total_amount=Sum('total_amount'))
+    amount = totals['total_amount'] or 0
+    apply_order_delta(source, -totals['order_count'], -amount)
+    apply_order_delta(target, totals['order_count'], amount)
+
+
+def dashboard_totals():
+    summary = {row.status: row for row in OrderStatusSummary.objects.all()}
+    pending = summary.get('pending')
+    return {
+        # Đơn hết hạn vẫn là doanh thu đã thu
+        'revenue': sum(summary[status].total_amount for status in REVENUE_STATUSES if status in summary),
+        'total_orders': sum(row.order_count for row in summary.values()),
+        'pending_orders': pending.order_count if pending else 0,
+    }
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:25
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_order_status_summary(apps, schema_editor):
+    Order = apps.get_model('api', 'Order')
+    OrderStatusSummary = apps.get_model('api', 'OrderStatusSummary')
+    rows = Order.objects.values('status').annotate(order_count=Count('id'), total_amount=Sum('total_amount'))
+    OrderStatusSummary.objects.bulk_create([
+        OrderStatusSummary(status=row['status'], order_count=row['order_count'], total_amount=row['total_amount'] or 0)
+        for row in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_product_is_price_hidden'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderStatusSummary',
+            fields=[
+                ('status', models.CharField(max_length=20, primary_key=True, serialize=False)),
+                ('order_count', models.BigIntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=0, default=0, max_digits=20)),
+            ],
+        ),
+        migrations.RunPython(backfill_order_status_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, F, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_daily_sales_buckets(apps, schema_editor):
+    OrderItem = apps.get_model('api', 'OrderItem')
+    DailySalesBucket = apps.get_model('api', 'DailySalesBucket')
+    rows = (
+        OrderItem.objects
+        .annotate(date=TruncDate('order__created_at'))
+        .values('date', 'package__product__category_id', 'package__product__target_audience', 'order__status')
+        .annotate(
+            orders=Count('order_id', distinct=True),
+            items=Sum('quantity'),
+            revenue=Sum(F('package__price') * F('quantity'), output_field=DecimalField(max_digits=20, decimal_places=0)),
+        )
+        .order_by()
+    )
+    DailySalesBucket.objects.bulk_create([
+        DailySalesBucket(
+            date=row['date'],
+            category_id=row['package__product__category_id'],
+            target_audience=row['package__product__target_audience'],
+            status=row['order__status'],
+            order_count=row['orders'],
+            item_count=row['items'],
+            revenue=row['revenue'] or 0,
+        )
+        for row in rows
+    ], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_order_status_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('target_audience', models.CharField(max_length=10)),
+                ('status', models.CharField(max_length=20)),
+                ('order_count', models.IntegerField(default=0)),
+                ('item_count', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=0, default=0, max_digits=20)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_buckets', to='api.category')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('date', 'category', 'target_audience', 'status'), name='unique_daily_sales_bucket')],
+            },
+        ),
+        migrations.RunPython(backfill_daily_sales_buckets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,90 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:30
+
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+FTS_TABLE = 'api_productsearch_fts'
+DOC_TABLE = 'api_productsearchdocument'
+COLUMNS = 'name, description, category_name, provider_name'
+
+SQLITE_SQL = [
+    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5({COLUMNS}, content='{DOC_TABLE}', content_rowid='product_id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    f"CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON {DOC_TABLE} BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, {COLUMNS}) VALUES (new.product_id, new.name, new.description, new.category_name, new.provider_name); END",
+    f"CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON {DOC_TABLE} BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {COLUMNS}) VALUES ('delete', old.product_id, old.name, old.description, old.category_name, old.provider_name); END",
+    f"CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE ON {DOC_TABLE} BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {COLUMNS}) VALUES ('delete', old.product_id, old.name, old.description, old.category_name, old.provider_name); "
+    f"INSERT INTO {FTS_TABLE}(rowid, {COLUMNS}) VALUES (new.product_id, new.name, new.description, new.category_name, new.provider_name); END",
+]
+SQLITE_REVERSE_SQL = [
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}' for suffix in ['ai', 'ad', 'au']
+] + [f'DROP TABLE IF EXISTS {FTS_TABLE}']
+
+# Phải trùng biểu thức trong api.search.pg_vector để PostgreSQL dùng được index
+PG_PUBLIC_VECTOR = (
+    "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'C') || "
+    "setweight(to_tsvector('simple', coalesce(category_name, '')), 'B')"
+)
+PG_ADMIN_VECTOR = PG_PUBLIC_VECTOR + " || setweight(to_tsvector('simple', coalesce(provider_name, '')), 'B')"
+POSTGRES_SQL = [
+    f'CREATE INDEX product_search_public_idx ON {DOC_TABLE} USING GIN (({PG_PUBLIC_VECTOR}))',
+    f'CREATE INDEX product_search_admin_idx ON {DOC_TABLE} USING GIN (({PG_ADMIN_VECTOR}))',
+]
+POSTGRES_REVERSE_SQL = ['DROP INDEX IF EXISTS product_search_public_idx', 'DROP INDEX IF EXISTS product_search_admin_idx']
+
+
+def fold(text):
+    text = (text or '').replace('đ', 'd').replace('Đ', 'D')
+    text = unicodedata.normalize('NFD', text)
+    return ''.join(ch for ch in text if not unicodedata.combining(ch)).lower()
+
+
+def create_search_index(apps, schema_editor):
+    statements = {'sqlite': SQLITE_SQL, 'postgresql': POSTGRES_SQL}.get(schema_editor.connection.vendor, [])
+    for sql in statements:
+        schema_editor.execute(sql)
+
+    Product = apps.get_model('api', 'Product')
+    ProductSearchDocument = apps.get_model('api', 'ProductSearchDocument')
+    ProductSearchDocument.objects.bulk_create([
+        ProductSearchDocument(
+            product_id=product.pk,
+            name=fold(product.name),
+            description=fold(product.description),
+            category_name=fold(product.category.name),
+            provider_name=fold(product.provider_name),
+        )
+        for product in Product.objects.select_related('category').iterator()
+    ], batch_size=500)
+
+
+def drop_search_index(apps, schema_editor):
+    statements = {'sqlite': SQLITE_REVERSE_SQL, 'postgresql': POSTGRES_REVERSE_SQL}.get(schema_editor.connection.vendor, [])
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_query_pattern_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSearchDocument',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='api.product')),
+                ('name', models.TextField()),
+                ('description', models.TextField()),
+                ('category_name', models.TextField()),
+                ('provider_name', models.TextField()),
+            ],
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
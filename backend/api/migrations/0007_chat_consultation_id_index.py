@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_product_search_document'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['consultation', 'id'], name='chat_consult_id_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_chat_consultation_id_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderBeneficiary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('employee', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='coverages', to='api.enterpriseemployee')),
+                ('order', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='beneficiaries', to='api.order')),
+                ('order_item', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='beneficiaries', to='api.orderitem')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['employee', 'order'], name='beneficiary_employee_idx')],
+                'constraints': [models.UniqueConstraint(fields=('order', 'employee'), name='unique_order_beneficiary')],
+            },
+        ),
+    ]
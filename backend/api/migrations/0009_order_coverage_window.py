@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:44
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def backfill_coverage_window(apps, schema_editor):
+    # Đơn cũ đã xác nhận: không biết lúc xác nhận -> tính từ lúc tạo đơn, dài bằng gói dài nhất trong đơn.
+    # Đơn chờ duyệt / đã hủy / không có item giữ NULL (hiệu lực đặt khi xác nhận)
+    # Lưu ý khi triển khai: cửa sổ tính từ created_at nên đơn active cũ đã quá created_at + thời hạn gói
+    # sẽ bị chuyển sang expired ở lần chạy process_order_coverage đầu tiên (kiểm tra danh sách trước khi bật lịch chạy)
+    Order = apps.get_model('api', 'Order')
+    rows = (
+        Order.objects.filter(status__in=['confirmed', 'active'])
+        .annotate(duration_days=Max('items__package__duration_days'))
+        .filter(duration_days__isnull=False)
+        .order_by('pk')
+    )
+    batch = []
+    for order in rows.iterator(chunk_size=2000):
+        order.coverage_start = order.created_at
+        order.coverage_end = order.created_at + timedelta(days=order.duration_days)
+        batch.append(order)
+        if len(batch) >= 2000:
+            Order.objects.bulk_update(batch, ['coverage_start', 'coverage_end'])
+            batch = []
+    Order.objects.bulk_update(batch, ['coverage_start', 'coverage_end'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_order_beneficiary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='coverage_end',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='coverage_start',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Chờ xác nhận'), ('confirmed', 'Đã xác nhận'), ('active', 'Đang hiệu lực'), ('expired', 'Hết hiệu lực'), ('cancelled', 'Hủy đơn')], default='pending', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'coverage_start'], name='order_status_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'coverage_end'], name='order_status_end_idx'),
+        ),
+        migrations.RunPython(backfill_coverage_window, migrations.RunPython.noop),
+    ]
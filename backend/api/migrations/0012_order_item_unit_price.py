@@ -0,0 +1,75 @@
+# Generated by Django 5.2.18 on 2026-10-17 09:12
+
+from django.db import migrations, models
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_unit_price(apps, schema_editor):
+    # Đơn cũ không lưu giá lúc đặt -> lấy giá hiện tại của gói (tốt nhất có thể)
+    OrderItem = apps.get_model('api', 'OrderItem')
+    ProductPackage = apps.get_model('api', 'ProductPackage')
+    OrderItem.objects.filter(unit_price__isnull=True).update(
+        unit_price=Subquery(ProductPackage.objects.filter(pk=OuterRef('package_id')).values('price')[:1])
+    )
+
+
+def rebuild_daily_sales_buckets(apps, schema_editor):
+    # Như api.analytics.rebuild_sales_buckets: doanh thu theo unit_price, mỗi đơn 1 primary_order_count
+    OrderItem = apps.get_model('api', 'OrderItem')
+    DailySalesBucket = apps.get_model('api', 'DailySalesBucket')
+    group_key = ['package__product__category_id', 'package__product__target_audience']
+    rows = (
+        OrderItem.objects
+        .annotate(date=TruncDate('order__created_at'))
+        .values('order_id', 'date', *group_key, 'order__status')
+        .annotate(
+            items=Sum('quantity'),
+            revenue=Sum(F('unit_price') * F('quantity'), output_field=DecimalField(max_digits=20, decimal_places=0)),
+        )
+        .order_by('order_id', *group_key)
+    )
+    buckets, last_order = {}, None
+    for row in rows.iterator(chunk_size=2000):
+        key = (row['date'], row['package__product__category_id'], row['package__product__target_audience'], row['order__status'])
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = DailySalesBucket(
+                date=key[0], category_id=key[1], target_audience=key[2], status=key[3],
+                order_count=0, primary_order_count=0, item_count=0, revenue=0,
+            )
+        bucket.order_count += 1
+        if row['order_id'] != last_order:
+            bucket.primary_order_count += 1
+            last_order = row['order_id']
+        bucket.item_count += row['items']
+        bucket.revenue += row['revenue'] or 0
+    DailySalesBucket.objects.all().delete()
+    DailySalesBucket.objects.bulk_create(buckets.values(), batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_revoked_token'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='unit_price',
+            field=models.DecimalField(blank=True, decimal_places=0, max_digits=15, null=True),
+        ),
+        migrations.RunPython(backfill_unit_price, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='orderitem',
+            name='unit_price',
+            field=models.DecimalField(blank=True, decimal_places=0, max_digits=15),
+        ),
+        migrations.AddField(
+            model_name='dailysalesbucket',
+            name='primary_order_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(rebuild_daily_sales_buckets, migrations.RunPython.noop),
+    ]
@@ -29,6 +29,7 @@ class User(AbstractUser):
     phone = models.CharField(max_length=15, unique=True, null=True, blank=True) # Login Customer 
     address = models.TextField(null=True, blank=True)
     avatar = models.ImageField(upload_to='avatars/', null=True, blank=True)
+    avatar_variants = models.JSONField(default=dict, blank=True, editable=False)  # Ảnh thu nhỏ / WebP (api.images)
 
     # Info Cá nhân
     cccd = models.CharField(max_length=20, null=True, blank=True) 
@@ -58,6 +59,13 @@ class EnterpriseEmployee(models.Model):
     address = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+class RevokedToken(models.Model):
+    """jti của JWT đã thu hồi (refresh đã xoay vòng, đăng xuất). Hết hạn thì xóa (prune_revoked_tokens)"""
+    jti = models.CharField(max_length=255, unique=True)
+    token_type = models.CharField(max_length=20)
+    expires_at = models.DateTimeField(db_index=True)
+    revoked_at = models.DateTimeField(auto_now_add=True)
+
 # --- 2. PRODUCTS & NEWS ---
 class Category(models.Model):
     name = models.CharField(max_length=100) # Sức khỏe, Xe, v.v.
@@ -75,10 +83,25 @@ class Product(models.Model):
     target_audience = models.CharField(max_length=10, choices=(('ind', 'Cá nhân'), ('ent', 'Doanh nghiệp')))
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Partial index: chỉ chứa sản phẩm nổi bật (/products/featured/)
+            models.Index(fields=['-created_at', '-id'], condition=models.Q(is_featured=True), name='product_featured_idx'),
+        ]
+
+class ProductSearchDocument(models.Model):
+    """Bản đã bỏ dấu (Sức khỏe -> suc khoe) của các trường tìm kiếm, đồng bộ qua signal (xem api/search.py)"""
+    product = models.OneToOneField(Product, primary_key=True, related_name='search_document', on_delete=models.CASCADE)
+    name = models.TextField()
+    description = models.TextField()
+    category_name = models.TextField()
+    provider_name = models.TextField()  # Chỉ admin được tìm theo trường này
+
 class ProductImage(models.Model):
     """Cho phép upload nhiều ảnh """
     product = models.ForeignKey(Product, related_name='images', on_delete=models.CASCADE)
     image = models.ImageField(upload_to='products/')
+    variants = models.JSONField(default=dict, blank=True, editable=False)  # Ảnh thu nhỏ / WebP (api.images)
 
 class ProductPackage(models.Model):
     """Gói thời hạn (6 tháng, 1 năm...) """
@@ -90,6 +113,7 @@ class ProductPackage(models.Model):
 class News(models.Model): # 
     title = models.CharField(max_length=255)
     image = models.ImageField(upload_to='news/')
+    variants = models.JSONField(default=dict, blank=True, editable=False)  # Ảnh thu nhỏ / WebP (api.images)
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -99,13 +123,20 @@ class Order(models.Model):
         ('pending', 'Chờ xác nhận'), # 
         ('confirmed', 'Đã xác nhận'), # Đang làm thủ tục
         ('active', 'Đang hiệu lực'), 
+        ('expired', 'Hết hiệu lực'),
         ('cancelled', 'Hủy đơn'),
     )
     code = models.CharField(max_length=20, unique=True)
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='orders')
+    # db_index=False: đã có index (user, created_at) bên dưới
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='orders', db_index=False)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     total_amount = models.DecimalField(max_digits=15, decimal_places=0)
     created_at = models.DateTimeField(auto_now_add=True)
+
+    # Thời gian hiệu lực: mở lúc Admin xác nhận đơn, dài bằng gói dài nhất (api.coverage.open_coverage, gọi ở pre_save);
+    # process_order_coverage chuyển confirmed -> active -> expired khi tới hạn
+    coverage_start = models.DateTimeField(null=True, blank=True)
+    coverage_end = models.DateTimeField(null=True, blank=True)
     
     # Admin xử lý 
     processed_by = models.ForeignKey(User, related_name='processed_orders', null=True, blank=True, on_delete=models.SET_NULL)
@@ -113,10 +144,51 @@ class Order(models.Model):
     # Nếu là DN mua cho nhân viên 
     beneficiary_note = models.TextField(blank=True, help_text="Danh sách người thụ hưởng")
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='order_status_created_idx'),  # Admin lọc trạng thái
+            models.Index(fields=['user', 'created_at'], name='order_user_created_idx'),  # "Đơn của tôi"
+            models.Index(fields=['status', 'coverage_start'], name='order_status_start_idx'),  # confirmed -> active
+            models.Index(fields=['status', 'coverage_end'], name='order_status_end_idx'),  # active -> expired, sắp hết hạn
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Nhớ status/total lúc load để signal tính delta cho OrderStatusSummary
+        loaded = dict(zip(field_names, values))
+        if 'status' in loaded and 'total_amount' in loaded:
+            instance._loaded_metrics = (loaded['status'], loaded['total_amount'])
+        return instance
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, related_name='items', on_delete=models.CASCADE)
     package = models.ForeignKey(ProductPackage, on_delete=models.CASCADE)
     quantity = models.IntegerField(default=1)
+    # Giá gói lúc đặt: đổi giá gói sau đó không làm lệch doanh thu của đơn cũ (analytics, dashboard)
+    unit_price = models.DecimalField(max_digits=15, decimal_places=0, blank=True)
+
+    def save(self, *args, **kwargs):
+        if self.unit_price is None:
+            self.unit_price = self.package.price
+        super().save(*args, **kwargs)
+
+class OrderBeneficiary(models.Model):
+    """Nhân viên được DN gán thụ hưởng đơn (thay cho beneficiary_note dạng text)"""
+    # db_index=False: unique (order, employee) đã là index theo order
+    order = models.ForeignKey(Order, related_name='beneficiaries', on_delete=models.CASCADE, db_index=False)
+    order_item = models.ForeignKey(OrderItem, related_name='beneficiaries', null=True, blank=True, on_delete=models.CASCADE)
+    # db_index=False: đã có index (employee, order) bên dưới
+    employee = models.ForeignKey(EnterpriseEmployee, related_name='coverages', on_delete=models.CASCADE, db_index=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['order', 'employee'], name='unique_order_beneficiary'),
+        ]
+        indexes = [
+            models.Index(fields=['employee', 'order'], name='beneficiary_employee_idx'),  # Tra cứu hiệu lực theo nhân viên
+        ]
     
 class Cart(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -134,12 +206,60 @@ class ConsultationRequest(models.Model): #
     user = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL) # Nếu đã login
     
     # Auto assign staff based on category 
-    assigned_staff = models.ForeignKey(User, related_name='consultations', null=True, blank=True, on_delete=models.SET_NULL)
+    assigned_staff = models.ForeignKey(User, related_name='consultations', null=True, blank=True, on_delete=models.SET_NULL, db_index=False)
     status = models.CharField(max_length=20, default='new')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['assigned_staff', 'status'], name='consult_staff_status_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Nhớ staff/status lúc load để signal cập nhật tải của staff (api.assignment)
+        loaded = dict(zip(field_names, values))
+        if 'assigned_staff_id' in loaded and 'status' in loaded:
+            instance._loaded_assignment = (loaded['assigned_staff_id'], loaded['status'])
+        return instance
+
 class ChatMessage(models.Model):
-    consultation = models.ForeignKey(ConsultationRequest, related_name='messages', on_delete=models.CASCADE)
+    consultation = models.ForeignKey(ConsultationRequest, related_name='messages', on_delete=models.CASCADE, db_index=False)
     sender = models.ForeignKey(User, on_delete=models.CASCADE) # Admin hoặc Staff hoặc User
     message = models.TextField()
-    timestamp = models.DateTimeField(auto_now_add=True)
\ No newline at end of file
+    timestamp = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['consultation', 'timestamp'], name='chat_consult_time_idx'),
+            models.Index(fields=['consultation', 'id'], name='chat_consult_id_idx'),  # ?since=<id>
+        ]
+
+# --- 5. METRICS ---
+class OrderStatusSummary(models.Model):
+    """Tổng hợp Order theo trạng thái, cập nhật dần qua signal -> Dashboard đọc vài dòng thay vì quét bảng Order"""
+    status = models.CharField(max_length=20, primary_key=True)
+    order_count = models.BigIntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=20, decimal_places=0, default=0)
+
+class DailySalesBucket(models.Model):
+    """
+    Fact theo ngày x danh mục x đối tượng x trạng thái đơn (doanh thu = unit_price x quantity của OrderItem).
+    order_count = số đơn có item rơi vào bucket -> cộng qua nhiều danh mục sẽ đếm trùng 1 đơn;
+    primary_order_count = mỗi đơn chỉ tính ở 1 bucket (nhóm đầu tiên theo category, target_audience)
+    -> dùng khi cộng không theo nhóm.
+    """
+    date = models.DateField()
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='sales_buckets')
+    target_audience = models.CharField(max_length=10)
+    status = models.CharField(max_length=20)
+    order_count = models.IntegerField(default=0)
+    primary_order_count = models.IntegerField(default=0)
+    item_count = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=20, decimal_places=0, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'category', 'target_audience', 'status'], name='unique_daily_sales_bucket'),
+        ]
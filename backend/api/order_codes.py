@@ -0,0 +1,82 @@
+"""
+Cấp mã đơn hàng không trùng, không cần round trip DB.
+
+Mã = ORD- + giây từ 2026 (base36, 6 ký tự) + node (4 ký tự) + counter (4 ký tự) = 18 ký tự,
+vừa Order.code (max_length=20). Mỗi process có node riêng (sinh lại sau fork),
+counter tăng dần trong process -> ~1.6 triệu mã / giây / process.
+"""
+import itertools
+import os
+import secrets
+import threading
+import time
+
+from django.db import IntegrityError, transaction
+
+from .models import Order
+
+ALPHABET = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+PREFIX = 'ORD-'
+NODE_WIDTH = 4
+COUNTER_WIDTH = 4
+COUNTER_SPACE = len(ALPHABET) ** COUNTER_WIDTH
+EPOCH = 1767225600  # 2026-01-01 UTC, 6 ký tự base36 đủ ~69 năm
+
+
+def to_base36(value, width):
+    chars = []
+    for _ in range(width):
+        value, rem = divmod(value, 36)
+        chars.append(ALPHABET[rem])
+    return ''.join(reversed(chars))
+
+
+class OrderCodeAllocator:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self._lock = threading.Lock()
+        # Node ngẫu nhiên trộn pid: các worker trên cùng/khác máy gần như không thể trùng
+        node = (secrets.randbits(20) ^ os.getpid()) % (len(ALPHABET) ** NODE_WIDTH)
+        self.node = to_base36(node, NODE_WIDTH)
+        self._counter = itertools.count(secrets.randbelow(COUNTER_SPACE))
+        self._second = None
+        self._issued = 0
+
+    def next_code(self):
+        with self._lock:
+            second = int(time.time())
+            if second != self._second:
+                self._second, self._issued = second, 0
+            elif self._issued >= COUNTER_SPACE:
+                # Hết counter trong giây hiện tại -> chờ sang giây mới
+                while int(time.time()) == second:
+                    time.sleep(0.001)
+                second = int(time.time())
+                self._second, self._issued = second, 0
+            self._issued += 1
+            counter = next(self._counter) % COUNTER_SPACE
+        return PREFIX + to_base36(second - EPOCH, 6) + self.node + to_base36(counter, COUNTER_WIDTH)
+
+
+allocator = OrderCodeAllocator()
+
+if hasattr(os, 'register_at_fork'):
+    # gunicorn fork worker từ master: process con phải có node/counter riêng
+    os.register_at_fork(after_in_child=allocator.reset)
+
+
+def next_order_code():
+    return allocator.next_code()
+
+
+def create_order(attempts=3, **fields):
+    """Tạo Order với mã mới; trùng mã (gần như không xảy ra) thì cấp mã khác và thử lại"""
+    for attempt in range(attempts):
+        try:
+            with transaction.atomic():
+                return Order.objects.create(code=next_order_code(), **fields)
+        except IntegrityError:
+            if attempt == attempts - 1:
+                raise
@@ -0,0 +1,44 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
+
+
+def max_page_size():
+    """Giới hạn cứng cho mọi trang, client/viewset không vượt qua được"""
+    return getattr(settings, 'API_MAX_PAGE_SIZE', 100)
+
+
+def view_page_size(view, default):
+    """ViewSet có thể khai báo `page_size` riêng, vẫn bị chặn bởi giới hạn cứng"""
+    return min(getattr(view, 'page_size', None) or default, max_page_size())
+
+
+class CatalogPagination(LimitOffsetPagination):
+    """?limit=&offset= cho catalog và các bảng nhỏ (mặc định toàn project)"""
+    default_limit = 20
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.max_limit = max_page_size()
+        self.default_limit = view_page_size(view, self.default_limit)
+        return super().paginate_queryset(queryset, request, view)
+
+
+class CreatedAtCursorPagination(CursorPagination):
+    """Cursor cho bảng chỉ append (Order, ConsultationRequest): ổn định khi có dòng mới chèn vào"""
+    ordering = ('-created_at', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.max_page_size = max_page_size()
+        self.page_size = view_page_size(view, self.page_size)
+        return super().paginate_queryset(queryset, request, view)
+
+
+class ChatMessageCursorPagination(CreatedAtCursorPagination):
+    ordering = ('-timestamp', '-id')
+    page_size = 50
+
+
+class CoverageEndCursorPagination(CreatedAtCursorPagination):
+    """Đơn sắp hết hạn: hết hạn sớm nhất trước"""
+    ordering = ('coverage_end', 'id')
@@ -0,0 +1,88 @@
+"""
+Băm / kiểm tra mật khẩu ngoài thread của request.
+
+- Hasher mặc định là scrypt (PASSWORD_HASHERS): nhẹ CPU hơn PBKDF2 1 triệu vòng nhưng tốn RAM -> khó dò bằng GPU.
+  Tham số đọc từ settings (PASSWORD_SCRYPT_*); đổi tham số / đổi hasher thì hash cũ được băm lại
+  ở lần đăng nhập đúng kế tiếp.
+- Việc băm chạy trong ThreadPoolExecutor giới hạn (PASSWORD_HASH_WORKERS thread / process, hashlib nhả GIL):
+  đợt đăng nhập dồn dập chỉ chiếm tối đa ngần ấy core, event loop ASGI và thread của request khác vẫn chạy.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import ScryptPasswordHasher, check_password, make_password
+
+from .forksafe import LazyExecutor
+
+
+class ConfigurableScryptPasswordHasher(ScryptPasswordHasher):
+    """scrypt của Django, tham số lấy từ settings (cùng thuật toán 'scrypt' -> đọc được hash cũ)"""
+
+    @property
+    def work_factor(self):
+        return getattr(settings, 'PASSWORD_SCRYPT_WORK_FACTOR', 2**14)
+
+    @property
+    def block_size(self):
+        return getattr(settings, 'PASSWORD_SCRYPT_BLOCK_SIZE', 8)
+
+    @property
+    def parallelism(self):
+        return getattr(settings, 'PASSWORD_SCRYPT_PARALLELISM', 1)
+
+
+# --- POOL ---
+get_executor = LazyExecutor('password-hash', 'PASSWORD_HASH_WORKERS', 2)
+
+
+def run_in_pool(func, *args):
+    return asyncio.wrap_future(get_executor().submit(func, *args))
+
+
+def hash_password(raw_password):
+    """make_password qua pool (view sync: thread chờ, nhưng số core đang băm vẫn bị giới hạn)"""
+    return get_executor().submit(make_password, raw_password).result()
+
+
+def verify_password(raw_password, encoded):
+    """(đúng mật khẩu?, cần băm lại bằng hasher mặc định?)"""
+    must_update = []
+    valid = check_password(raw_password, encoded, setter=must_update.append)
+    return valid, bool(must_update)
+
+
+# --- ĐĂNG NHẬP ---
+def find_user(username):
+    UserModel = get_user_model()
+    try:
+        return UserModel._default_manager.get_by_natural_key(username)
+    except UserModel.DoesNotExist:
+        return None
+
+
+class PooledModelBackend(ModelBackend):
+    """
+    ModelBackend, bản async (django.contrib.auth.aauthenticate) băm mật khẩu trong pool.
+    Đi qua AUTHENTICATION_BACKENDS -> sai mật khẩu vẫn phát user_login_failed như đăng nhập thường.
+    """
+
+    async def aauthenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(get_user_model().USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        user = await sync_to_async(find_user)(username)
+        if user is None:
+            # Vẫn băm 1 lần để thời gian trả lời không lộ username có tồn tại hay không
+            await run_in_pool(make_password, password)
+            return None
+        valid, must_update = await run_in_pool(verify_password, password, user.password)
+        if not valid or not self.user_can_authenticate(user):
+            return None
+        if must_update:
+            user.password = await run_in_pool(make_password, password)
+            await sync_to_async(user.save)(update_fields=['password'])
+        return user
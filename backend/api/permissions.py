@@ -1,3 +1,7 @@
+import hmac
+
+from django.conf import settings
+from django.db.models import Q
 from rest_framework import permissions
 
 class IsOwnerOrAdmin(permissions.BasePermission):
@@ -7,12 +11,42 @@ class IsOwnerOrAdmin(permissions.BasePermission):
             return True
         return obj.user == request.user
 
-class IsStaffSpecialist(permissions.BasePermission):
-    """Staff chỉ xem được tư vấn thuộc chuyên môn """
+def visible_consultations(user):
+    """
+    Tư vấn user được xem, lọc ngay trong DB (dùng trong get_queryset -> áp dụng cho cả list lẫn detail):
+    khách -> tư vấn của mình; staff -> đúng chuyên môn hoặc được giao; Admin -> tất cả
+    """
+    if not user.is_authenticated:
+        return Q(pk__in=[])
+    if user.role == 'customer':
+        return Q(user=user)
+    if user.role == 'staff':
+        condition = Q(assigned_staff=user)
+        if user.specialization:
+            condition |= Q(product__category__specialization_code=user.specialization)
+        return condition
+    return Q()
+
+class IsConsultationParticipant(permissions.BasePermission):
+    """Chat tư vấn: khách tạo yêu cầu, staff được giao, hoặc Admin"""
     def has_object_permission(self, request, view, obj):
-        if request.user.role == 'super_admin' or request.user.role == 'admin':
+        return is_consultation_participant(request.user, obj)
+
+
+def is_consultation_participant(user, consultation):
+    if not user or not user.is_authenticated:
+        return False
+    if user.role in ['admin', 'super_admin']:
+        return True
+    return user.pk in (consultation.user_id, consultation.assigned_staff_id)
+
+
+class IsAdminOrMetricsToken(permissions.BasePermission):
+    """Admin, hoặc Prometheus gửi header X-Metrics-Token khớp METRICS_TOKEN"""
+
+    def has_permission(self, request, view):
+        if request.user and request.user.is_staff:
             return True
-        if request.user.role == 'staff':
-            # Check logic chuyên môn
-            return obj.product.category.specialization_code == request.user.specialization
-        return False
\ No newline at end of file
+        expected = getattr(settings, 'METRICS_TOKEN', None)
+        provided = request.headers.get('X-Metrics-Token', '')
+        return bool(expected) and hmac.compare_digest(provided.encode(), expected.encode())
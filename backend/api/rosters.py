@@ -0,0 +1,233 @@
+"""
+Nhập / xuất danh sách nhân viên doanh nghiệp (EnterpriseEmployee) hàng loạt.
+
+- Import: đọc file CSV (hoặc XLSX nếu cài openpyxl) theo từng dòng, kiểm tra theo lô ROSTER_CHUNK_SIZE dòng,
+  bỏ qua dòng trùng SĐT / email (trong file hoặc đã có trong DB) và lưu bằng bulk_create.
+- Export: CSV sinh dần từ queryset.iterator() -> không giữ cả danh sách trong bộ nhớ; ô bắt đầu bằng
+  = + - @ được thêm dấu ' để Excel không chạy như công thức.
+"""
+import codecs
+import csv
+import re
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.db.models import Q, Value
+from django.db.models.functions import Lower, Replace
+
+from .models import EnterpriseEmployee
+
+COLUMNS = ['full_name', 'phone', 'email', 'address']
+HEADERS = ['Họ tên', 'Số điện thoại', 'Email', 'Địa chỉ']
+
+# Tên cột chấp nhận trong file (so sánh sau khi strip + lower)
+HEADER_ALIASES = {
+    'full_name': 'full_name', 'họ tên': 'full_name', 'họ và tên': 'full_name', 'ho ten': 'full_name',
+    'phone': 'phone', 'số điện thoại': 'phone', 'sđt': 'phone', 'sdt': 'phone',
+    'email': 'email',
+    'address': 'address', 'địa chỉ': 'address', 'dia chi': 'address',
+}
+
+MAX_REPORTED_ERRORS = 1000
+# Ký tự phân cách hay gặp trong SĐT đã lưu ("0901 234 567", "(090) 123-4567", "+84 ...")
+PHONE_SEPARATORS = [' ', '-', '.', '(', ')', '+']
+# Ô CSV bắt đầu bằng các ký tự này bị Excel / Sheets hiểu là công thức
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+PHONE_MAX_LENGTH = EnterpriseEmployee._meta.get_field('phone').max_length
+NAME_MAX_LENGTH = EnterpriseEmployee._meta.get_field('full_name').max_length
+
+
+class RosterFileError(Exception):
+    """File không đọc được (sai định dạng, thiếu cột, thiếu openpyxl)"""
+
+
+# --- ĐỌC FILE ---
+def read_csv(upload):
+    reader = csv.reader(codecs.iterdecode(upload, 'utf-8-sig'))
+    try:
+        yield from reader
+    except UnicodeDecodeError:
+        raise RosterFileError('File CSV phải dùng mã hóa UTF-8')
+
+
+def read_xlsx(upload):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise RosterFileError('Server chưa hỗ trợ file XLSX, vui lòng dùng CSV')
+    # read_only: đọc dần từng dòng thay vì nạp cả sheet
+    try:
+        workbook = load_workbook(upload, read_only=True, data_only=True)
+    except Exception:  # zip hỏng, không phải file Excel...
+        raise RosterFileError('File XLSX không đọc được')
+    try:
+        for row in workbook.active.iter_rows(values_only=True):
+            yield ['' if value is None else str(value) for value in row]
+    finally:
+        workbook.close()
+
+
+def iter_rows(upload):
+    """(số dòng trong file, dict theo COLUMNS) cho từng dòng dữ liệu"""
+    rows = read_xlsx(upload) if upload.name.lower().endswith('.xlsx') else read_csv(upload)
+    header = next(rows, None)
+    if header is None:
+        raise RosterFileError('File trống')
+    columns = [HEADER_ALIASES.get(str(name).strip().lower()) for name in header]
+    if 'full_name' not in columns:
+        raise RosterFileError('Thiếu cột họ tên (full_name)')
+    for number, values in enumerate(rows, start=2):
+        row = {column: str(value).strip() for column, value in zip(columns, values) if column}
+        if any(row.values()):
+            yield number, row
+
+
+def phone_digits(field='phone'):
+    """Biểu thức SQL: SĐT đã lưu bỏ ký tự phân cách (so với normalize_phone ở phía Python)"""
+    expression = field
+    for separator in PHONE_SEPARATORS:
+        expression = Replace(expression, Value(separator), Value(''))
+    return expression
+
+
+def normalize_phone(phone):
+    digits = re.sub(r'\D', '', phone)
+    if digits.startswith('84') and len(digits) > 10:
+        digits = '0' + digits[2:]
+    return digits
+
+
+def clean_row(row):
+    """Trả về (dữ liệu đã chuẩn hóa, dict lỗi theo cột)"""
+    data = {
+        'full_name': row.get('full_name', ''),
+        'phone': normalize_phone(row.get('phone', '')),
+        'email': row.get('email', '').lower(),
+        'address': row.get('address', ''),
+    }
+    errors = {}
+    if not data['full_name']:
+        errors['full_name'] = 'Bắt buộc'
+    elif len(data['full_name']) > NAME_MAX_LENGTH:
+        errors['full_name'] = f'Tối đa {NAME_MAX_LENGTH} ký tự'
+    if row.get('phone') and not 9 <= len(data['phone']) <= PHONE_MAX_LENGTH:
+        errors['phone'] = 'Số điện thoại không hợp lệ'
+    if data['email']:
+        try:
+            validate_email(data['email'])
+        except ValidationError:
+            errors['email'] = 'Email không hợp lệ'
+    if not data['phone'] and not data['email']:
+        errors.setdefault('phone', 'Cần số điện thoại hoặc email')
+    return data, errors
+
+
+# --- IMPORT ---
+class RosterImport:
+    def __init__(self, enterprise, chunk_size=None, batch_size=None):
+        self.enterprise = enterprise
+        self.chunk_size = chunk_size or getattr(settings, 'ROSTER_CHUNK_SIZE', 1000)
+        self.batch_size = batch_size or getattr(settings, 'ROSTER_BATCH_SIZE', 500)
+        self.seen_phones = set()
+        self.seen_emails = set()
+        self.created = 0
+        self.duplicates = 0
+        self.error_count = 0
+        self.errors = []
+
+    def add_error(self, number, errors):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': number, 'errors': errors})
+
+    def existing_keys(self, chunk):
+        """
+        SĐT / email đã có trong DB của doanh nghiệp, chỉ tra các giá trị trong lô (1 query).
+        Dữ liệu cũ có thể chưa chuẩn hóa ("0901 234 567", "+84...", email hoa) -> so sánh sau khi chuẩn hóa cả 2 phía.
+        """
+        phones = {data['phone'] for _, data in chunk if data['phone']}
+        emails = {data['email'] for _, data in chunk if data['email']}
+        # "+84 901..." trong DB -> bỏ ký tự phân cách còn "84901..."
+        candidates = phones | {'84' + phone[1:] for phone in phones if phone.startswith('0')}
+        existing = (
+            EnterpriseEmployee.objects.filter(enterprise=self.enterprise)
+            .annotate(phone_key=phone_digits(), email_key=Lower('email'))
+            .filter(Q(phone_key__in=candidates) | Q(email_key__in=emails))
+            .values_list('phone', 'email')
+        )
+        found_phones, found_emails = set(), set()
+        for phone, email in existing:
+            found_phones.add(normalize_phone(phone))
+            found_emails.add(email.lower())
+        return found_phones & phones, found_emails & emails
+
+    def process_chunk(self, chunk):
+        existing_phones, existing_emails = self.existing_keys(chunk)
+        employees = []
+        for number, data in chunk:
+            phone, email = data['phone'], data['email']
+            if (phone and (phone in existing_phones or phone in self.seen_phones)) or (
+                email and (email in existing_emails or email in self.seen_emails)
+            ):
+                self.duplicates += 1
+                self.add_error(number, {'duplicate': 'Trùng số điện thoại hoặc email, đã bỏ qua'})
+                continue
+            if phone:
+                self.seen_phones.add(phone)
+            if email:
+                self.seen_emails.add(email)
+            employees.append(EnterpriseEmployee(enterprise=self.enterprise, **data))
+        EnterpriseEmployee.objects.bulk_create(employees, batch_size=self.batch_size)
+        self.created += len(employees)
+
+    def run(self, upload):
+        chunk = []
+        with transaction.atomic():
+            for number, row in iter_rows(upload):
+                data, errors = clean_row(row)
+                if errors:
+                    self.add_error(number, errors)
+                    continue
+                chunk.append((number, data))
+                if len(chunk) >= self.chunk_size:
+                    self.process_chunk(chunk)
+                    chunk = []
+            if chunk:
+                self.process_chunk(chunk)
+        return self.summary()
+
+    def summary(self):
+        return {
+            'created': self.created,
+            'duplicates': self.duplicates,
+            'error_count': self.error_count,
+            'errors': sorted(self.errors, key=lambda error: error['row']),
+        }
+
+
+def import_roster(enterprise, upload, **options):
+    return RosterImport(enterprise, **options).run(upload)
+
+
+# --- EXPORT ---
+class Echo:
+    """File giả cho csv.writer: write() trả lại luôn dòng vừa ghi"""
+
+    def write(self, value):
+        return value
+
+
+def escape_cell(value):
+    """Chặn CSV injection: '=HYPERLINK(...)' -> "'=HYPERLINK(...)" (hiện như chữ)"""
+    value = str(value)
+    return "'" + value if value.startswith(FORMULA_PREFIXES) else value
+
+
+def export_roster(queryset, chunk_size=2000):
+    """Sinh từng dòng CSV (có BOM để Excel đọc đúng tiếng Việt)"""
+    writer = csv.writer(Echo())
+    yield '\ufeff' + writer.writerow(HEADERS)
+    for values in queryset.values_list(*COLUMNS).iterator(chunk_size=chunk_size):
+        yield writer.writerow([escape_cell(value) for value in values])
@@ -0,0 +1,130 @@
+"""
+Tìm kiếm sản phẩm full-text, không phân biệt dấu tiếng Việt ("suc khoe" khớp "Sức khỏe").
+
+- ProductSearchDocument giữ bản đã bỏ dấu của tên / mô tả / danh mục / đơn vị cung cấp.
+- SQLite: bảng FTS5 external-content (tạo ở migration 0006, trigger tự đồng bộ), xếp hạng bm25.
+- PostgreSQL: GIN index trên to_tsvector('simple', ...), xếp hạng ts_rank.
+- DB khác: LIKE trên bản bỏ dấu (không xếp hạng).
+Mọi từ khóa đều khớp tiền tố ("bao hi" khớp "bảo hiểm").
+"""
+import re
+import unicodedata
+
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, When
+from rest_framework.filters import BaseFilterBackend
+
+from .cache import is_admin_request
+from .models import Product, ProductSearchDocument
+
+FTS_TABLE = 'api_productsearch_fts'
+MAX_RESULTS = 1000
+PUBLIC_COLUMNS = ['name', 'description', 'category_name']
+ADMIN_COLUMNS = PUBLIC_COLUMNS + ['provider_name']
+
+# Trọng số bm25 theo thứ tự cột: name, description, category_name, provider_name
+BM25_WEIGHTS = '10.0, 1.0, 4.0, 2.0'
+
+PG_WEIGHTS = {'name': 'A', 'category_name': 'B', 'provider_name': 'B', 'description': 'C'}
+
+
+def fold(text):
+    """Bỏ dấu + chữ thường: 'Sức Khỏe Đặc biệt' -> 'suc khoe dac biet'"""
+    text = (text or '').replace('đ', 'd').replace('Đ', 'D')
+    text = unicodedata.normalize('NFD', text)
+    return ''.join(ch for ch in text if not unicodedata.combining(ch)).lower()
+
+
+def tokenize(term):
+    return re.findall(r'[a-z0-9]+', fold(term))
+
+
+def pg_vector(columns):
+    return ' || '.join(
+        f"setweight(to_tsvector('simple', coalesce({column}, '')), '{PG_WEIGHTS[column]}')" for column in columns
+    )
+
+
+# --- ĐỒNG BỘ INDEX ---
+def index_products(products):
+    """Upsert document cho các product (product.category nên được select_related)"""
+    documents = [
+        ProductSearchDocument(
+            product_id=product.pk,
+            name=fold(product.name),
+            description=fold(product.description),
+            category_name=fold(product.category.name),
+            provider_name=fold(product.provider_name),
+        )
+        for product in products
+    ]
+    ProductSearchDocument.objects.bulk_create(
+        documents,
+        update_conflicts=True,
+        unique_fields=['product'],
+        update_fields=['name', 'description', 'category_name', 'provider_name'],
+        batch_size=500,
+    )
+
+
+def reindex_all(batch_size=500):
+    queryset = Product.objects.select_related('category').order_by('pk')
+    count = 0
+    for start in range(0, queryset.count(), batch_size):
+        batch = list(queryset[start:start + batch_size])
+        index_products(batch)
+        count += len(batch)
+    return count
+
+
+# --- TRUY VẤN ---
+def search_product_ids(term, include_admin=False, limit=MAX_RESULTS):
+    """Danh sách product_id khớp `term`, đã xếp hạng (liên quan nhất trước)"""
+    tokens = tokenize(term)
+    if not tokens:
+        return []
+    columns = ADMIN_COLUMNS if include_admin else PUBLIC_COLUMNS
+
+    if connection.vendor == 'sqlite':
+        match = '{%s} : (%s)' % (' '.join(columns), ' '.join(f'"{token}"*' for token in tokens))
+        sql = (
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+            f'ORDER BY bm25({FTS_TABLE}, {BM25_WEIGHTS}) LIMIT %s'
+        )
+        params = [match, limit]
+    elif connection.vendor == 'postgresql':
+        vector = pg_vector(columns)
+        query = "to_tsquery('simple', %s)"
+        sql = (
+            f'SELECT product_id FROM {ProductSearchDocument._meta.db_table} '
+            f'WHERE ({vector}) @@ {query} ORDER BY ts_rank({vector}, {query}) DESC LIMIT %s'
+        )
+        tsquery = ' & '.join(f'{token}:*' for token in tokens)
+        params = [tsquery, tsquery, limit]
+    else:
+        condition = Q()
+        for token in tokens:
+            token_condition = Q()
+            for column in columns:
+                token_condition |= Q(**{f'{column}__contains': token})
+            condition &= token_condition
+        return list(ProductSearchDocument.objects.filter(condition).values_list('product_id', flat=True)[:limit])
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+class ProductSearchFilter(BaseFilterBackend):
+    """Thay SearchFilter (LIKE %term%): ?search=suc khoe -> kết quả xếp theo độ liên quan"""
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        term = request.query_params.get(self.search_param, '').strip()
+        if not term:
+            return queryset
+        ids = search_product_ids(term, include_admin=is_admin_request(request))
+        if not ids:
+            return queryset.none()
+        ranking = Case(*[When(pk=pk, then=position) for position, pk in enumerate(ids)], output_field=IntegerField())
+        return queryset.filter(pk__in=ids).order_by(ranking)
@@ -1,7 +1,9 @@
 from rest_framework import serializers
+from .images import srcset
+from .passwords import hash_password
 from .models import (
     User, Product, ProductImage, ProductPackage, 
-    Order, OrderItem, EnterpriseEmployee, ChatMessage,
+    Order, OrderItem, OrderBeneficiary, EnterpriseEmployee, ChatMessage,
     CartItem, ConsultationRequest, News
 )
 
@@ -23,8 +25,13 @@ class RegisterSerializer(serializers.ModelSerializer):
         if 'username' not in validated_data and 'phone' in validated_data:
             validated_data['username'] = validated_data['phone']
             
-        # Tạo user với password đã mã hóa
-        user = User.objects.create_user(**validated_data)
+        # Như create_user nhưng băm mật khẩu qua pool giới hạn (api/passwords.py)
+        password = validated_data.pop('password')
+        validated_data['username'] = User.normalize_username(validated_data['username'])
+        validated_data['email'] = User.objects.normalize_email(validated_data.get('email'))
+        user = User(**validated_data)
+        user.password = hash_password(password)
+        user.save()
         return user
 
 class EnterpriseEmployeeSerializer(serializers.ModelSerializer):
@@ -35,9 +42,19 @@ class EnterpriseEmployeeSerializer(serializers.ModelSerializer):
 
 # --- 2. PRODUCT SERIALIZERS ---
 class ProductImageSerializer(serializers.ModelSerializer):
+    # srcset WebP + JPEG (rỗng khi ảnh chưa xử lý xong -> frontend dùng `image`)
+    srcset = serializers.SerializerMethodField()
+    srcset_jpeg = serializers.SerializerMethodField()
+
     class Meta:
         model = ProductImage
-        fields = ['image']
+        fields = ['image', 'srcset', 'srcset_jpeg']
+
+    def get_srcset(self, obj):
+        return srcset(obj.image, obj.variants, 'webp', self.context.get('request'))
+
+    def get_srcset_jpeg(self, obj):
+        return srcset(obj.image, obj.variants, 'jpeg', self.context.get('request'))
 
 class ProductPackageSerializer(serializers.ModelSerializer):
     class Meta:
@@ -75,7 +92,8 @@ class CartItemSerializer(serializers.ModelSerializer):
 class OrderItemSerializer(serializers.ModelSerializer):
     product_name = serializers.CharField(source='package.product.name', read_only=True)
     duration = serializers.CharField(source='package.duration_label', read_only=True)
-    price = serializers.DecimalField(source='package.price', max_digits=15, decimal_places=0, read_only=True)
+    # Giá lúc đặt, không phải giá hiện tại của gói
+    price = serializers.DecimalField(source='unit_price', max_digits=15, decimal_places=0, read_only=True)
 
     class Meta:
         model = OrderItem
@@ -88,6 +106,17 @@ class OrderSerializer(serializers.ModelSerializer):
         model = Order
         fields = '__all__'
 
+class OrderBeneficiarySerializer(serializers.ModelSerializer):
+    employee_name = serializers.CharField(source='employee.full_name', read_only=True)
+
+    class Meta:
+        model = OrderBeneficiary
+        fields = ['id', 'order', 'order_item', 'employee', 'employee_name', 'created_at']
+
+class BeneficiaryAssignmentSerializer(serializers.Serializer):
+    employees = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=10000)
+    order_item = serializers.IntegerField(required=False, allow_null=True)
+
 # --- 4. CHAT & NEWS SERIALIZERS ---
 class ChatMessageSerializer(serializers.ModelSerializer):
     sender_name = serializers.CharField(source='sender.username', read_only=True)
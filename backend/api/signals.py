@@ -0,0 +1,129 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .analytics import item_orders, record_item_changes, record_sales_deleted, record_sales_status_changed
+from .assignment import assign_on_create, record_consultation_deleted, record_consultation_saved, record_staff_changed
+from .authentication import invalidate_cached_user
+from .cache import bump_catalog_version
+from .coverage import open_coverage
+from .images import schedule_variants
+from .metrics import record_order_deleted, record_order_saved
+from .models import Category, ConsultationRequest, News, Order, OrderItem, Product, ProductImage, ProductPackage, User
+from .search import index_products
+
+
+# --- CATALOG CACHE ---
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=ProductImage)
+@receiver([post_save, post_delete], sender=ProductPackage)
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=News)
+def invalidate_catalog_cache(sender, **kwargs):
+    # Đổi version sau khi commit: request đọc song song trong lúc transaction chưa commit
+    # sẽ dựng payload từ dữ liệu cũ và lưu dưới version mới nếu đổi sớm
+    transaction.on_commit(bump_catalog_version)
+
+
+# --- PRODUCT SEARCH INDEX ---
+@receiver(post_save, sender=Product)
+def index_product_on_save(sender, instance, **kwargs):
+    index_products([instance])
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_products(sender, instance, created, **kwargs):
+    if not created:
+        index_products(Product.objects.filter(category=instance).select_related('category'))
+
+
+# --- THỜI GIAN HIỆU LỰC ---
+@receiver(pre_save, sender=Order)
+def open_coverage_on_confirm(sender, instance, raw=False, **kwargs):
+    if not raw and not instance._state.adding:
+        open_coverage(instance)
+
+
+# --- DASHBOARD METRICS & ANALYTICS ---
+@receiver(post_save, sender=Order)
+def update_order_metrics_on_save(sender, instance, created, **kwargs):
+    # Đơn mới chưa có item -> bucket được cộng khi item được tạo (signal OrderItem / checkout)
+    previous = getattr(instance, '_loaded_metrics', None)
+    if not created and previous is not None:
+        record_sales_status_changed(instance, previous[0])
+    # Cập nhật summary sau cùng vì hàm này ghi đè _loaded_metrics
+    record_order_saved(instance, created)
+
+
+@receiver(pre_delete, sender=Order)
+def update_sales_buckets_on_delete(sender, instance, **kwargs):
+    record_sales_deleted(instance)
+
+
+@receiver(post_delete, sender=Order)
+def update_order_metrics_on_delete(sender, instance, **kwargs):
+    record_order_deleted(instance)
+
+
+@receiver([pre_save, pre_delete], sender=OrderItem)
+def remove_item_sales(sender, instance, signal, raw=False, origin=None, **kwargs):
+    # Xóa cả đơn: pre_delete của Order đã trừ hết item
+    if raw or isinstance(origin, Order) or getattr(origin, 'model', None) is Order:
+        return
+    instance._sales_orders = item_orders(instance, saving=signal is pre_save)
+    record_item_changes(instance._sales_orders, -1)
+
+
+@receiver([post_save, post_delete], sender=OrderItem)
+def add_item_sales(sender, instance, **kwargs):
+    record_item_changes(instance.__dict__.pop('_sales_orders', ()), 1)
+
+
+# --- TẢI CỦA STAFF (GIAO TƯ VẤN) ---
+@receiver(pre_save, sender=ConsultationRequest)
+def assign_staff_on_create(sender, instance, raw=False, **kwargs):
+    if instance._state.adding and not raw:
+        assign_on_create(instance)
+
+
+@receiver(post_save, sender=ConsultationRequest)
+def update_staff_load_on_save(sender, instance, created, **kwargs):
+    record_consultation_saved(instance, created)
+
+
+@receiver(post_delete, sender=ConsultationRequest)
+def update_staff_load_on_delete(sender, instance, **kwargs):
+    record_consultation_deleted(instance)
+
+
+@receiver(post_save, sender=User)
+def reload_staff_load_on_staff_save(sender, instance, update_fields=None, **kwargs):
+    record_staff_changed(instance, update_fields)
+
+
+@receiver(post_delete, sender=User)
+def reload_staff_load_on_staff_delete(sender, instance, **kwargs):
+    record_staff_changed(instance)
+
+
+# --- CACHE USER (XÁC THỰC JWT) ---
+@receiver([post_save, post_delete], sender=User)
+def invalidate_user_cache(sender, instance, **kwargs):
+    pk = instance.pk
+    invalidate_cached_user(pk)
+    # Request khác có thể đã cache lại bản cũ trước khi transaction commit
+    transaction.on_commit(lambda: invalidate_cached_user(pk))
+
+
+# --- ẢNH THU NHỎ / WEBP ---
+@receiver(post_save, sender=ProductImage)
+@receiver(post_save, sender=News)
+def generate_image_variants(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_variants(instance, 'image', 'variants')
+
+
+@receiver(post_save, sender=User)
+def generate_avatar_variants(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_variants(instance, 'avatar', 'avatar_variants')
@@ -0,0 +1,137 @@
+"""
+Lưu và phục vụ file media (ảnh sản phẩm, tin tức, avatar).
+
+- HashedMediaStorage: tên file kèm hash nội dung (a.jpg -> a.3f9c2b7d1e0a.jpg). Nội dung đổi = URL đổi,
+  nên file có hash được cache vĩnh viễn (Cache-Control: immutable); cùng nội dung upload lại dùng chung file.
+- serve_file: trả file kèm Last-Modified / 304, hỗ trợ Range (206) cho client tải tiếp / tua,
+  hoặc giao cho web server gửi file (X-Accel-Redirect của nginx, X-Sendfile của Apache) theo MEDIA_SENDFILE.
+Static (collectstatic) dùng ManifestStaticFilesStorage khi DEBUG = False -> cũng có hash trong tên.
+"""
+import hashlib
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+HASH_LENGTH = 12
+# Tên do HashedMediaStorage / ManifestStaticFilesStorage sinh ra: <tên>.<12 hex>.<đuôi>
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+RANGE_HEADER = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+class HashedMediaStorage(FileSystemStorage):
+    def save(self, name, content, max_length=None):
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        root, extension = os.path.splitext(name)
+        hashed = f'{root}.{digest.hexdigest()[:HASH_LENGTH]}{extension.lower()}'
+        if self.exists(hashed):
+            return hashed
+        return super().save(hashed, content, max_length)
+
+
+# --- PHỤC VỤ FILE ---
+def cache_control(path):
+    if HASHED_NAME.search(path):
+        return IMMUTABLE_CACHE_CONTROL
+    # File cũ không có hash (upload trước khi đổi storage): vẫn cho cache nhưng phải kiểm tra lại
+    return f'public, max-age={getattr(settings, "MEDIA_UNHASHED_MAX_AGE", 86400)}'
+
+
+def read_range(handle, start, length):
+    try:
+        handle.seek(start)
+        while length > 0:
+            chunk = handle.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        handle.close()
+
+
+def parse_range(header, size):
+    """(start, end) cho Range 1 đoạn; None nếu không có / không hỗ trợ; ValueError nếu ngoài file"""
+    match = RANGE_HEADER.match(header or '')
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    else:
+        start, end = max(size - int(last), 0), size - 1
+    if start > end or start >= size:
+        raise ValueError(header)
+    return start, end
+
+
+def serve_file(request, path, document_root, accel_prefix):
+    try:
+        full_path = safe_join(document_root, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+
+    stat = os.stat(full_path)
+    if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), stat.st_mtime):
+        response = HttpResponseNotModified()
+        response['Cache-Control'] = cache_control(path)
+        return response
+
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+    backend = getattr(settings, 'MEDIA_SENDFILE', None)
+    if backend == 'x-accel':
+        # nginx: location /protected-media/ { internal; alias <MEDIA_ROOT>/; }
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = accel_prefix + path
+    elif backend == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = full_path
+    else:
+        try:
+            byte_range = parse_range(request.META.get('HTTP_RANGE'), stat.st_size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+            return response
+        if byte_range is None:
+            # FileResponse dùng wsgi.file_wrapper (sendfile của server) nếu có
+            response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+        else:
+            start, end = byte_range
+            response = StreamingHttpResponse(
+                read_range(open(full_path, 'rb'), start, end - start + 1), status=206, content_type=content_type
+            )
+            response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+            response['Content-Length'] = str(end - start + 1)
+        response['Accept-Ranges'] = 'bytes'
+
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Cache-Control'] = cache_control(path)
+    return response
+
+
+def serve_media(request, path):
+    return serve_file(request, path, settings.MEDIA_ROOT, getattr(settings, 'MEDIA_ACCEL_PREFIX', '/protected-media/'))
+
+
+def serve_static(request, path):
+    # Chỉ dùng khi không có web server phía trước; DEBUG đã có runserver của staticfiles
+    return serve_file(request, path, settings.STATIC_ROOT, getattr(settings, 'STATIC_ACCEL_PREFIX', '/protected-static/'))
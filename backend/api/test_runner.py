@@ -0,0 +1,36 @@
+"""
+Test runner của project (TEST_RUNNER trong settings).
+
+Cache catalog (file), store throttle và store số liệu request (SQLite) trỏ vào 1 thư mục tạm trong suốt lượt
+chạy test: ApiTestCase xóa các store này giữa các test, middleware đo request ghi vào store ->
+không được đụng tới .cache của máy dev.
+"""
+import os
+import tempfile
+
+from django.conf import settings
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+
+class IsolatedStoresTestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.store_dir = tempfile.TemporaryDirectory(prefix='api-tests-')
+        # Giữ backend như settings, chỉ đổi chỗ lưu của cache dạng file
+        test_caches = {
+            alias: {**config, 'LOCATION': os.path.join(self.store_dir.name, alias)}
+            if config['BACKEND'].endswith('FileBasedCache') else config
+            for alias, config in settings.CACHES.items()
+        }
+        self.store_settings = override_settings(
+            CACHES=test_caches,
+            THROTTLE_STORE_PATH=os.path.join(self.store_dir.name, 'throttle.sqlite3'),
+            INSTRUMENTATION_STORE_PATH=os.path.join(self.store_dir.name, 'metrics.sqlite3'),
+        )
+        self.store_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.store_settings.disable()
+        self.store_dir.cleanup()
+        super().teardown_test_environment(**kwargs)
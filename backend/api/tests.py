@@ -1,3 +1,1484 @@
-from django.test import TestCase
+import io
+import json
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import closing, contextmanager
+from datetime import timedelta
+from io import BytesIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.signals import user_login_failed
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from asgiref.testing import ApplicationCommunicator
+from rest_framework.test import APIClient
+from PIL import Image
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .models import (
+    Cart, CartItem, Category, ChatMessage, ConsultationRequest, DailySalesBucket, EnterpriseEmployee, News, Order, OrderBeneficiary, OrderItem, OrderStatusSummary,
+    Product, ProductImage, ProductPackage, RevokedToken, User
+)
+from .analytics import rebuild_sales_buckets
+from .assignment import staff_load_index
+from .authentication import invalidate_cached_user, local_user_cache
+from .chat import broadcast_saved_message
+from . import instrumentation
+from .coverage import coverage_window, process_order_coverage
+from . import passwords
+from .order_codes import create_order, next_order_code
+from .throttling import TokenBucketStore, get_store
+from .tokens import prune_revoked_tokens, revoke_token
+from .views import ConsultationRequestViewSet
+
+
+def make_category(slug='suc-khoe', specialization_code='health'):
+    return Category.objects.create(name='Sức khỏe', slug=slug, specialization_code=specialization_code)
+
+
+def make_product(category, name='Bảo hiểm sức khỏe', is_featured=False, packages=1, images=1):
+    product = Product.objects.create(
+        category=category,
+        name=name,
+        provider_name='TIS',
+        description='Mô tả',
+        is_featured=is_featured,
+        target_audience='ind',
+    )
+    for i in range(packages):
+        ProductPackage.objects.create(product=product, duration_label=f'{i + 1} Năm', price=1000000, duration_days=365)
+    for i in range(images):
+        ProductImage.objects.create(product=product, image=f'products/{product.pk}_{i}.jpg')
+    return product
+
+
+def make_user(username='khach', role='customer', **extra):
+    if role in ['admin', 'staff', 'super_admin']:
+        extra.setdefault('email', f'{username}@tisbroker.com')
+    return User.objects.create_user(username=username, password='Matkhau123.', role=role, **extra)
+
+
+class ApiTestCase(TestCase):
+    def setUp(self):
+        # Catalog dùng cache, throttle dùng store chung, tải staff giữ trong bộ nhớ -> reset giữa các test
+        for cache in caches.all():
+            cache.clear()
+        get_store().clear()
+        staff_load_index.invalidate()
+        local_user_cache.clear()
+        instrumentation.registry.reset()
+        instrumentation.get_store().clear()
+        self.client = APIClient()
+
+    @contextmanager
+    def commit(self):
+        """Chạy on_commit (đổi version catalog, ...) như khi transaction commit; ảnh giả của make_product không đem đi xử lý"""
+        with mock.patch('api.signals.schedule_variants'), self.captureOnCommitCallbacks(execute=True):
+            yield
+
+
+# --- PRODUCT ---
+class ProductQueryCountTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.category = make_category()
+
+    def test_list_query_count_is_constant(self):
+        # COUNT (phân trang) + products + images + packages
+        make_product(self.category, packages=2, images=2)
+        with self.assertNumQueries(4):
+            response = self.client.get('/api/products/')
+        self.assertEqual(response.status_code, 200)
+
+        with self.commit():
+            for i in range(10):
+                make_product(self.category, name=f'SP {i}', packages=2, images=2)
+        with self.assertNumQueries(4):
+            response = self.client.get('/api/products/')
+        self.assertEqual(len(response.json()['results']), 11)
+
+    def test_featured_query_count_is_constant(self):
+        for i in range(5):
+            make_product(self.category, name=f'SP {i}', is_featured=True, packages=3)
+        make_product(self.category, name='Thường')
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/products/featured/')
+        self.assertEqual(len(response.json()), 5)
+        self.assertEqual(len(response.json()[0]['packages']), 3)
+
+    def test_retrieve_hides_provider_name_for_anonymous(self):
+        product = make_product(self.category)
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/api/products/{product.pk}/')
+        self.assertNotIn('provider_name', response.json())
+
+
+# --- CATALOG CACHE ---
+class CatalogCacheTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.category = make_category()
+        self.product = make_product(self.category, is_featured=True)
+
+    def test_second_read_is_served_from_cache(self):
+        self.client.get('/api/products/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/products/')
+        self.assertEqual(response.json()['count'], 1)
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+
+    def test_save_invalidates_cached_payload(self):
+        self.client.get('/api/products/featured/')
+        with self.commit():
+            make_product(self.category, name='SP mới', is_featured=True)
+        response = self.client.get('/api/products/featured/')
+        self.assertEqual(len(response.json()), 2)
+
+        with self.commit():
+            News.objects.create(title='Tin', image='news/a.jpg', content='...')
+        self.assertEqual(self.client.get('/api/news/').json()['count'], 1)
+
+    def test_conditional_get_returns_not_modified(self):
+        etag = self.client.get('/api/categories/')['ETag']
+        response = self.client.get('/api/categories/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        with self.commit():
+            Category.objects.create(name='Xe', slug='xe', specialization_code='vehicle')
+        response = self.client.get('/api/categories/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_admin_and_public_payloads_are_cached_separately(self):
+        self.assertNotIn('provider_name', self.client.get('/api/products/').json()['results'][0])
+
+        admin = make_user('quantri', role='admin')
+        self.client.force_authenticate(admin)
+        admin_response = self.client.get('/api/products/')
+        self.assertEqual(admin_response.json()['results'][0]['provider_name'], 'TIS')
+
+        self.client.force_authenticate(None)
+        public_response = self.client.get('/api/products/')
+        self.assertNotIn('provider_name', public_response.json()['results'][0])
+        self.assertNotEqual(admin_response['ETag'], public_response['ETag'])
+
+    def test_version_is_bumped_only_after_commit(self):
+        self.client.get('/api/products/')
+        with self.commit():
+            self.product.name = 'Tên mới'
+            self.product.save()
+            # Request đọc song song trước khi commit vẫn thấy payload cũ dưới version cũ
+            with self.assertNumQueries(0):
+                self.assertEqual(self.client.get('/api/products/').json()['results'][0]['name'], 'Bảo hiểm sức khỏe')
+        self.assertEqual(self.client.get('/api/products/').json()['results'][0]['name'], 'Tên mới')
+
+    @override_settings(ALLOWED_HOSTS=['a.example.com', 'b.example.com'])
+    def test_payload_is_cached_per_host_and_scheme(self):
+        # URL ảnh trong payload là URL tuyệt đối
+        first = self.client.get('/api/products/', HTTP_HOST='a.example.com').json()
+        with self.assertNumQueries(4):
+            second = self.client.get('/api/products/', HTTP_HOST='b.example.com').json()
+        with self.assertNumQueries(4):
+            third = self.client.get('/api/products/', HTTP_HOST='b.example.com', secure=True).json()
+        self.assertTrue(first['results'][0]['images'][0]['image'].startswith('http://a.example.com/'))
+        self.assertTrue(second['results'][0]['images'][0]['image'].startswith('http://b.example.com/'))
+        self.assertTrue(third['results'][0]['images'][0]['image'].startswith('https://b.example.com/'))
+
+
+def make_jpeg(name, size=(1000, 750)):
+    buffer = BytesIO()
+    Image.new('RGB', size, (200, 30, 30)).save(buffer, 'JPEG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+@override_settings(IMAGE_PROCESSING_SYNC=True, IMAGE_VARIANT_WIDTHS=(320, 640, 1280))
+class ImagePipelineTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        self.category = make_category()
+        self.client.force_authenticate(make_user('quantri', role='admin', is_staff=True))
+
+    def create_product(self, *images):
+        data = {
+            'category': self.category.pk, 'name': 'BH', 'provider_name': 'TIS', 'description': 'x',
+            'target_audience': 'ind', 'uploaded_images': list(images),
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.post('/api/products/', data, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        inserts = [q for q in ctx.captured_queries if q['sql'].startswith('INSERT INTO "api_productimage"')]
+        self.assertEqual(len(inserts), 1)
+        return Product.objects.get(pk=response.data['id'])
+
+    def test_album_is_bulk_inserted_and_variants_generated(self):
+        product = self.create_product(make_jpeg('a.jpg'), make_jpeg('b.jpg', (500, 500)))
+        first, second = product.images.order_by('id')
+        self.assertEqual(sorted(first.variants['webp'], key=int), ['320', '640', '1000'])
+        self.assertEqual(first.variants['jpeg']['1000'], first.image.name)
+        self.assertEqual(sorted(second.variants['webp'], key=int), ['320', '500'])
+        with first.image.storage.open(first.variants['webp']['320']) as variant:
+            self.assertEqual(Image.open(variant).size, (320, 240))
+
+    def test_catalog_exposes_srcset_after_processing(self):
+        product = self.create_product(make_jpeg('a.jpg'))
+        image = self.client.get(f'/api/products/{product.pk}/').data['images'][0]
+        self.assertIn('320w', image['srcset'])
+        self.assertTrue(image['srcset'].split(', ')[0].startswith('http://testserver/'))
+        self.assertIn('1000w', image['srcset_jpeg'])
+
+    def test_broken_image_is_skipped(self):
+        with self.assertLogs('api.images', 'ERROR'):
+            product = self.create_product(SimpleUploadedFile('hong.jpg', b'not an image', content_type='image/jpeg'))
+        self.assertEqual(product.images.get().variants, {})
+
+
+class MediaServingTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name, MEDIA_SENDFILE=None))
+        self.content = bytes(range(256)) * 40
+        self.news = News.objects.create(title='Tin', content='x', image=SimpleUploadedFile('anh.jpg', self.content))
+
+    def get(self, path, **extra):
+        # FileResponse giữ file mở tới khi response.close() (server WSGI gọi sau khi gửi xong)
+        response = self.client.get(path, **extra)
+        self.addCleanup(response.close)
+        return response
+
+    def test_names_are_content_hashed_and_deduplicated(self):
+        self.assertRegex(self.news.image.name, r'^news/anh\.[0-9a-f]{12}\.jpg$')
+        again = News.objects.create(title='Tin 2', content='x', image=SimpleUploadedFile('anh.jpg', self.content))
+        self.assertEqual(again.image.name, self.news.image.name)
+
+    def test_hashed_file_is_immutable_and_supports_range(self):
+        response = self.get(self.news.image.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+
+        response = self.get(self.news.image.url, HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(self.content)}')
+        self.assertEqual(b''.join(response.streaming_content), self.content[100:200])
+        self.assertEqual(self.get(self.news.image.url, HTTP_RANGE='bytes=99999-').status_code, 416)
+
+        last_modified = self.get(self.news.image.url)['Last-Modified']
+        self.assertEqual(self.get(self.news.image.url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+    def test_unhashed_legacy_file_and_traversal(self):
+        legacy = os.path.join(settings.MEDIA_ROOT, 'products', 'cu.jpg')
+        os.makedirs(os.path.dirname(legacy))
+        with open(legacy, 'wb') as handle:
+            handle.write(self.content)
+        self.assertEqual(self.get('/media/products/cu.jpg')['Cache-Control'], 'public, max-age=86400')
+        self.assertEqual(self.get('/media/../manage.py').status_code, 404)
+        self.assertEqual(self.get('/media/products/khong-co.jpg').status_code, 404)
+
+    @override_settings(MEDIA_SENDFILE='x-accel')
+    def test_x_accel_redirect(self):
+        response = self.get(self.news.image.url)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/' + self.news.image.name)
+        self.assertEqual(response.content, b'')
+
+
+# --- PAGINATION ---
+class PaginationTests(ApiTestCase):
+    def test_catalog_uses_limit_offset_with_hard_cap(self):
+        category = make_category()
+        for i in range(5):
+            make_product(category, name=f'SP {i}', images=0)
+        data = self.client.get('/api/products/?limit=2&offset=2').json()
+        self.assertEqual(data['count'], 5)
+        self.assertEqual(len(data['results']), 2)
+
+        with self.settings(API_MAX_PAGE_SIZE=3):
+            data = self.client.get('/api/categories/?limit=1000').json()
+        self.assertLessEqual(len(data['results']), 3)
+
+    def test_orders_use_cursor_pagination(self):
+        admin = make_user('quantri', role='admin')
+        for i in range(25):
+            Order.objects.create(code=f'ORD-{i}', user=admin, total_amount=1000)
+        self.client.force_authenticate(admin)
+
+        first = self.client.get('/api/orders/').json()
+        self.assertNotIn('count', first)
+        self.assertEqual(len(first['results']), 20)
+        self.assertEqual(first['results'][0]['code'], 'ORD-24')
+
+        second = self.client.get(first['next']).json()
+        self.assertEqual(len(second['results']), 5)
+        self.assertIsNone(second['next'])
+
+    def test_order_page_loads_items_in_constant_queries(self):
+        admin = make_user('quantri', role='admin')
+        package = make_product(make_category(), images=0).packages.first()
+        self.client.force_authenticate(admin)
+
+        def page_queries(count):
+            for i in range(count):
+                order = Order.objects.create(code=f'ORD-{count}-{i}', user=admin, total_amount=1000)
+                OrderItem.objects.create(order=order, package=package, quantity=1)
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.get('/api/orders/').status_code, 200)
+            return len(queries)
+
+        self.assertEqual(page_queries(2), page_queries(10))
+
+    def test_viewset_page_size_is_capped(self):
+        admin = make_user('quantri', role='admin')
+        for i in range(5):
+            ConsultationRequest.objects.create(customer_name=f'KH {i}', customer_contact='0900000000')
+        self.client.force_authenticate(admin)
+        with self.settings(API_MAX_PAGE_SIZE=2):
+            data = self.client.get('/api/consultations/?page_size=50').json()
+        self.assertEqual(len(data['results']), 2)
+
+
+# --- CART ---
+class CartTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = make_user()
+        self.client.force_authenticate(self.user)
+
+    def test_empty_cart_does_not_create_rows(self):
+        with self.assertNumQueries(2):
+            data = self.client.get('/api/cart/').json()
+        self.assertEqual(data, {'items': [], 'total_price': 0, 'total_items': 0})
+        self.assertFalse(Cart.objects.filter(user=self.user).exists())
+
+    def test_totals_use_constant_queries(self):
+        category = make_category()
+        cart = Cart.objects.create(user=self.user)
+        for i in range(6):
+            product = make_product(category, name=f'SP {i}', images=0)
+            CartItem.objects.create(cart=cart, package=product.packages.get(), quantity=i + 1)
+
+        with self.assertNumQueries(2):
+            data = self.client.get('/api/cart/').json()
+        self.assertEqual(data['total_items'], 6)
+        self.assertEqual(data['total_price'], 21 * 1000000)
+        self.assertEqual(data['items'][0]['product_name'], 'SP 0')
+
+
+# --- ORDER CODES ---
+def allocate_codes(count):
+    return [next_order_code() for _ in range(count)]
+
+
+def create_orders_in_process(args):
+    """Process con (fork): kết nối mới tới file SQLite dùng chung, tạo đơn qua create_order như buy_now"""
+    path, count = args
+    # Bỏ kết nối in-memory (đang trong transaction của TestCase) kế thừa từ process cha
+    connections['default'] = type(connections['default'])({
+        **connection.settings_dict,
+        'NAME': path,
+        'OPTIONS': {'timeout': 30, 'transaction_mode': 'IMMEDIATE'},
+    }, alias='default')
+    try:
+        user = User.objects.create(username=f'khach-{os.getpid()}')
+        return [create_order(user=user, total_amount=1000, status='pending').code for _ in range(count)]
+    finally:
+        connections['default'].close()
+
+
+class OrderCodeTests(ApiTestCase):
+    def test_codes_are_unique_across_processes(self):
+        # fork -> mỗi process con reset node/counter qua register_at_fork
+        with multiprocessing.get_context('fork').Pool(4) as pool:
+            batches = pool.map(allocate_codes, [5000] * 4)
+        codes = [code for batch in batches for code in batch] + allocate_codes(5000)
+        self.assertEqual(len(set(codes)), len(codes))
+        self.assertTrue(all(len(code) <= 20 for code in codes))
+
+    def test_concurrent_processes_create_orders_with_unique_codes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'orders.sqlite3')
+            # Schema của DB test chép sang file -> các process ghi đồng thời vào cùng 1 DB thật
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT name, sql FROM sqlite_master WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%%'")
+                rows = cursor.fetchall()
+            # Bảng phụ của FTS5 do CREATE VIRTUAL TABLE tự tạo
+            virtual = [name for name, sql in rows if sql.startswith('CREATE VIRTUAL TABLE')]
+            schema = [sql for name, sql in rows if not any(name.startswith(f'{table}_') for table in virtual)]
+            with closing(sqlite3.connect(path)) as target:
+                target.executescript(';\n'.join(schema) + ';')
+            with multiprocessing.get_context('fork').Pool(4) as pool:
+                batches = pool.map(create_orders_in_process, [(path, 150)] * 4)
+            with closing(sqlite3.connect(path)) as db:
+                rows, codes = db.execute('SELECT COUNT(*), COUNT(DISTINCT code) FROM api_order').fetchone()
+                unique_columns = [
+                    [column[2] for column in db.execute(f'PRAGMA index_info("{index[1]}")')]
+                    for index in db.execute('PRAGMA index_list("api_order")') if index[2]
+                ]
+        created = [code for batch in batches for code in batch]
+        self.assertEqual(len(created), 600)
+        self.assertEqual((rows, codes), (600, 600))
+        self.assertIn(['code'], unique_columns)
+
+    def test_buy_now_twice_in_same_second(self):
+        package = make_product(make_category(), images=0).packages.get()
+        self.client.force_authenticate(make_user())
+        for _ in range(3):
+            response = self.client.post('/api/orders/buy_now/', {'package_id': package.pk, 'quantity': 2})
+            self.assertEqual(response.status_code, 201)
+        self.assertEqual(Order.objects.count(), 3)
+        self.assertEqual(Order.objects.first().total_amount, 2000000)
+
+
+# --- CHECKOUT ---
+class CheckoutTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = make_user('doanhnghiep', user_type='enterprise')
+        self.client.force_authenticate(self.user)
+        self.category = make_category()
+        self.cart = Cart.objects.create(user=self.user)
+
+    def fill_cart(self, count):
+        for i in range(count):
+            product = make_product(self.category, name=f'SP {i}', images=0)
+            CartItem.objects.create(cart=self.cart, package=product.packages.get(), quantity=2)
+
+    def checkout(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/orders/checkout/', {'beneficiary_note': 'NV A, NV B'})
+        return response, len(queries)
+
+    def test_checkout_turns_cart_into_one_order(self):
+        self.fill_cart(3)
+        response, _ = self.checkout()
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual(len(data['items']), 3)
+        self.assertEqual(data['total_amount'], '6000000')
+        self.assertEqual(data['beneficiary_note'], 'NV A, NV B')
+        self.assertFalse(CartItem.objects.exists())
+
+        # Submit lần 2 (double-click) -> giỏ trống, không tạo đơn mới
+        response, _ = self.checkout()
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_checkout_query_count_is_constant(self):
+        # Lần đầu còn tạo dòng OrderStatusSummary -> bỏ qua khi so sánh
+        self.fill_cart(1)
+        self.checkout()
+        self.fill_cart(2)
+        _, small = self.checkout()
+        self.fill_cart(10)
+        _, large = self.checkout()
+        self.assertEqual(small, large)
+
+
+# --- DASHBOARD ---
+class DashboardTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.customer = make_user()
+        self.admin = make_user('quantri', role='admin', is_staff=True)
+        self.package = make_product(make_category(), images=0).packages.get()
+
+    def create_orders(self, count, status='pending', amount=1000):
+        orders = []
+        for i in range(count):
+            order = Order.objects.create(code=f'ORD-{status}-{i}', user=self.customer, status=status, total_amount=amount)
+            OrderItem.objects.create(order=order, package=self.package)
+            orders.append(order)
+        return orders
+
+    def test_summary_is_maintained_incrementally(self):
+        orders = self.create_orders(3)
+        self.create_orders(2, status='active', amount=5000)
+
+        order = Order.objects.get(pk=orders[0].pk)
+        order.status = 'active'
+        order.save()
+        Order.objects.get(pk=orders[1].pk).delete()
+
+        self.client.force_authenticate(self.admin)
+        data = self.client.get('/api/dashboard/summary/').json()
+        self.assertEqual(data['revenue'], 11000)
+        self.assertEqual(data['total_orders'], 4)
+        self.assertEqual(data['pending_orders'], 1)
+
+    def test_query_count_does_not_grow_with_orders(self):
+        self.create_orders(2)
+        self.client.force_authenticate(self.admin)
+        with CaptureQueriesContext(connection) as small:
+            self.client.get('/api/dashboard/summary/')
+        self.create_orders(10, status='active')
+        with CaptureQueriesContext(connection) as large:
+            data = self.client.get('/api/dashboard/summary/').json()
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(len(data['recent_orders']), 5)
+        self.assertEqual(data['recent_orders'][0]['items'][0]['product_name'], 'Bảo hiểm sức khỏe')
+
+    def test_rebuild_command_fixes_drift(self):
+        self.create_orders(2, status='active', amount=700)
+        OrderStatusSummary.objects.all().delete()
+        out = io.StringIO()
+        call_command('rebuild_order_metrics', stdout=out)
+        self.assertIn('Đã tổng hợp 1 trạng thái đơn hàng', out.getvalue())
+        self.assertEqual(OrderStatusSummary.objects.get(status='active').total_amount, 1400)
+
+
+# --- SALES ANALYTICS ---
+class SalesFixtureMixin:
+    """2 gói thuộc 2 danh mục / đối tượng + khách mua qua checkout (dùng chung cho analytics và hiệu lực đơn)"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = make_user()
+        self.admin = make_user('quantri', role='admin', is_staff=True)
+        self.health = make_product(make_category(), images=0).packages.get()
+        vehicle = make_product(make_category('xe', 'vehicle'), name='Bảo hiểm xe', images=0)
+        vehicle.target_audience = 'ent'
+        vehicle.save()
+        self.vehicle = vehicle.packages.get()
+
+    def buy(self, *packages):
+        self.client.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            for package in packages:
+                CartItem.objects.create(cart=Cart.objects.get_or_create(user=self.user)[0], package=package, quantity=2)
+            return Order.objects.get(code=self.client.post('/api/orders/checkout/').json()['code'])
+
+    def series(self, **params):
+        self.client.force_authenticate(self.admin)
+        response = self.client.get('/api/analytics/sales/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+
+class SalesAnalyticsTests(SalesFixtureMixin, ApiTestCase):
+    def test_buckets_follow_orders_and_status_changes(self):
+        order = self.buy(self.health, self.vehicle)
+        self.buy(self.health)
+
+        rows = self.series(group_by='category')
+        self.assertEqual([(row['category__name'], row['revenue']) for row in rows], [('Sức khỏe', 4000000), ('Sức khỏe', 2000000)])
+        self.assertEqual(sum(row['order_count'] for row in rows), 3)
+
+        order.status = 'cancelled'
+        order.save()
+        self.assertEqual(sum(row['revenue'] for row in self.series()), 2000000)
+        self.assertEqual(sum(row['revenue'] for row in self.series(status='cancelled')), 4000000)
+
+        order.delete()
+        self.assertEqual(sum(row['revenue'] for row in self.series(status='cancelled')), 0)
+
+    def test_group_by_audience_and_month(self):
+        self.buy(self.health, self.vehicle)
+        rows = self.series(granularity='month', group_by='target_audience')
+        self.assertEqual({row['target_audience']: row['item_count'] for row in rows}, {'ind': 2, 'ent': 2})
+
+    def test_rebuild_matches_incremental(self):
+        self.buy(self.health, self.vehicle)
+        fields = ('date', 'category', 'status', 'order_count', 'primary_order_count', 'revenue')
+        before = list(DailySalesBucket.objects.values_list(*fields).order_by('category'))
+        call_command('rebuild_sales_buckets', stdout=io.StringIO())
+        after = list(DailySalesBucket.objects.values_list(*fields).order_by('category'))
+        self.assertEqual(before, after)
+
+    def test_item_changes_match_rebuild(self):
+        # Admin thêm / sửa / xóa dòng của đơn có sẵn (OrderItemInline) rồi đổi trạng thái
+        order = self.buy(self.health)
+        self.buy(self.health, self.vehicle)
+        added = OrderItem.objects.create(order=order, package=self.vehicle, quantity=3)
+        order.status = 'confirmed'
+        order.save()
+        added.quantity = 1
+        added.save()
+        order.items.get(package=self.health).delete()
+        order.status = 'expired'
+        order.save()
+
+        fields = ('date', 'category', 'target_audience', 'status', 'order_count', 'primary_order_count', 'item_count', 'revenue')
+
+        def buckets():
+            return list(DailySalesBucket.objects.exclude(order_count=0).values_list(*fields).order_by(*fields))
+
+        incremental = buckets()
+        self.assertEqual(DailySalesBucket.objects.filter(order_count=0).exclude(item_count=0, revenue=0).count(), 0)
+        rebuild_sales_buckets()
+        self.assertEqual(incremental, buckets())
+        self.assertEqual(
+            [row[3:] for row in incremental],
+            [('pending', 1, 1, 2, 2000000), ('expired', 1, 1, 1, 1000000), ('pending', 1, 0, 2, 2000000)],
+        )
+
+    def test_price_change_after_checkout_does_not_drift(self):
+        order = self.buy(self.health)
+        ProductPackage.objects.filter(pk=self.health.pk).update(price=3000000)
+        order.status = 'active'
+        order.save()
+        self.assertEqual(
+            list(DailySalesBucket.objects.values_list('status', 'order_count', 'revenue').order_by('status')),
+            [('active', 1, 2000000), ('pending', 0, 0)],
+        )
+        self.assertEqual(sum(row['revenue'] for row in self.series()), order.total_amount)
+        self.assertEqual(self.client.get(f'/api/orders/{order.pk}/').json()['items'][0]['price'], '1000000')
+
+    def test_ungrouped_series_counts_multi_category_order_once(self):
+        self.buy(self.health, self.vehicle)
+        self.buy(self.vehicle)
+        self.assertEqual(sum(row['order_count'] for row in self.series()), 2)
+        self.assertEqual(sum(row['order_count'] for row in self.series(group_by='category')), 3)
+
+    def test_invalid_range_is_rejected(self):
+        self.client.force_authenticate(self.admin)
+        response = self.client.get('/api/analytics/sales/', {'start': '2026-02-30'})
+        self.assertEqual(response.status_code, 400)
+
+
+# --- INDEXES ---
+class QueryPlanTests(ApiTestCase):
+    def assertUsesIndex(self, queryset, index_name):
+        self.assertIn(f'USING INDEX {index_name}', queryset.explain())
+
+    def test_hot_queries_use_composite_indexes(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Kiểm tra plan theo cú pháp EXPLAIN của SQLite')
+        user = make_user()
+        self.assertUsesIndex(Order.objects.filter(status='pending').order_by('-created_at'), 'order_status_created_idx')
+        self.assertUsesIndex(Order.objects.filter(user=user).order_by('-created_at'), 'order_user_created_idx')
+        self.assertUsesIndex(Product.objects.filter(is_featured=True).order_by('-created_at', '-id'), 'product_featured_idx')
+        self.assertUsesIndex(ConsultationRequest.objects.filter(assigned_staff=user, status='new'), 'consult_staff_status_idx')
+        self.assertUsesIndex(ChatMessage.objects.filter(consultation_id=1).order_by('timestamp'), 'chat_consult_time_idx')
+
+
+# --- PRODUCT SEARCH ---
+class ProductSearchTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.health = make_category()
+        self.vehicle = make_category('xe', 'vehicle')
+        self.vehicle.name = 'Xe cơ giới'
+        self.vehicle.save()
+        self.care = make_product(self.health, name='Bảo hiểm Sức khỏe Toàn diện', images=0)
+        self.car = make_product(self.vehicle, name='Bảo hiểm ô tô', images=0)
+        self.car.description = 'Bồi thường sức khỏe tài xế'
+        self.car.provider_name = 'Bảo Việt'
+        self.car.save()
+
+    def search(self, term):
+        return [row['id'] for row in self.client.get('/api/products/', {'search': term}).json()['results']]
+
+    def test_diacritic_folding_and_ranking(self):
+        # Khớp tên xếp trên khớp mô tả
+        self.assertEqual(self.search('suc khoe'), [self.care.pk, self.car.pk])
+        self.assertEqual(self.search('SỨC KHỎE'), [self.care.pk, self.car.pk])
+
+    def test_prefix_and_category_match(self):
+        self.assertEqual(self.search('toan di'), [self.care.pk])
+        self.assertEqual(self.search('co gioi'), [self.car.pk])
+        self.assertEqual(self.search('không có'), [])
+
+    def test_provider_name_is_admin_only(self):
+        self.assertEqual(self.search('bao viet'), [])
+        self.client.force_authenticate(make_user('quantri', role='admin'))
+        self.assertEqual(self.search('bao viet'), [self.car.pk])
+
+    def test_index_follows_renames_and_deletes(self):
+        with self.commit():
+            self.vehicle.name = 'Hàng hải'
+            self.vehicle.save()
+        self.assertEqual(self.search('hang hai'), [self.car.pk])
+
+        with self.commit():
+            self.care.name = 'Du lịch'
+            self.care.save()
+        self.assertEqual(self.search('du lich'), [self.care.pk])
+        with self.commit():
+            self.care.delete()
+        self.assertEqual(self.search('du lich'), [])
+
+
+# --- THROTTLING ---
+def consume_tokens(args):
+    path, attempts = args
+    store = TokenBucketStore(path)
+    return sum(store.consume('shared', capacity=50, rate=0.0001) for _ in range(attempts))
+
+
+def invalidate_user_in_other_process(user_id):
+    # Như signal post_save của User chạy ở worker khác
+    invalidate_cached_user(user_id)
+
+
+class CachedAuthenticationTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.staff = make_user('nhanvien', role='staff', specialization='health')
+        response = self.client.post('/api/login/', {'username': 'nhanvien', 'password': 'Matkhau123.'})
+        self.assertEqual(response.status_code, 200)
+        self.tokens = response.json()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.tokens["access"]}')
+
+    def test_tokens_carry_role_claims(self):
+        access = AccessToken(self.tokens['access'])
+        self.assertEqual((access['role'], access['specialization'], access['user_type']), ('staff', 'health', None))
+        refreshed = self.client.post('/api/token/refresh/', {'refresh': self.tokens['refresh']}).json()
+        self.assertEqual(AccessToken(refreshed['access'])['role'], 'staff')
+
+    def test_authenticated_requests_skip_user_query(self):
+        self.client.get('/api/users/me/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/users/me/')
+        self.assertEqual(response.json()['role'], 'staff')
+        # L1 trống (process khác) -> lấy từ cache dùng chung, vẫn không query
+        local_user_cache.clear()
+        with self.assertNumQueries(0):
+            self.client.get('/api/users/me/')
+
+    def test_saving_user_invalidates_cache(self):
+        self.client.get('/api/users/me/')
+        self.staff.role = 'admin'
+        self.staff.save()
+        self.assertEqual(self.client.get('/api/users/me/').json()['role'], 'admin')
+        self.staff.is_active = False
+        self.staff.save()
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 401)
+
+    @override_settings(AUTH_USER_CACHE_TTL=0.2)
+    def test_user_deactivated_in_other_process_is_rejected(self):
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 200)
+        # Worker khác khóa tài khoản: ghi DB + xóa cache dùng chung từ process của nó
+        User.objects.filter(pk=self.staff.pk).update(is_active=False)
+        process = multiprocessing.get_context('fork').Process(target=invalidate_user_in_other_process, args=(self.staff.pk,))
+        process.start()
+        process.join()
+        self.assertEqual(process.exitcode, 0)
+        # L1 của process này hết hạn sau AUTH_USER_CACHE_TTL -> đọc lại cache dùng chung (trống) -> DB
+        time.sleep(0.3)
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 401)
+
+
+class TokenStoreTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = make_user()
+        response = self.client.post('/api/login/', {'username': 'khach', 'password': 'Matkhau123.'})
+        self.tokens = response.json()
+
+    def refresh(self, token):
+        return self.client.post('/api/token/refresh/', {'refresh': token})
+
+    def test_login_returns_jwt_with_user_fields(self):
+        self.assertEqual(
+            (self.tokens['user_id'], self.tokens['role']), (self.user.pk, 'customer')
+        )
+        self.assertIn('refresh', self.tokens)
+
+    def test_rotated_refresh_token_cannot_be_reused(self):
+        first = self.refresh(self.tokens['refresh'])
+        self.assertEqual(first.status_code, 200)
+        self.assertNotEqual(first.json()['refresh'], self.tokens['refresh'])
+        self.assertEqual(self.refresh(self.tokens['refresh']).status_code, 401)
+        # Cache trống (worker khác) -> vẫn bị chặn nhờ bảng RevokedToken
+        caches['auth'].clear()
+        self.assertEqual(self.refresh(self.tokens['refresh']).status_code, 401)
+        self.assertEqual(self.refresh(first.json()['refresh']).status_code, 200)
+
+    def test_refresh_query_count_does_not_grow_with_blacklist(self):
+        expires_at = timezone.now() + timedelta(days=1)
+        RevokedToken.objects.bulk_create(
+            [RevokedToken(jti=f'cu-{i}', token_type='refresh', expires_at=expires_at) for i in range(500)]
+        )
+        # Tra jti (index unique) + User + INSERT jti cũ (savepoint)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.refresh(self.tokens['refresh']).status_code, 200)
+        self.assertEqual(len([q for q in queries if 'api_revokedtoken' in q['sql']]), 2)
+
+    def test_logout_revokes_refresh_and_access_tokens(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.tokens["access"]}')
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 200)
+        response = self.client.post('/api/logout/', {'refresh': self.tokens['refresh']})
+        self.assertEqual(response.status_code, 205)
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 401)
+        self.client.credentials()
+        self.assertEqual(self.refresh(self.tokens['refresh']).status_code, 401)
+        self.assertEqual(self.client.post('/api/logout/', {'refresh': 'sai'}).status_code, 401)
+
+    def test_logout_works_with_expired_access_token(self):
+        expired = AccessToken(self.tokens['access'])
+        expired.set_exp(lifetime=-timedelta(seconds=1))
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {expired}')
+        response = self.client.post('/api/logout/', {'refresh': self.tokens['refresh']})
+        self.assertEqual(response.status_code, 205)
+        self.assertEqual(self.refresh(self.tokens['refresh']).status_code, 401)
+
+    def test_revocation_in_other_process_overrides_cached_negative(self):
+        access = AccessToken(self.tokens['access'])
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        # Worker này đã cache "chưa thu hồi"
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 200)
+        process = multiprocessing.get_context('fork').Process(target=revoke_token, args=(access,))
+        process.start()
+        process.join()
+        self.assertEqual(process.exitcode, 0)
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 401)
+
+    def test_prune_removes_only_expired_tokens(self):
+        now = timezone.now()
+        RevokedToken.objects.bulk_create(
+            [RevokedToken(jti=f'het-{i}', token_type='refresh', expires_at=now - timedelta(minutes=i + 1)) for i in range(5)]
+            + [RevokedToken(jti='con-han', token_type='refresh', expires_at=now + timedelta(hours=1))]
+        )
+        self.assertEqual(prune_revoked_tokens(now=now, batch_size=2), 5)
+        self.assertEqual(list(RevokedToken.objects.values_list('jti', flat=True)), ['con-han'])
+        call_command('prune_revoked_tokens', stdout=io.StringIO())
+
+
+class PasswordHashingTests(ApiTestCase):
+    def login(self, password='Matkhau123.'):
+        return self.client.post('/api/login/', {'username': 'khach', 'password': password})
+
+    def test_legacy_pbkdf2_hash_is_upgraded_on_login(self):
+        user = make_user()
+        User.objects.filter(pk=user.pk).update(password=make_password('Matkhau123.', hasher='pbkdf2_sha256'))
+        self.assertEqual(self.login('sai').status_code, 401)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$'))
+
+        self.assertEqual(self.login().status_code, 200)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('scrypt$'))
+        self.assertEqual(self.login().status_code, 200)
+
+    def test_changing_work_factor_rehashes_on_login(self):
+        user = make_user()
+        with override_settings(PASSWORD_SCRYPT_WORK_FACTOR=2**12):
+            self.assertEqual(self.login().status_code, 200)
+        user.refresh_from_db()
+        self.assertEqual(user.password.split('$')[1], str(2**12))
+
+    def test_hashing_runs_in_bounded_pool(self):
+        make_user()
+        threads = []
+        verify = passwords.verify_password
+
+        def record(*args):
+            threads.append(threading.current_thread().name)
+            return verify(*args)
+
+        with mock.patch.object(passwords, 'verify_password', side_effect=record):
+            self.assertEqual(self.login().status_code, 200)
+        self.assertEqual(len(threads), 1)
+        self.assertTrue(threads[0].startswith('password-hash'))
+
+    def test_failed_login_sends_user_login_failed(self):
+        make_user()
+        failures = []
+
+        def record(sender, credentials, **kwargs):
+            failures.append(credentials['username'])
+
+        user_login_failed.connect(record)
+        try:
+            self.assertEqual(self.login('sai').status_code, 401)
+            self.assertEqual(self.client.post('/api/login/', {'username': 'khongco', 'password': 'x'}).status_code, 401)
+            self.assertEqual(self.login().status_code, 200)
+        finally:
+            user_login_failed.disconnect(record)
+        self.assertEqual(failures, ['khach', 'khongco'])
+
+    def test_missing_fields_and_register_use_new_hasher(self):
+        self.assertEqual(self.client.post('/api/login/', {'username': 'khach'}).status_code, 400)
+        response = self.client.post('/api/register/', {'username': 'moi', 'password': 'Matkhau123.', 'email': 'a@B.COM'})
+        self.assertEqual(response.status_code, 201)
+        user = User.objects.get(username='moi')
+        self.assertTrue(user.password.startswith('scrypt$'))
+        self.assertEqual(user.email, 'a@b.com')
+
+
+class EndpointQueryBudgetTests(ApiTestCase):
+    def test_endpoints_stay_within_query_budget(self):
+        from benchmarks import endpoints
+        from benchmarks.seed import seed
+
+        data = seed(users=3, staff=2, products=6, orders=30, consultations=6, messages=12, news=2, rebuild=True)
+        failures = endpoints.over_budget(endpoints.run(data, repeat=2))
+        self.assertEqual([(endpoint.name, code, queries) for endpoint, code, queries in failures], [])
+
+
+@override_settings(INSTRUMENTATION_QUERY_SAMPLE_RATE=1)
+class InstrumentationTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = make_user('quantri', role='admin', is_staff=True)
+
+    def metrics(self, **headers):
+        return self.client.get('/api/metrics/', **headers)
+
+    def test_metrics_are_labelled_by_view_and_action(self):
+        make_product(make_category())
+        self.client.get('/api/products/')
+        self.client.get('/api/products/')
+        self.client.force_authenticate(self.admin)
+        text = self.metrics().content.decode()
+        self.assertIn('http_requests_total{view="ProductViewSet",action="list",status="2xx"} 2', text)
+        # Lần 2 lấy từ cache catalog -> 0 query
+        self.assertIn('http_request_db_queries_bucket{view="ProductViewSet",action="list",le="1"} 1', text)
+        self.assertIn('http_request_duration_seconds_count{view="ProductViewSet",action="list"} 2', text)
+
+    def test_metrics_are_merged_across_workers(self):
+        instrumentation.registry.observe('OrderViewSet', 'list', '2xx', {'http_request_db_queries': 3}, 0)
+        instrumentation.flush()
+        # Process khác: snapshot riêng trong cùng store
+        instrumentation.registry.reset()
+        instrumentation.registry.observe('OrderViewSet', 'list', '2xx', {'http_request_db_queries': 30}, 29)
+        text = instrumentation.collect()
+        self.assertIn('http_requests_total{view="OrderViewSet",action="list",status="2xx"} 2', text)
+        self.assertIn('http_request_db_queries_sum{view="OrderViewSet",action="list"} 33.000000', text)
+        self.assertIn('http_request_duplicate_queries_total{view="OrderViewSet",action="list"} 29', text)
+
+    def test_duplicate_queries_are_detected(self):
+        users = [make_user(f'khach{i}') for i in range(6)]
+        recorder = instrumentation.QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            for user in users:
+                User.objects.filter(pk=user.pk).first()
+            list(User.objects.filter(pk__in=[users[0].pk, users[1].pk]))
+            list(User.objects.filter(pk__in=[users[0].pk]))
+        self.assertEqual(recorder.count, 8)
+        self.assertEqual(sorted(recorder.duplicates().values()), [2, 6])
+
+    def test_batched_inserts_are_not_reported_as_duplicates(self):
+        recorder = instrumentation.QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            User.objects.bulk_create([User(username=f'lo{i}') for i in range(6)], batch_size=1)
+        self.assertEqual(recorder.count, 6)
+        self.assertEqual(recorder.duplicates(), {})
+
+    @override_settings(INSTRUMENTATION_SLOW_REQUEST_MS=0, INSTRUMENTATION_EXPLAIN_SAMPLE_RATE=1)
+    def test_slow_requests_are_logged_with_query_plan(self):
+        make_product(make_category())
+        with self.assertLogs('api.slow_requests', 'WARNING') as logs:
+            self.client.get('/api/products/')
+            instrumentation.get_executor().submit(lambda: None).result()
+        self.assertIn('ProductViewSet.list', logs.output[0])
+        self.assertTrue(any('Query plan' in line for line in logs.output[1:]))
+
+    def test_metrics_require_admin_or_token(self):
+        self.assertEqual(self.metrics().status_code, 401)
+        with override_settings(METRICS_TOKEN='bi-mat'):
+            self.assertEqual(self.metrics(HTTP_X_METRICS_TOKEN='sai').status_code, 401)
+            response = self.metrics(HTTP_X_METRICS_TOKEN='bi-mat')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+
+
+class ThrottleTests(ApiTestCase):
+    def test_bucket_refills_over_time(self):
+        store = get_store()
+        self.assertTrue(store.consume('k', capacity=2, rate=1, now=100))
+        self.assertTrue(store.consume('k', capacity=2, rate=1, now=100))
+        self.assertFalse(store.consume('k', capacity=2, rate=1, now=100.5))
+        self.assertTrue(store.consume('k', capacity=2, rate=1, now=101.5))
+
+    def test_bucket_is_shared_across_processes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'throttle.sqlite3')
+            with multiprocessing.get_context('fork').Pool(4) as pool:
+                allowed = pool.map(consume_tokens, [(path, 40)] * 4)
+        self.assertEqual(sum(allowed), 50)
+
+    def test_login_scope_limits_by_ip(self):
+        rates = {'anon': '100/day', 'user': '1000/day', 'login': '2/min'}
+        with self.settings(REST_FRAMEWORK={'DEFAULT_THROTTLE_RATES': rates}):
+            codes = [self.client.post('/api/login/', {'username': 'x', 'password': 'y'}).status_code for _ in range(3)]
+        self.assertEqual(codes, [401, 401, 429])
+
+    def test_catalog_has_its_own_budget(self):
+        rates = {'anon': '1/day', 'user': '1000/day', 'catalog': '5/min'}
+        with self.settings(REST_FRAMEWORK={'DEFAULT_THROTTLE_RATES': rates}):
+            codes = [self.client.get('/api/categories/').status_code for _ in range(6)]
+        self.assertEqual(codes, [200] * 5 + [429])
+
+
+# --- CHAT WEBSOCKET ---
+class StaffAssignmentTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.product = make_product(make_category())
+        self.vehicle_product = make_product(make_category('xe', 'vehicle'), name='Bảo hiểm xe')
+        self.staff = [make_user(f'nhanvien{i}', role='staff', specialization='health') for i in range(3)]
+        self.customer = make_user()
+        self.client.force_authenticate(self.customer)
+
+    def request_consultation(self, product):
+        response = self.client.post('/api/consultations/', {
+            'customer_name': 'KH', 'customer_contact': '0900000000', 'product': product.pk,
+        })
+        self.assertEqual(response.status_code, 201)
+        return ConsultationRequest.objects.get(pk=response.data['id'])
+
+    def test_round_robin_between_equally_loaded_staff(self):
+        assigned = [self.request_consultation(self.product).assigned_staff_id for _ in range(6)]
+        ids = [user.pk for user in self.staff]
+        self.assertEqual(assigned, ids + ids)
+
+    def test_least_loaded_staff_wins(self):
+        for _ in range(2):
+            ConsultationRequest.objects.create(
+                customer_name='KH', customer_contact='x', product=self.product, assigned_staff=self.staff[0]
+            )
+        ConsultationRequest.objects.create(
+            customer_name='KH', customer_contact='x', product=self.product, assigned_staff=self.staff[1]
+        )
+        self.assertEqual(self.request_consultation(self.product).assigned_staff, self.staff[2])
+        self.assertEqual(self.request_consultation(self.product).assigned_staff, self.staff[1])
+
+    def test_closing_consultation_releases_load(self):
+        first = self.request_consultation(self.product)
+        for _ in range(2):
+            self.request_consultation(self.product)
+        first.status = 'closed'
+        first.save()
+        self.assertEqual(self.request_consultation(self.product).assigned_staff_id, first.assigned_staff_id)
+        self.assertEqual(set(staff_load_index.snapshot()['health'].values()), {1})
+
+    def test_no_matching_staff_leaves_unassigned(self):
+        self.assertIsNone(self.request_consultation(self.vehicle_product).assigned_staff)
+
+    def test_assignment_does_not_count_consultations(self):
+        self.request_consultation(self.product)  # nạp index
+        with CaptureQueriesContext(connection) as ctx:
+            self.request_consultation(self.product)
+        self.assertFalse([q for q in ctx.captured_queries if 'COUNT(' in q['sql'].upper()])
+
+    def test_index_matches_database_after_reload(self):
+        for _ in range(4):
+            self.request_consultation(self.product)
+        expected = staff_load_index.snapshot()
+        staff_load_index.invalidate()
+        self.assertEqual(staff_load_index.snapshot(), expected)
+
+
+class ConsultationVisibilityTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        health, vehicle = make_product(make_category()), make_product(make_category('xe', 'vehicle'), name='Xe')
+        self.staff = make_user('nhanvien', role='staff', specialization='health')
+        self.customer = make_user()
+        for product in [health] * 5 + [vehicle] * 3:
+            ConsultationRequest.objects.create(customer_name='KH', customer_contact='x', product=product)
+        self.vehicle_request = ConsultationRequest.objects.filter(product=vehicle).first()
+        self.own_request = ConsultationRequest.objects.create(
+            customer_name='KH', customer_contact='x', product=vehicle, user=self.customer
+        )
+
+    def test_staff_list_is_one_query_and_only_their_specialization(self):
+        self.client.force_authenticate(self.staff)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/consultations/')
+        self.assertEqual(len(response.data['results']), 5)
+        self.assertEqual({item['product'] for item in response.data['results']}, {ConsultationRequest.objects.first().product_id})
+
+    def test_staff_cannot_open_other_specialization(self):
+        self.client.force_authenticate(self.staff)
+        self.assertEqual(self.client.get(f'/api/consultations/{self.vehicle_request.pk}/').status_code, 404)
+        self.vehicle_request.assigned_staff = self.staff
+        self.vehicle_request.save()
+        self.assertEqual(self.client.get(f'/api/consultations/{self.vehicle_request.pk}/').status_code, 200)
+
+    def test_customer_sees_only_own_requests(self):
+        self.client.force_authenticate(self.customer)
+        response = self.client.get('/api/consultations/')
+        self.assertEqual([item['id'] for item in response.data['results']], [self.own_request.pk])
+
+    def test_visibility_does_not_depend_on_filter_backends(self):
+        self.client.force_authenticate(self.staff)
+        with mock.patch.object(ConsultationRequestViewSet, 'filter_backends', []):
+            self.assertEqual(len(self.client.get('/api/consultations/').data['results']), 5)
+            self.assertEqual(self.client.get(f'/api/consultations/{self.vehicle_request.pk}/').status_code, 404)
+
+
+class RosterTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.enterprise = make_user('doanhnghiep', user_type='enterprise')
+        self.client.force_authenticate(self.enterprise)
+
+    def upload(self, text, name='nhan-vien.csv'):
+        upload = SimpleUploadedFile(name, text.encode('utf-8-sig'), content_type='text/csv')
+        return self.client.post('/api/employees/import/', {'file': upload}, format='multipart')
+
+    def test_import_dedupes_and_reports_row_errors(self):
+        EnterpriseEmployee.objects.create(enterprise=self.enterprise, full_name='Cũ', phone='0900000001')
+        response = self.upload(
+            'Họ tên,Số điện thoại,Email,Địa chỉ\n'
+            'Nguyễn Văn A,+84 900 000 002,a@congty.vn,Hà Nội\n'
+            'Trần Thị B,0900000001,,\n'          # trùng SĐT trong DB
+            'Lê Văn C,,A@congty.vn,\n'           # trùng email trong file
+            ',0900000003,,\n'                   # thiếu họ tên
+            'Phạm D,0900000004,sai-email,\n'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['duplicates'], 2)
+        self.assertEqual([error['row'] for error in response.data['errors']], [3, 4, 5, 6])
+        self.assertIn('email', response.data['errors'][3]['errors'])
+        self.assertEqual(EnterpriseEmployee.objects.get(full_name='Nguyễn Văn A').phone, '0900000002')
+
+    def test_large_import_uses_batched_queries(self):
+        rows = ''.join(f'Nhân viên {i},09{i:08d},nv{i}@congty.vn,\n' for i in range(3000))
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.upload('full_name,phone,email,address\n' + rows)
+        self.assertEqual(response.data['created'], 3000)
+        # SQLite giới hạn số tham số / câu -> bulk_create tự chia nhỏ thêm, vẫn xa mức 1 query / dòng
+        self.assertLess(len(ctx.captured_queries), 40)
+
+    def test_rejects_file_without_name_column(self):
+        self.assertEqual(self.upload('phone\n0900000001\n').status_code, 400)
+
+    def test_dedupes_against_unnormalized_existing_rows(self):
+        for phone, email in [('0900 000 001', ''), ('+84 900-000-002', ''), ('', 'Cu@CongTy.vn')]:
+            EnterpriseEmployee.objects.create(enterprise=self.enterprise, full_name='Cũ', phone=phone, email=email)
+        response = self.upload(
+            'full_name,phone,email\n'
+            'A,0900000001,\n'
+            'B,0900000002,\n'
+            'C,,cu@congty.vn\n'
+            'D,0900000003,\n'
+        )
+        self.assertEqual((response.data['created'], response.data['duplicates']), (1, 3))
+
+    def test_xlsx_without_openpyxl_is_rejected_cleanly(self):
+        with mock.patch.dict('sys.modules', {'openpyxl': None}):
+            response = self.upload('không phải excel', name='nhan-vien.xlsx')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('CSV', response.data['error'])
+
+    def test_export_streams_csv(self):
+        EnterpriseEmployee.objects.create(enterprise=self.enterprise, full_name='Nguyễn Văn A', phone='0900000002')
+        EnterpriseEmployee.objects.create(enterprise=make_user('khac'), full_name='Người ngoài', phone='0900000009')
+        response = self.client.get('/api/employees/export/')
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content).decode('utf-8-sig')
+        self.assertEqual(content.splitlines(), ['Họ tên,Số điện thoại,Email,Địa chỉ', 'Nguyễn Văn A,0900000002,,'])
+
+    def test_export_escapes_formula_cells(self):
+        EnterpriseEmployee.objects.create(
+            enterprise=self.enterprise, full_name='=HYPERLINK("http://x")', phone='+84900000002', address='@SUM(A1)'
+        )
+        content = b''.join(self.client.get('/api/employees/export/').streaming_content).decode('utf-8-sig')
+        self.assertEqual(content.splitlines()[1], '"\'=HYPERLINK(""http://x"")",\'+84900000002,,\'@SUM(A1)')
+
+
+class BeneficiaryTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.enterprise = make_user('doanhnghiep', user_type='enterprise')
+        self.client.force_authenticate(self.enterprise)
+        product = make_product(make_category(), packages=0)
+        self.short = ProductPackage.objects.create(product=product, duration_label='6 Tháng', price=100, duration_days=180)
+        self.long = ProductPackage.objects.create(product=product, duration_label='1 Năm', price=200, duration_days=365)
+        self.order = Order.objects.create(
+            code='ORD-DN1', user=self.enterprise, total_amount=300, status='active', **coverage_window(365)
+        )
+        self.short_item = OrderItem.objects.create(order=self.order, package=self.short)
+        OrderItem.objects.create(order=self.order, package=self.long)
+        self.employees = EnterpriseEmployee.objects.bulk_create([
+            EnterpriseEmployee(enterprise=self.enterprise, full_name=f'NV {i}', phone=f'09000000{i:02d}') for i in range(5)
+        ])
+        self.url = f'/api/orders/{self.order.pk}/beneficiaries/'
+
+    def test_bulk_assign_is_idempotent_and_rejects_foreign_employees(self):
+        outsider = EnterpriseEmployee.objects.create(enterprise=make_user('khac'), full_name='Ngoài', phone='0911111111')
+        ids = [employee.pk for employee in self.employees]
+        response = self.client.post(self.url, {'employees': ids + [outsider.pk]}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data, {'created': 5, 'invalid_employees': [outsider.pk]})
+        response = self.client.post(self.url, {'employees': ids[:2]}, format='json')
+        self.assertEqual(response.data['created'], 0)
+        self.assertEqual(OrderBeneficiary.objects.filter(order=self.order).count(), 5)
+
+        response = self.client.delete(self.url, {'employees': ids[:2]}, format='json')
+        self.assertEqual(response.data['removed'], 2)
+        self.assertEqual(len(self.client.get(self.url).data['results']), 3)
+
+    def test_coverage_is_single_query(self):
+        employee = self.employees[0]
+        self.client.post(self.url, {'employees': [employee.pk]}, format='json')
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/employees/{employee.pk}/coverage/')
+        self.assertTrue(response.data['covered'])
+        self.assertEqual(response.data['covered_until'], self.order.coverage_end)
+
+    def test_coverage_follows_order_window_and_status(self):
+        employee = self.employees[1]
+        self.client.post(self.url, {'employees': [employee.pk], 'order_item': self.short_item.pk}, format='json')
+        self.assertTrue(self.client.get(f'/api/employees/{employee.pk}/coverage/').data['covered'])
+
+        Order.objects.filter(pk=self.order.pk).update(status='cancelled')
+        self.assertFalse(self.client.get(f'/api/employees/{employee.pk}/coverage/').data['covered'])
+        self.assertFalse(self.client.get(f'/api/employees/{self.employees[2].pk}/coverage/').data['covered'])
+
+
+class CoverageTransitionTests(SalesFixtureMixin, ApiTestCase):
+    def set_window(self, order, start_days_ago, end_days_ago):
+        now = timezone.now()
+        Order.objects.filter(pk=order.pk).update(
+            coverage_start=now - timedelta(days=start_days_ago), coverage_end=now - timedelta(days=end_days_ago)
+        )
+
+    def confirm(self, order):
+        order.status = 'confirmed'
+        order.save()
+
+    def test_window_starts_at_confirmation_from_longest_package(self):
+        self.vehicle.duration_days = 730
+        self.vehicle.save()
+        order = self.buy(self.health, self.vehicle)
+        # Thời gian chờ duyệt không bị trừ vào hiệu lực
+        self.assertIsNone(order.coverage_start)
+        before = timezone.now()
+        self.confirm(order)
+        order.refresh_from_db()
+        self.assertGreaterEqual(order.coverage_start, before)
+        self.assertEqual(order.coverage_end - order.coverage_start, timedelta(days=730))
+
+    def test_expired_orders_stay_in_dashboard_revenue(self):
+        # Dashboard tính doanh thu trên active + expired (REVENUE_STATUSES): đơn hết hạn vẫn là tiền đã thu
+        order = self.buy(self.health)
+        order.status = 'active'
+        order.save()
+        self.set_window(order, 400, 1)
+        self.client.force_authenticate(self.admin)
+        revenue = self.client.get('/api/dashboard/summary/').json()['revenue']
+        self.assertEqual(revenue, order.total_amount)
+
+        process_order_coverage()
+        self.assertEqual(Order.objects.get(pk=order.pk).status, 'expired')
+        self.assertEqual(self.client.get('/api/dashboard/summary/').json()['revenue'], revenue)
+
+    def test_transitions_move_metrics_and_buckets(self):
+        due, later, ended = self.buy(self.health), self.buy(self.vehicle), self.buy(self.health, self.vehicle)
+        for order in (due, later, ended):
+            self.confirm(order)
+        self.set_window(due, 1, -300)
+        self.set_window(later, -5, -400)
+        ended.status = 'active'
+        ended.save()
+        self.set_window(ended, 400, 1)
+
+        with CaptureQueriesContext(connection) as ctx:
+            result = process_order_coverage(chunk_size=2)
+        # Mỗi lô 1 câu UPDATE, không save() từng đơn
+        self.assertEqual(len([q for q in ctx.captured_queries if q['sql'].startswith('UPDATE "api_order"')]), 2)
+        self.assertEqual(result, {'confirmed->active': 1, 'active->expired': 1})
+        self.assertEqual(
+            dict(Order.objects.values_list('code', 'status')),
+            {due.code: 'active', later.code: 'confirmed', ended.code: 'expired'},
+        )
+
+        # Số liệu cập nhật dần phải khớp với tính lại từ đầu
+        def snapshot():
+            summary = OrderStatusSummary.objects.exclude(order_count=0).values_list('status', 'order_count', 'total_amount')
+            buckets = DailySalesBucket.objects.exclude(order_count=0).values_list('category', 'status', 'order_count', 'revenue')
+            return set(summary), set(buckets)
+        before = snapshot()
+        call_command('rebuild_order_metrics', stdout=io.StringIO())
+        call_command('rebuild_sales_buckets', stdout=io.StringIO())
+        self.assertEqual(snapshot(), before)
+
+    def test_expiring_soon_endpoint(self):
+        soon, far = self.buy(self.health), self.buy(self.vehicle)
+        Order.objects.filter(pk__in=[soon.pk, far.pk]).update(status='active')
+        self.set_window(soon, 300, -10)
+        self.set_window(far, 300, -90)
+        response = self.client.get('/api/orders/expiring/', {'days': 30})
+        self.assertEqual([order['code'] for order in response.json()['results']], [soon.code])
+        self.assertEqual(len(self.client.get('/api/orders/expiring/', {'days': 120}).json()['results']), 2)
+
+
+class ConsultationChatTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.customer = make_user()
+        self.staff = make_user('nhanvien', role='staff', specialization='health')
+        self.outsider = make_user('nguoila')
+        self.consultation = ConsultationRequest.objects.create(
+            customer_name='KH', customer_contact='0900000000', user=self.customer, assigned_staff=self.staff
+        )
+
+    def connect(self, user, pk=None):
+        from insurance_project.asgi import application
+
+        token = str(AccessToken.for_user(user)) if user else ''
+        scope = {
+            'type': 'websocket',
+            'path': f'/ws/consultations/{pk or self.consultation.pk}/',
+            'query_string': f'token={token}'.encode(),
+        }
+        return ApplicationCommunicator(application, scope)
+
+    async def open(self, user, pk=None):
+        communicator = self.connect(user, pk)
+        await communicator.send_input({'type': 'websocket.connect'})
+        return communicator, await communicator.receive_output(timeout=3)
+
+    async def test_messages_fan_out_and_persist_in_batches(self):
+        customer, accepted = await self.open(self.customer)
+        staff, _ = await self.open(self.staff)
+        self.assertEqual(accepted['type'], 'websocket.accept')
+
+        for text in ['Chào anh', 'Tôi cần tư vấn']:
+            await customer.send_input({'type': 'websocket.receive', 'text': json.dumps({'message': text})})
+
+        received = [json.loads((await staff.receive_output(timeout=3))['text']) for _ in range(2)]
+        self.assertEqual([payload['message'] for payload in received], ['Chào anh', 'Tôi cần tư vấn'])
+        self.assertEqual(received[0]['sender_name'], 'khach')
+        echoed = json.loads((await customer.receive_output(timeout=3))['text'])
+        self.assertEqual(echoed['id'], received[0]['id'])
+        self.assertEqual(await ChatMessage.objects.filter(consultation=self.consultation).acount(), 2)
+
+        for communicator in (customer, staff):
+            await communicator.send_input({'type': 'websocket.disconnect', 'code': 1000})
+            await communicator.wait(timeout=3)
+
+    async def test_socket_db_calls_recycle_stale_connections(self):
+        # Không có request_started / request_finished: mỗi lần chạm DB tự dọn kết nối trước và sau
+        with mock.patch('api.chat.close_old_connections') as close:
+            customer, _ = await self.open(self.customer)
+            self.assertEqual(close.call_count, 4)  # xác thực token + tải phòng
+            await customer.send_input({'type': 'websocket.receive', 'text': json.dumps({'message': 'Chào'})})
+            await customer.receive_output(timeout=3)
+            self.assertEqual(close.call_count, 6)  # bulk_create của lô tin
+            await customer.send_input({'type': 'websocket.disconnect', 'code': 1000})
+            await customer.wait(timeout=3)
+
+    @override_settings(CHAT_MAX_MESSAGE_LENGTH=5)
+    async def test_socket_rejects_messages_over_max_length(self):
+        customer, _ = await self.open(self.customer)
+        await customer.send_input({'type': 'websocket.receive', 'text': json.dumps({'message': 'quá dài'})})
+        self.assertEqual(json.loads((await customer.receive_output(timeout=3))['text'])['type'], 'error')
+        await customer.send_input({'type': 'websocket.disconnect', 'code': 1000})
+        await customer.wait(timeout=3)
+
+    async def test_rejects_outsiders_and_missing_tokens(self):
+        _, closed = await self.open(self.outsider)
+        self.assertEqual(closed, {'type': 'websocket.close', 'code': 4403})
+        _, closed = await self.open(None)
+        self.assertEqual(closed['code'], 4401)
+        _, closed = await self.open(self.customer, pk=99999)
+        self.assertEqual(closed['code'], 4404)
+
+
+# --- CHAT REST / LONG-POLL ---
+class ChatHistoryTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.customer = make_user()
+        self.staff = make_user('nhanvien', role='staff', specialization='health')
+        self.consultation = ConsultationRequest.objects.create(
+            customer_name='KH', customer_contact='0900000000', user=self.customer, assigned_staff=self.staff
+        )
+        self.url = f'/api/consultations/{self.consultation.pk}/messages/'
+
+    def test_since_returns_only_newer_messages_in_constant_queries(self):
+        self.client.force_authenticate(self.customer)
+        first = self.client.post(self.url, {'message': 'Chào'}).json()
+        for i in range(5):
+            sender = self.staff if i % 2 else self.customer
+            ChatMessage.objects.create(consultation=self.consultation, sender=sender, message=f'Tin {i}')
+
+        # consultation + messages (JOIN sender), không phụ thuộc số tin
+        with self.assertNumQueries(2):
+            data = self.client.get(self.url, {'since': first['id']}).json()
+        self.assertEqual([row['message'] for row in data['results']], [f'Tin {i}' for i in range(5)])
+        self.assertEqual(data['results'][1]['sender_name'], 'nhanvien')
+
+        data = self.client.get(self.url, {'since': data['last_id'], 'wait': 0}).json()
+        self.assertEqual(data['results'], [])
+
+    def test_history_without_since_is_cursor_paginated(self):
+        for i in range(3):
+            ChatMessage.objects.create(consultation=self.consultation, sender=self.customer, message=f'Tin {i}')
+        self.client.force_authenticate(self.staff)
+        data = self.client.get(self.url).json()
+        self.assertEqual(data['results'][0]['message'], 'Tin 2')
+        self.assertIn('next', data)
+
+    @override_settings(CHAT_MAX_MESSAGE_LENGTH=10)
+    def test_post_rejects_messages_over_max_length(self):
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.client.post(self.url, {'message': 'x' * 11}).status_code, 400)
+        self.assertEqual(self.client.post(self.url, {'message': 'x' * 10}).status_code, 201)
+        self.assertEqual(ChatMessage.objects.count(), 1)
+
+    def test_outsider_cannot_read(self):
+        self.client.force_authenticate(make_user('nguoila'))
+        self.assertEqual(self.client.get(self.url, {'since': 0}).status_code, 404)
+        # Staff khác chuyên môn, không được giao -> bị lọc khỏi queryset
+        self.client.force_authenticate(make_user('nhanvien2', role='staff'))
+        self.assertEqual(self.client.get(self.url, {'since': 0}).status_code, 404)
+
+
+class ChatLongPollTests(TransactionTestCase):
+    def setUp(self):
+        get_store().clear()
+        self.customer = make_user()
+        self.staff = make_user('nhanvien', role='staff', specialization='health')
+        self.consultation = ConsultationRequest.objects.create(
+            customer_name='KH', customer_contact='0900000000', user=self.customer, assigned_staff=self.staff
+        )
+
+    def test_long_poll_wakes_up_on_new_message(self):
+        def reply():
+            time.sleep(0.3)
+            message = ChatMessage.objects.create(consultation=self.consultation, sender=self.staff, message='Dạ em nghe')
+            broadcast_saved_message(message)
+            connection.close()
+
+        client = APIClient()
+        client.force_authenticate(self.customer)
+        worker = threading.Thread(target=reply)
+        started = time.monotonic()
+        worker.start()
+        data = client.get(f'/api/consultations/{self.consultation.pk}/messages/', {'since': 0, 'wait': 10}).json()
+        worker.join()
+
+        self.assertEqual([row['message'] for row in data['results']], ['Dạ em nghe'])
+        self.assertLess(time.monotonic() - started, 3)
+
+    @override_settings(CHAT_LONG_POLL_RECHECK=0.5)
+    def test_long_poll_rechecks_for_messages_from_other_processes(self):
+        def reply():
+            # Process khác: không báo qua message_notifier của process này
+            time.sleep(0.2)
+            ChatMessage.objects.create(consultation=self.consultation, sender=self.staff, message='Từ worker khác')
+            connection.close()
+
+        client = APIClient()
+        client.force_authenticate(self.customer)
+        worker = threading.Thread(target=reply)
+        worker.start()
+        with CaptureQueriesContext(connection) as queries:
+            data = client.get(f'/api/consultations/{self.consultation.pk}/messages/', {'since': 0, 'wait': 10}).json()
+        worker.join()
+
+        self.assertEqual([row['message'] for row in data['results']], ['Từ worker khác'])
+        self.assertEqual(len([q for q in queries if 'api_chatmessage' in q['sql']]), 2)
@@ -0,0 +1,119 @@
+"""
+Throttle token bucket dùng chung giữa các worker (gunicorn nhiều process).
+
+Trạng thái bucket nằm trong 1 file SQLite (WAL) thay vì LocMemCache của từng process.
+Mỗi lần kiểm tra chỉ là 1 câu UPSERT ... RETURNING nguyên tử:
+nạp lại token theo thời gian đã trôi qua, trừ 1 token nếu còn, và trả kết quả.
+Production có thể thay TokenBucketStore bằng bản Redis (cùng interface `consume`).
+"""
+import os
+import random
+import time
+
+from django.conf import settings
+from rest_framework.settings import api_settings
+from rest_framework.throttling import AnonRateThrottle, SimpleRateThrottle, UserRateThrottle
+
+from .forksafe import SQLiteFileStore
+
+CONSUME_SQL = """
+INSERT INTO buckets (key, tokens, updated_at) VALUES (:key, :capacity - 1, :now)
+ON CONFLICT (key) DO UPDATE SET
+    tokens = min(:capacity, tokens + (:now - updated_at) * :rate) - 1,
+    updated_at = :now
+WHERE min(:capacity, tokens + (:now - updated_at) * :rate) >= 1
+RETURNING tokens
+"""
+
+# Bucket không được dùng lâu đã đầy lại -> xóa cũng như không (giữ file nhỏ)
+PRUNE_SQL = 'DELETE FROM buckets WHERE updated_at < :before'
+PRUNE_PROBABILITY = 0.001
+PRUNE_AGE = 2 * 86400
+
+
+class TokenBucketStore(SQLiteFileStore):
+    TABLE = 'buckets'
+    SCHEMA = 'CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL) WITHOUT ROWID'
+    PRAGMAS = ('synchronous=OFF',)
+
+    def consume(self, key, capacity, rate, now=None):
+        """Lấy 1 token từ bucket `key` (sức chứa `capacity`, nạp `rate` token/giây). True nếu được phép"""
+        now = time.time() if now is None else now
+        conn = self.connection()
+        row = conn.execute(CONSUME_SQL, {'key': key, 'capacity': capacity, 'rate': rate, 'now': now}).fetchone()
+        if random.random() < PRUNE_PROBABILITY:
+            conn.execute(PRUNE_SQL, {'before': now - PRUNE_AGE})
+        return row is not None
+
+
+def get_store():
+    path = getattr(settings, 'THROTTLE_STORE_PATH', os.path.join(settings.BASE_DIR, '.cache', 'throttle.sqlite3'))
+    return TokenBucketStore.shared(path)
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """
+    Giống SimpleRateThrottle ('N/period') nhưng dùng token bucket trong store chung:
+    sức chứa N, nạp lại đều N token mỗi period.
+    """
+
+    def get_rate(self):
+        # Đọc rate lúc chạy (SimpleRateThrottle.THROTTLE_RATES bị chốt từ lúc import)
+        self.THROTTLE_RATES = api_settings.DEFAULT_THROTTLE_RATES
+        return super().get_rate()
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        return get_store().consume(self.key, self.num_requests, self.num_requests / self.duration)
+
+    def wait(self):
+        # Thời gian nạp lại 1 token
+        return self.duration / self.num_requests
+
+
+class SharedAnonRateThrottle(TokenBucketThrottle, AnonRateThrottle):
+    pass
+
+
+class SharedUserRateThrottle(TokenBucketThrottle, UserRateThrottle):
+    pass
+
+
+class ScopedTokenBucketThrottle(TokenBucketThrottle):
+    """Bucket riêng cho 1 nhóm endpoint, theo user (đã login) hoặc IP"""
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+
+class CatalogThrottle(ScopedTokenBucketThrottle):
+    scope = 'catalog'
+
+
+class LoginThrottle(ScopedTokenBucketThrottle):
+    scope = 'login'
+
+    def get_cache_key(self, request, view):
+        # Login luôn là anonymous -> theo IP
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class BuyNowThrottle(ScopedTokenBucketThrottle):
+    scope = 'buy_now'
+
+
+class ConsultationThrottle(ScopedTokenBucketThrottle):
+    scope = 'consultation'
+
+
+class ChatThrottle(ScopedTokenBucketThrottle):
+    """Long-poll / gửi tin chat: thay cho quota user theo ngày"""
+    scope = 'chat'
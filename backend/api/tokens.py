@@ -0,0 +1,81 @@
+"""
+Kho token bị thu hồi (blacklist JWT) dùng chung cho refresh và đăng xuất.
+
+- Bảng RevokedToken: jti unique, expires_at có index -> kiểm tra 1 lần tra index, không phụ thuộc số dòng;
+  token hết hạn thì chữ ký JWT đã tự chặn, nên dòng đó xóa được (lệnh prune_revoked_tokens theo lô).
+- Trước DB là cache dùng chung giữa các worker (AUTH_USER_CACHE_ALIAS = 'auth'): "jti đã thu hồi?" -> True / False.
+  Thu hồi ghi đè ngay key trong cache -> worker khác thấy ngay, kể cả khi đang giữ kết quả "chưa thu hồi";
+  kết quả "chưa thu hồi" chỉ giữ REVOKED_TOKEN_NEGATIVE_TTL giây.
+  Alias phải là cache dùng chung thật (file / Redis / Memcached), không phải LocMemCache của từng process.
+"""
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import RevokedToken
+
+
+def revoked_cache():
+    # Cùng cache với User đã xác thực (api.authentication)
+    return caches[getattr(settings, 'AUTH_USER_CACHE_ALIAS', 'auth')]
+
+
+def revoked_cache_key(jti):
+    return f'auth:revoked:{jti}'
+
+
+def token_expires_at(token):
+    return datetime.fromtimestamp(token['exp'], tz=dt_timezone.utc)
+
+
+def seconds_left(expires_at, now=None):
+    return max(int((expires_at - (now or timezone.now())).total_seconds()), 1)
+
+
+def is_revoked(token):
+    jti = token.get(api_settings.JTI_CLAIM)
+    if not jti:
+        return False
+    key = revoked_cache_key(jti)
+    revoked = revoked_cache().get(key)
+    if revoked is None:
+        revoked = RevokedToken.objects.filter(jti=jti).exists()
+        timeout = seconds_left(token_expires_at(token))
+        if not revoked:
+            timeout = min(timeout, getattr(settings, 'REVOKED_TOKEN_NEGATIVE_TTL', 60))
+        revoked_cache().set(key, revoked, timeout)
+    return revoked
+
+
+def revoke_token(token):
+    """Thu hồi 1 token đã xác thực chữ ký. False nếu đã bị thu hồi trước đó (request khác dùng cùng token)"""
+    jti = token[api_settings.JTI_CLAIM]
+    expires_at = token_expires_at(token)
+    try:
+        with transaction.atomic():
+            RevokedToken.objects.create(
+                jti=jti,
+                token_type=token[api_settings.TOKEN_TYPE_CLAIM],
+                expires_at=expires_at,
+            )
+        created = True
+    except IntegrityError:
+        created = False
+    revoked_cache().set(revoked_cache_key(jti), True, seconds_left(expires_at))
+    return created
+
+
+def prune_revoked_tokens(now=None, batch_size=1000):
+    """Xóa jti đã hết hạn theo lô (mỗi lô 1 SELECT id + 1 DELETE, không khóa cả bảng lâu)"""
+    now = now or timezone.now()
+    expired = RevokedToken.objects.filter(expires_at__lt=now).order_by('expires_at')
+    total = 0
+    while True:
+        ids = list(expired.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return total
+        total += RevokedToken.objects.filter(pk__in=ids).delete()[0]
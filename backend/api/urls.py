@@ -7,14 +7,15 @@ from .views import (
     NewsViewSet, 
     ConsultationRequestViewSet, 
     DashboardSummaryView,
+    SalesAnalyticsView,
+    MetricsView,
     EmployeeViewSet,
     CartViewSet,
-    CategoryViewSet
-)
-from rest_framework_simplejwt.views import (
-    TokenObtainPairView,
-    TokenRefreshView,
+    CategoryViewSet,
+    LoginView,
+    LogoutView
 )
+from rest_framework_simplejwt.views import TokenRefreshView
 
 router = DefaultRouter()
 
@@ -36,7 +37,10 @@ urlpatterns = [
     path('', include(router.urls)),
     
     path('register/', UserViewSet.as_view({'post': 'create'}), name='register'),
-    path('login/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('login/', LoginView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('logout/', LogoutView.as_view(), name='logout'),
     path('dashboard/summary/', DashboardSummaryView.as_view(), name='dashboard-summary'),
+    path('analytics/sales/', SalesAnalyticsView.as_view(), name='analytics-sales'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
 ]
\ No newline at end of file
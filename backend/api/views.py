@@ -1,27 +1,61 @@
-from rest_framework import viewsets, permissions, status, filters, mixins
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+
+from rest_framework import viewsets, permissions, status, mixins
 from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.authtoken.models import Token
-from rest_framework.authtoken.views import ObtainAuthToken
-from django.db.models import Sum
+from rest_framework.exceptions import AuthenticationFailed, ValidationError
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from rest_framework_simplejwt.views import TokenObtainPairView
+from django.conf import settings
+from django.contrib.auth import aauthenticate, get_user_model
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Sum, Value
+from django.db.models.functions import Coalesce
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.utils.translation import gettext_lazy as _
 
 # Import Models
 from .models import (
     Product, Order, News, User, EnterpriseEmployee, 
     ConsultationRequest, ProductPackage, OrderItem, 
-    Cart, CartItem
+    Cart, CartItem, ChatMessage, OrderBeneficiary
 )
 
 # Import Serializers
 from .serializers import (
     ProductSerializer, OrderSerializer, EnterpriseEmployeeSerializer,
     RegisterSerializer, CartItemSerializer, OrderItemSerializer,
-    ProductPackageSerializer, ConsultationRequestSerializer, NewsSerializer
+    ProductPackageSerializer, ConsultationRequestSerializer, NewsSerializer,
+    ChatMessageSerializer, OrderBeneficiarySerializer, BeneficiaryAssignmentSerializer
 )
 
 # Import Permissions
-from .permissions import IsOwnerOrAdmin
+from .permissions import IsAdminOrMetricsToken, IsConsultationParticipant, IsOwnerOrAdmin, visible_consultations
+from .cache import CatalogCacheMixin, bump_catalog_version
+from .images import schedule_variants
+from .pagination import ChatMessageCursorPagination, CoverageEndCursorPagination, CreatedAtCursorPagination
+from .order_codes import create_order
+from .metrics import dashboard_totals
+from .analytics import GROUP_FIELDS, PERIODS, record_order_sales, sales_series
+from .search import ProductSearchFilter
+from .throttling import BuyNowThrottle, CatalogThrottle, ChatThrottle, ConsultationThrottle, LoginThrottle
+from .chat import broadcast_saved_message, message_notifier
+from .rosters import RosterFileError, export_roster, import_roster
+from .tokens import revoke_token
+from .instrumentation import collect as collect_metrics
+from .coverage import assign_beneficiaries, employee_coverage, expiring_orders, remove_beneficiaries
+
+LONG_POLL_BATCH = 200   # Số tin tối đa / lần trả về (?since=)
 
 # --- AUTH VIEWSETS ---
 
@@ -30,24 +64,85 @@ class RegisterView(viewsets.GenericViewSet, mixins.CreateModelMixin):
     serializer_class = RegisterSerializer
     permission_classes = [permissions.AllowAny]
 
-class CustomLoginView(ObtainAuthToken):
-    def post(self, request, *args, **kwargs):
-        serializer = self.serializer_class(data=request.data, context={'request': request})
-        serializer.is_valid(raise_exception=True)
-        user = serializer.validated_data['user']
-        token, created = Token.objects.get_or_create(user=user)
-        return Response({
-            'token': token.key,
-            'user_id': user.pk,
-            'role': user.role,
-            'email': user.email
-        })
+class LoginView(TokenObtainPairView):
+    """
+    View async: throttle, tra User, phát token chạy qua sync_to_async như view thường,
+    còn băm mật khẩu chạy trong pool giới hạn (PooledModelBackend) -> không chiếm thread / event loop.
+    """
+    throttle_classes = [LoginThrottle]
+
+    async def dispatch(self, request, *args, **kwargs):
+        # DRF chưa có dispatch async: chỉ khác APIView.dispatch ở chỗ await handler
+        self.args, self.kwargs = args, kwargs
+        self.request = request = self.initialize_request(request, *args, **kwargs)
+        self.headers = self.default_response_headers
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            response = await self.post(request, *args, **kwargs) if request.method == 'POST' \
+                else self.http_method_not_allowed(request)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def post(self, request, *args, **kwargs):
+        serializer_class = self.get_serializer_class()
+        username_field = get_user_model().USERNAME_FIELD
+        errors = {field: [_('This field is required.')] for field in (username_field, 'password') if not request.data.get(field)}
+        if errors:
+            raise ValidationError(errors)
+
+        # Qua AUTHENTICATION_BACKENDS (PooledModelBackend) -> sai mật khẩu phát user_login_failed
+        user = await aauthenticate(
+            request._request, **{username_field: request.data[username_field], 'password': request.data['password']}
+        )
+        if user is None or not jwt_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(serializer_class.default_error_messages['no_active_account'], 'no_active_account')
+        return Response(await sync_to_async(serializer_class.token_data)(user))
+
+class LogoutView(APIView):
+    """
+    Thu hồi refresh token (và access token gửi kèm trong header, nếu còn hạn).
+    Không chạy xác thực JWT của DRF (refresh token là thông tin xác thực) -> access token hết hạn vẫn đăng xuất được.
+    """
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+
+    def post(self, request):
+        try:
+            refresh = RefreshToken(request.data.get('refresh', ''))
+        except TokenError as e:
+            raise InvalidToken(e.args[0])
+        revoke_token(refresh)
+        access = self.access_token(request, refresh)
+        if access is not None:
+            revoke_token(access)
+        return Response(status=status.HTTP_205_RESET_CONTENT)
+
+    def get_authenticate_header(self, request):
+        # Refresh token sai -> 401 như /api/token/refresh/ (không có authentication_classes DRF trả 403)
+        return JWTAuthentication().authenticate_header(request)
+
+    @staticmethod
+    def access_token(request, refresh):
+        """Access token trong header Authorization nếu còn hạn và cùng user với refresh token"""
+        authenticator = JWTAuthentication()
+        header = authenticator.get_header(request)
+        raw_token = authenticator.get_raw_token(header) if header else None
+        if raw_token is None:
+            return None
+        try:
+            access = AccessToken(raw_token)
+        except TokenError:
+            return None  # Hết hạn / sai chữ ký: không dùng được nữa, không cần thu hồi
+        user_id_claim = jwt_settings.USER_ID_CLAIM
+        return access if access.get(user_id_claim) == refresh.get(user_id_claim) else None
 
 class UserViewSet(viewsets.ModelViewSet):
     """
     Quản lý User & Lấy thông tin cá nhân (me)
     """
-    queryset = User.objects.all()
+    queryset = User.objects.order_by('id')
     serializer_class = RegisterSerializer
 
     def get_permissions(self):
@@ -64,22 +159,35 @@ class UserViewSet(viewsets.ModelViewSet):
 
 # --- BUSINESS VIEWSETS ---
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(CatalogCacheMixin, viewsets.ModelViewSet):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
-    filter_backends = [filters.SearchFilter]
-    search_fields = ['name', 'category__name']
+    # ?search= : full-text bỏ dấu, xếp hạng (api/search.py)
+    filter_backends = [ProductSearchFilter]
+    throttle_classes = [CatalogThrottle]
+    catalog_cache_actions = ['list', 'retrieve', 'featured']
 
     def get_permissions(self):
         if self.action in ['create', 'update', 'destroy']:
             return [permissions.IsAdminUser()]
         return [permissions.AllowAny()]
 
+    def get_queryset(self):
+        queryset = Product.objects.order_by('-created_at', '-id')
+        # Các action đọc serialize kèm images/packages -> load sẵn để tránh N+1
+        if self.action in ['list', 'retrieve', 'featured']:
+            queryset = queryset.select_related('category').prefetch_related('images', 'packages')
+        if self.action == 'featured':
+            queryset = queryset.filter(is_featured=True)
+        return queryset
+
     @action(detail=False, methods=['get'])
     def featured(self, request):
-        products = Product.objects.filter(is_featured=True)
-        serializer = self.get_serializer(products, many=True)
-        return Response(serializer.data)
+        def build():
+            products = self.get_queryset()
+            serializer = self.get_serializer(products, many=True)
+            return Response(serializer.data)
+        return self.cached_response(request, build)
 
 
 # --- SỬA LẠI HÀM CREATE ĐỂ HỖ TRỢ NHIỀU ẢNH ---
@@ -95,8 +203,11 @@ class ProductViewSet(viewsets.ModelViewSet):
         
         if images:
             from .models import ProductImage
-            for img in images:
-                ProductImage.objects.create(product=product, image=img)
+            # 1 câu INSERT cho cả album; bulk_create không gửi signal -> tự báo cache + hàng đợi xử lý ảnh
+            created = ProductImage.objects.bulk_create([ProductImage(product=product, image=img) for img in images])
+            for image in created:
+                schedule_variants(image, 'image', 'variants')
+            transaction.on_commit(bump_catalog_version)
 
         headers = self.get_success_headers(serializer.data)
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
@@ -104,14 +215,17 @@ class ProductViewSet(viewsets.ModelViewSet):
 class OrderViewSet(viewsets.ModelViewSet):
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination
 
     def get_queryset(self):
         user = self.request.user
-        if user.role in ['admin', 'super_admin']:
-            return Order.objects.all()
-        return Order.objects.filter(user=user)
+        queryset = Order.objects.all() if user.role in ['admin', 'super_admin'] else Order.objects.filter(user=user)
+        # OrderSerializer trả kèm items -> load sẵn cho cả trang, số query không tăng theo số đơn
+        if self.action in ['list', 'retrieve']:
+            queryset = queryset.prefetch_related('items__package__product')
+        return queryset
 
-    @action(detail=False, methods=['post'])
+    @action(detail=False, methods=['post'], throttle_classes=[BuyNowThrottle])
     def buy_now(self, request):
         package_id = request.data.get('package_id')
         quantity = int(request.data.get('quantity', 1))
@@ -119,32 +233,134 @@ class OrderViewSet(viewsets.ModelViewSet):
         try:
             package = ProductPackage.objects.get(id=package_id)
             total = package.price * quantity
-            import time
-            order_code = f"ORD-{int(time.time())}"
-            
-            order = Order.objects.create(
-                user=request.user,
-                total_amount=total,
-                status='pending',
-                code=order_code
-            )
-            OrderItem.objects.create(order=order, package=package, quantity=quantity)
+
+            # Order + OrderItem trong cùng 1 transaction, mã đơn cấp bởi order_codes (không trùng khi checkout đồng thời)
+            # Thời gian hiệu lực đặt khi Admin xác nhận đơn (api.coverage.open_coverage)
+            with transaction.atomic():
+                order = create_order(
+                    user=request.user,
+                    total_amount=total,
+                    status='pending',
+                )
+                OrderItem.objects.bulk_create([
+                    OrderItem(order=order, package=package, quantity=quantity, unit_price=package.price)
+                ])
+                # Như checkout: bulk_create không gửi signal -> cộng bucket doanh thu trực tiếp
+                record_order_sales(order.pk, order.status)
             return Response(OrderSerializer(order).data, status=status.HTTP_201_CREATED)
         except ProductPackage.DoesNotExist:
             return Response({"error": "Gói sản phẩm không tồn tại"}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=False, methods=['post'], throttle_classes=[BuyNowThrottle])
+    def checkout(self, request):
+        """Chuyển toàn bộ giỏ hàng thành 1 Order (số query cố định, không phụ thuộc số dòng)"""
+        with transaction.atomic():
+            # Khóa dòng Cart: 2 lần submit song song sẽ xếp hàng, lần sau thấy giỏ đã trống
+            cart = Cart.objects.select_for_update().filter(user=request.user).first()
+            items = list(CartItem.objects.filter(cart=cart).select_related('package').order_by('id')) if cart else []
+            if not items:
+                return Response({"error": "Giỏ hàng trống"}, status=status.HTTP_400_BAD_REQUEST)
+
+            # Tổng tiền và giá từng dòng lấy từ cùng 1 lần đọc giá -> total_amount khớp với OrderItem.unit_price
+            item_ids = [item.pk for item in items]
+            order = create_order(
+                user=request.user,
+                total_amount=sum(item.package.price * item.quantity for item in items),
+                status='pending',
+                beneficiary_note=request.data.get('beneficiary_note', ''),
+            )
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, package_id=item.package_id, quantity=item.quantity, unit_price=item.package.price)
+                for item in items
+            ])
+            # bulk_create không gửi signal của OrderItem -> cộng bucket doanh thu 1 lần cho cả đơn
+            record_order_sales(order.pk, order.status)
+            # Chỉ xóa đúng các dòng đã đặt (dòng `add` chen vào sau khi đọc vẫn còn trong giỏ)
+            CartItem.objects.filter(pk__in=item_ids).delete()
+
+        order = Order.objects.prefetch_related('items__package__product').get(pk=order.pk)
+        return Response(OrderSerializer(order).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['get'], pagination_class=CoverageEndCursorPagination)
+    def expiring(self, request):
+        """Đơn đang hiệu lực sắp hết hạn trong ?days= ngày (mặc định 30) -> chiến dịch tái tục"""
+        try:
+            days = min(int(request.query_params.get('days', 30)), 366)
+        except ValueError:
+            return Response({"error": "days không hợp lệ"}, status=status.HTTP_400_BAD_REQUEST)
+        queryset = expiring_orders(days, self.get_queryset())
+        page = self.paginate_queryset(queryset.prefetch_related('items__package__product'))
+        return self.get_paginated_response(OrderSerializer(page, many=True).data)
+
+    @action(detail=True, methods=['get', 'post', 'delete'])
+    def beneficiaries(self, request, pk=None):
+        """
+        Người thụ hưởng của đơn DN.
+        GET: danh sách (cursor). POST {"employees": [id...], "order_item": id?}: gán hàng loạt.
+        DELETE {"employees": [id...]}: bỏ gán.
+        """
+        order = self.get_object()
+        if request.method == 'GET':
+            queryset = OrderBeneficiary.objects.filter(order=order).select_related('employee')
+            page = self.paginate_queryset(queryset)
+            return self.get_paginated_response(OrderBeneficiarySerializer(page, many=True).data)
+
+        serializer = BeneficiaryAssignmentSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        employee_ids = serializer.validated_data['employees']
+        if request.method == 'DELETE':
+            return Response({"removed": remove_beneficiaries(order, employee_ids)})
+
+        if order.status == 'cancelled':
+            return Response({"error": "Đơn đã hủy"}, status=status.HTTP_400_BAD_REQUEST)
+        order_item = None
+        if serializer.validated_data.get('order_item') is not None:
+            order_item = order.items.filter(pk=serializer.validated_data['order_item']).first()
+            if order_item is None:
+                return Response({"error": "Sản phẩm không thuộc đơn này"}, status=status.HTTP_400_BAD_REQUEST)
+        with transaction.atomic():
+            created, invalid = assign_beneficiaries(order, employee_ids, order_item)
+        return Response({"created": created, "invalid_employees": invalid}, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
 class EmployeeViewSet(viewsets.ModelViewSet):
     serializer_class = EnterpriseEmployeeSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return EnterpriseEmployee.objects.filter(enterprise=self.request.user)
+        return EnterpriseEmployee.objects.filter(enterprise=self.request.user).order_by('id')
 
     def perform_create(self, serializer):
         serializer.save(enterprise=self.request.user)
 
+    @action(detail=True, methods=['get'])
+    def coverage(self, request, pk=None):
+        """Nhân viên có đang được bảo hiểm không, đến khi nào (1 query, không cần load nhân viên)"""
+        try:
+            employee_id = int(pk)
+        except ValueError:
+            return Response({"error": "Mã nhân viên không hợp lệ"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(employee_coverage(request.user, employee_id))
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_roster(self, request):
+        """Upload file CSV/XLSX (field `file`): tạo hàng loạt, bỏ qua dòng trùng SĐT/email, trả lỗi theo dòng"""
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({"error": "Thiếu file"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            result = import_roster(request.user, upload)
+        except RosterFileError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result, status=status.HTTP_201_CREATED if result['created'] else status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        response = StreamingHttpResponse(export_roster(self.get_queryset()), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = 'attachment; filename="nhan-vien.csv"'
+        return response
+
 class ConsultationRequestViewSet(viewsets.ModelViewSet):
     """
     Class này để khớp với urls.py (router.register(..., ConsultationRequestViewSet))
@@ -152,18 +368,78 @@ class ConsultationRequestViewSet(viewsets.ModelViewSet):
     queryset = ConsultationRequest.objects.all()
     serializer_class = ConsultationRequestSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination
+
+    def get_throttles(self):
+        if self.action == 'create':
+            return super().get_throttles() + [ConsultationThrottle()]
+        return super().get_throttles()
 
     def get_queryset(self):
-        user = self.request.user
-        if user.role == 'staff':
-            return ConsultationRequest.objects.all() 
-        elif user.role == 'customer':
-            return ConsultationRequest.objects.filter(user=user)
-        return ConsultationRequest.objects.all()
-
-class NewsViewSet(viewsets.ModelViewSet):
-    queryset = News.objects.all()
+        # Quyền xem lọc ngay trong queryset (không phụ thuộc filter_backends) -> list staff chỉ 1 query
+        return ConsultationRequest.objects.filter(visible_consultations(self.request.user)).select_related(
+            'product__category', 'user', 'assigned_staff'
+        )
+
+    @action(
+        detail=True, methods=['get', 'post'],
+        permission_classes=[permissions.IsAuthenticated, IsConsultationParticipant],
+        throttle_classes=[ChatThrottle],
+        pagination_class=ChatMessageCursorPagination,
+    )
+    def messages(self, request, pk=None):
+        """
+        Chat cho client không dùng được WebSocket.
+        GET ?since=<id>&wait=<giây>: tin mới hơn `since` (tăng dần), chờ tối đa `wait` giây nếu chưa có.
+        GET không có since: lịch sử (cursor, mới nhất trước). POST {"message": "..."}: gửi tin.
+
+        Long-poll chỉ là đường dự phòng (dev / client cũ): view sync -> mỗi request đang chờ giữ 1 thread
+        của worker. Tin gửi qua cùng process đánh thức ngay (message_notifier); tin từ process khác chỉ
+        thấy ở lần kiểm tra lại sau mỗi CHAT_LONG_POLL_RECHECK giây. Client thật dùng WebSocket (api/chat.py).
+        """
+        consultation = self.get_object()
+        if request.method == 'POST':
+            text = str(request.data.get('message', '')).strip()
+            if not text:
+                return Response({"error": "Tin nhắn trống"}, status=status.HTTP_400_BAD_REQUEST)
+            if len(text) > settings.CHAT_MAX_MESSAGE_LENGTH:
+                return Response({"error": "Tin nhắn quá dài"}, status=status.HTTP_400_BAD_REQUEST)
+            message = ChatMessage.objects.create(consultation=consultation, sender=request.user, message=text)
+            transaction.on_commit(lambda: broadcast_saved_message(message))
+            return Response(ChatMessageSerializer(message).data, status=status.HTTP_201_CREATED)
+
+        messages = ChatMessage.objects.filter(consultation=consultation).select_related('sender')
+        if 'since' not in request.query_params:
+            page = self.paginate_queryset(messages)
+            return self.get_paginated_response(ChatMessageSerializer(page, many=True).data)
+
+        try:
+            since = int(request.query_params['since'])
+            wait = max(0.0, min(float(request.query_params.get('wait', 0)), settings.CHAT_LONG_POLL_MAX_WAIT))
+        except ValueError:
+            return Response({"error": "since/wait không hợp lệ"}, status=status.HTTP_400_BAD_REQUEST)
+
+        newer = messages.filter(id__gt=since).order_by('id')
+        deadline = time.monotonic() + wait
+        while True:
+            # Lấy version trước khi query -> không bỏ lỡ tin đến giữa lúc query và lúc chờ
+            seen = message_notifier.version(consultation.pk)
+            results = list(newer[:LONG_POLL_BATCH])
+            remaining = deadline - time.monotonic()
+            if results or remaining <= 0:
+                break
+            # Tin từ process khác không báo được qua notifier -> tự kiểm tra lại định kỳ (thưa, tốn 1 query / lần)
+            message_notifier.wait(consultation.pk, seen, min(remaining, settings.CHAT_LONG_POLL_RECHECK))
+
+        return Response({
+            "results": ChatMessageSerializer(results, many=True).data,
+            "last_id": results[-1].pk if results else since
+        })
+
+class NewsViewSet(CatalogCacheMixin, viewsets.ModelViewSet):
+    queryset = News.objects.order_by('-created_at', '-id')
     serializer_class = NewsSerializer
+    throttle_classes = [CatalogThrottle]
     # Cho phép Admin đăng bài (create), khách chỉ xem (list/retrieve)
     def get_permissions(self):
         if self.action in ['create', 'update', 'destroy']:
@@ -174,13 +450,19 @@ class CartViewSet(viewsets.ViewSet):
     permission_classes = [permissions.IsAuthenticated]
 
     def list(self, request):
-        cart, _ = Cart.objects.get_or_create(user=request.user)
-        items = cart.items.all()
-        total_price = sum(item.package.price * item.quantity for item in items)
+        # Lọc thẳng theo cart__user: không cần get_or_create Cart chỉ để xem (Cart tạo ở `add`)
+        items = CartItem.objects.filter(cart__user=request.user).select_related('package__product').order_by('id')
+        totals = items.aggregate(
+            total_price=Coalesce(
+                Sum(F('package__price') * F('quantity')), Value(0),
+                output_field=DecimalField(max_digits=15, decimal_places=0)
+            ),
+            total_items=Count('id'),
+        )
         return Response({
             "items": CartItemSerializer(items, many=True).data,
-            "total_price": total_price,
-            "total_items": items.count()
+            "total_price": totals['total_price'],
+            "total_items": totals['total_items']
         })
 
     @action(detail=False, methods=['post'])
@@ -220,20 +502,61 @@ class DashboardSummaryView(APIView):
     permission_classes = [permissions.IsAdminUser]
 
     def get(self, request):
-        total_revenue = Order.objects.filter(status='active').aggregate(Sum('total_amount'))['total_amount__sum'] or 0
-        total_orders = Order.objects.count()
-        pending_orders = Order.objects.filter(status='pending').count()
-        
+        # Đọc bảng tổng hợp (vài dòng) thay vì aggregate cả bảng Order
+        totals = dashboard_totals()
+
         # Lấy 5 đơn mới nhất
-        recent_orders = Order.objects.order_by('-created_at')[:5]
+        recent_orders = Order.objects.order_by('-created_at', '-id').prefetch_related('items__package__product')[:5]
         recent_orders_data = OrderSerializer(recent_orders, many=True).data
 
         return Response({
-            "revenue": total_revenue,
-            "total_orders": total_orders,
-            "pending_orders": pending_orders,
+            "revenue": totals['revenue'],
+            "total_orders": totals['total_orders'],
+            "pending_orders": totals['pending_orders'],
             "recent_orders": recent_orders_data
         })
+
+
+class MetricsView(APIView):
+    """Số liệu request (thời gian, số query, N+1) của mọi worker, định dạng text Prometheus"""
+    permission_classes = [IsAdminOrMetricsToken]
+    throttle_classes = []  # Prometheus scrape mỗi 15 giây
+
+    def get(self, request):
+        return HttpResponse(collect_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class SalesAnalyticsView(APIView):
+    """
+    Doanh thu theo ngày/tuần/tháng, tách theo danh mục hoặc đối tượng (đọc bảng DailySalesBucket)
+    GET /api/analytics/sales/?start=2026-01-01&end=2026-03-31&granularity=week&group_by=category&status=active
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        params = request.query_params
+        try:
+            end = parse_date(params['end']) if params.get('end') else timezone.localdate()
+            start = parse_date(params['start']) if params.get('start') else end - timedelta(days=30)
+        except (TypeError, ValueError):
+            start = end = None
+        granularity = params.get('granularity', 'day')
+        group_by = params.get('group_by') or None
+        # Mặc định bỏ đơn đã hủy
+        statuses = params['status'].split(',') if params.get('status') else ['pending', 'confirmed', 'active', 'expired']
+
+        if not start or not end or start > end:
+            return Response({"error": "Khoảng ngày không hợp lệ (YYYY-MM-DD)"}, status=status.HTTP_400_BAD_REQUEST)
+        if granularity not in PERIODS or (group_by and group_by not in GROUP_FIELDS):
+            return Response({"error": "granularity/group_by không hợp lệ"}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            "start": start,
+            "end": end,
+            "granularity": granularity,
+            "group_by": group_by,
+            "results": sales_series(start, end, granularity, group_by, statuses)
+        })
         
         
 
@@ -244,9 +567,10 @@ from .serializers import CategorySerializer
 # Mở file views.py bên Backend (Django)
 from rest_framework.permissions import AllowAny, IsAdminUser
 
-class CategoryViewSet(viewsets.ModelViewSet):
-    queryset = Category.objects.all()
+class CategoryViewSet(CatalogCacheMixin, viewsets.ModelViewSet):
+    queryset = Category.objects.order_by('id')
     serializer_class = CategorySerializer
+    throttle_classes = [CatalogThrottle]
     
     # Ghi đè hàm phân quyền
     def get_permissions(self):
@@ -0,0 +1,137 @@
+"""
+Microbenchmark từng endpoint trong api/urls.py + ngân sách số query.
+
+    cd backend && python -m benchmarks.endpoints [--orders 20000] [--repeat 30] [--check]
+
+Mỗi endpoint: 1 lần làm nóng (cache User / JWT), rồi `repeat` lần đo thời gian (p50 / p95) và số query.
+Endpoint catalog (cache) đo ở trạng thái cache trống -> thấy đúng số query khi cache hết hạn.
+--check: thoát mã 1 nếu endpoint nào lỗi / vượt `budget` (chạy trước khi deploy; test
+api.tests.EndpointQueryBudgetTests chạy cùng bảng này trên dữ liệu nhỏ).
+"""
+import argparse
+import sys
+import tempfile
+import time
+
+from benchmarks.utils import isolated_settings, percentiles, scratch_database, setup_django
+
+
+class Endpoint:
+    def __init__(self, name, path, role=None, method='get', body=None, budget=0, cold=False):
+        self.name = name
+        self.path = path  # str hoặc hàm(data) -> str
+        self.role = role  # None: khách vãng lai; 'customer' / 'staff' / 'admin'
+        self.method = method
+        self.body = body  # hàm(data) -> dict
+        self.budget = budget  # Số query tối đa / request (sau khi làm nóng)
+        self.cold = cold  # Xóa cache catalog trước mỗi lần gọi
+
+    def resolve(self, data):
+        path = self.path(data) if callable(self.path) else self.path
+        return path, self.body(data) if self.body else None
+
+
+ENDPOINTS = [
+    Endpoint('Danh mục', '/api/categories/', budget=2, cold=True),
+    Endpoint('Danh sách sản phẩm', '/api/products/', budget=4, cold=True),
+    Endpoint('Sản phẩm nổi bật', '/api/products/featured/', budget=3, cold=True),
+    Endpoint('Chi tiết sản phẩm', lambda data: f'/api/products/{data["products"][0].pk}/', budget=3, cold=True),
+    Endpoint('Tìm sản phẩm', '/api/products/?search=san pham', budget=5, cold=True),
+    Endpoint('Tin tức', '/api/news/', budget=2, cold=True),
+    Endpoint('Thông tin tôi', '/api/users/me/', role='customer', budget=0),
+    Endpoint('Xem giỏ', '/api/cart/', role='customer', budget=2),
+    Endpoint('Thêm giỏ', '/api/cart/add/', role='customer', method='post',
+             body=lambda data: {'package_id': data['packages'][0].pk, 'quantity': 1}, budget=4),
+    Endpoint('Mua ngay', '/api/orders/buy_now/', role='customer', method='post',
+             body=lambda data: {'package_id': data['packages'][0].pk, 'quantity': 1}, budget=13),
+    Endpoint('Đơn của tôi', '/api/orders/', role='customer', budget=4),
+    Endpoint('Tư vấn của staff', '/api/consultations/', role='staff', budget=1),
+    Endpoint('Chat tư vấn', lambda data: f'/api/consultations/{data["consultations"][0].pk}/messages/',
+             role='admin', budget=2),
+    Endpoint('Dashboard', '/api/dashboard/summary/', role='admin', budget=5),
+    Endpoint('Analytics doanh thu', '/api/analytics/sales/?group_by=category', role='admin', budget=1),
+    Endpoint('Đơn sắp hết hạn', '/api/orders/expiring/', role='admin', budget=4),
+]
+
+
+def role_users(data):
+    return {'customer': data['customers'][0], 'staff': data['staff'][0], 'admin': data['admin']}
+
+
+def client_for(role, users):
+    from rest_framework.test import APIClient
+    from rest_framework_simplejwt.tokens import RefreshToken
+
+    client = APIClient()
+    if role:
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(users[role]).access_token}')
+    return client
+
+
+def measure(endpoint, data, users, repeat):
+    """(mã HTTP, số query lớn nhất, mẫu thời gian ms)"""
+    from django.core.cache import caches
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    client = client_for(endpoint.role, users)
+    path, body = endpoint.resolve(data)
+
+    def call():
+        if endpoint.cold:
+            caches['catalog'].clear()
+        if body is None:
+            return getattr(client, endpoint.method)(path)
+        return getattr(client, endpoint.method)(path, body, format='json')
+
+    call()
+    samples, queries, status_code = [], 0, None
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            status_code = call().status_code
+            samples.append((time.perf_counter() - start) * 1000)
+        queries = max(queries, len(captured))
+    return status_code, queries, samples
+
+
+def run(data, repeat=30, endpoints=ENDPOINTS):
+    users = role_users(data)
+    return [(endpoint, *measure(endpoint, data, users, repeat)) for endpoint in endpoints]
+
+
+def over_budget(results):
+    return [
+        (endpoint, status_code, queries) for endpoint, status_code, queries, _ in results
+        if status_code >= 400 or queries > endpoint.budget
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=30)
+    parser.add_argument('--check', action='store_true')
+    args = parser.parse_args()
+
+    setup_django()
+    from benchmarks.seed import seed
+
+    with tempfile.TemporaryDirectory() as tmp_dir, isolated_settings(tmp_dir), scratch_database():
+        data = seed(orders=args.orders, consultations=args.orders // 4, messages=args.orders, rebuild=True)
+        results = run(data, args.repeat)
+
+    print(f'{"Endpoint":<22}{"HTTP":>6}{"Query":>8}{"Ngân sách":>11}{"p50 (ms)":>10}{"p95 (ms)":>10}')
+    for endpoint, status_code, queries, samples in results:
+        cuts = percentiles(samples)
+        print(f'{endpoint.name:<22}{status_code:>6}{queries:>8}{endpoint.budget:>11}{cuts[50]:>10.2f}{cuts[95]:>10.2f}')
+
+    failures = over_budget(results)
+    for endpoint, status_code, queries in failures:
+        print(f'VƯỢT: {endpoint.name} (HTTP {status_code}, {queries} query > {endpoint.budget})', file=sys.stderr)
+    if args.check and failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
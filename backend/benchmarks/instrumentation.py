@@ -0,0 +1,75 @@
+"""
+Chi phí của InstrumentationMiddleware (api/instrumentation.py): thời gian median / request khi bật và tắt.
+
+    cd backend && python -m benchmarks.instrumentation [--repeat 300] [--sample-rate 0.1]
+
+Middleware đọc cấu hình khi được nạp -> mỗi bên 1 client riêng (nạp middleware lúc bật / tắt);
+gửi xen kẽ từng request để nhiễu của máy chia đều cho 2 bên.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from benchmarks.utils import isolated_settings, scratch_database, setup_django
+
+ENDPOINT_NAMES = ['Thông tin tôi', 'Danh sách sản phẩm', 'Đơn của tôi', 'Dashboard']
+
+
+def compare(endpoint, data, users, repeat):
+    from django.core.cache import caches
+    from django.test import override_settings
+
+    from benchmarks.endpoints import client_for
+
+    path, _ = endpoint.resolve(data)
+    clients, samples = {}, {True: [], False: []}
+    for enabled in (True, False):
+        clients[enabled] = client_for(endpoint.role, users)
+        with override_settings(INSTRUMENTATION_ENABLED=enabled):
+            clients[enabled].get(path)
+    for _ in range(repeat):
+        for enabled in (True, False):
+            if endpoint.cold:
+                caches['catalog'].clear()
+            start = time.perf_counter()
+            clients[enabled].get(path)
+            samples[enabled].append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples[False]), statistics.median(samples[True])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=300)
+    parser.add_argument('--orders', type=int, default=5000)
+    parser.add_argument('--sample-rate', type=float, default=None, help='INSTRUMENTATION_QUERY_SAMPLE_RATE (mặc định theo settings)')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.test import override_settings
+
+    from benchmarks.endpoints import ENDPOINTS, role_users
+    from benchmarks.seed import seed
+
+    from django.conf import settings
+
+    sample_rate = settings.INSTRUMENTATION_QUERY_SAMPLE_RATE if args.sample_rate is None else args.sample_rate
+    with tempfile.TemporaryDirectory() as tmp_dir, isolated_settings(tmp_dir), scratch_database(), override_settings(
+        INSTRUMENTATION_STORE_PATH=os.path.join(tmp_dir, 'metrics.sqlite3'), INSTRUMENTATION_QUERY_SAMPLE_RATE=sample_rate,
+    ):
+        data = seed(orders=args.orders, consultations=args.orders // 4, messages=args.orders, rebuild=True)
+        users = role_users(data)
+        results = [
+            (endpoint.name, *compare(endpoint, data, users, args.repeat))
+            for endpoint in ENDPOINTS if endpoint.name in ENDPOINT_NAMES
+        ]
+
+    print(f'Lấy mẫu SQL: {sample_rate:.0%} request')
+    print(f'{"Endpoint":<22}{"Tắt (ms)":>10}{"Bật (ms)":>10}{"Chênh":>9}')
+    for name, disabled, enabled in results:
+        print(f'{name:<22}{disabled:>10.3f}{enabled:>10.3f}{(enabled / disabled - 1) * 100:>8.1f}%')
+
+
+if __name__ == '__main__':
+    main()
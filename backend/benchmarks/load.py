@@ -0,0 +1,116 @@
+"""
+Chạy kịch bản tải (benchmarks/scenario.py) local trên SQLite, không cần server:
+N khách ảo (thread, test client + JWT) lặp browse -> thêm giỏ -> buy_now, 1 admin ảo xem dashboard.
+
+    cd backend && python -m benchmarks.load [--users 8] [--iterations 20] [--orders 20000]
+
+In p50 / p95 / p99 (ms) theo bước + số request / giây toàn bộ. DB là file SQLite tạm (WAL) để các thread
+ghi đồng thời như nhiều worker; con số chỉ để so sánh giữa các commit trên cùng máy.
+"""
+import argparse
+import random
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+from benchmarks.utils import isolated_settings, percentiles, scratch_database, setup_django
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def add(self, name, ms, ok):
+        with self._lock:
+            self.samples[name].append(ms)
+            if not ok:
+                self.errors[name] += 1
+
+
+class LocalSession:
+    """session của scenario qua APIClient (đi qua toàn bộ middleware, auth JWT, throttle)"""
+
+    def __init__(self, client, recorder):
+        self.client = client
+        self.recorder = recorder
+
+    def request(self, name, method, path, data=None):
+        start = time.perf_counter()
+        response = getattr(self.client, method)(path, data, format='json') if data is not None \
+            else getattr(self.client, method)(path)
+        ok = response.status_code < 400
+        self.recorder.add(name, (time.perf_counter() - start) * 1000, ok)
+        return response.json() if ok and response.get('Content-Type', '').startswith('application/json') else None
+
+    def get(self, name, path):
+        return self.request(name, 'get', path)
+
+    def post(self, name, path, data):
+        return self.request(name, 'post', path, data)
+
+
+def virtual_user(user, task, iterations, recorder, seed_value):
+    from django.db import connection
+    from rest_framework.test import APIClient
+    from rest_framework_simplejwt.tokens import RefreshToken
+
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+    session, rng = LocalSession(client, recorder), random.Random(seed_value)
+    try:
+        for _ in range(iterations):
+            task(session, rng)
+    finally:
+        connection.close()
+
+
+def run(data, users, iterations):
+    from benchmarks.scenario import dashboard, shop
+
+    recorder = Recorder()
+    threads = [
+        threading.Thread(target=virtual_user, args=(customer, shop, iterations, recorder, index))
+        for index, customer in enumerate(data['customers'][:users])
+    ]
+    threads.append(threading.Thread(target=virtual_user, args=(data['admin'], dashboard, iterations, recorder, -1)))
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder, time.perf_counter() - start
+
+
+def report(recorder, elapsed):
+    total = sum(len(samples) for samples in recorder.samples.values())
+    print(f'{"Bước":<22}{"Số req":>8}{"Lỗi":>6}{"p50":>10}{"p95":>10}{"p99":>10}')
+    for name, samples in recorder.samples.items():
+        cuts = percentiles(samples)
+        print(f'{name:<22}{len(samples):>8}{recorder.errors[name]:>6}{cuts[50]:>10.1f}{cuts[95]:>10.1f}{cuts[99]:>10.1f}')
+    print(f'\n{total} request trong {elapsed:.1f} s -> {total / elapsed:.1f} req/s, '
+          f'{sum(recorder.errors.values())} lỗi')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=8)
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--orders', type=int, default=20000)
+    args = parser.parse_args()
+
+    setup_django()
+    from benchmarks.seed import seed
+
+    with tempfile.TemporaryDirectory() as tmp_dir, isolated_settings(tmp_dir), \
+            scratch_database(path=f'{tmp_dir}/load.sqlite3'):
+        data = seed(users=max(args.users, 50), orders=args.orders, consultations=args.orders // 4,
+                    messages=args.orders, rebuild=True)
+        recorder, elapsed = run(data, args.users, args.iterations)
+    report(recorder, elapsed)
+
+
+if __name__ == '__main__':
+    main()
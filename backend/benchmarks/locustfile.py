@@ -0,0 +1,66 @@
+"""
+Cùng kịch bản với benchmarks.load nhưng bắn vào server thật (staging), cần `pip install locust`:
+
+    cd backend && locust -f benchmarks/locustfile.py --host http://127.0.0.1:8000
+
+Tài khoản lấy từ dữ liệu seed (khach0.., quantri; mật khẩu benchmarks.seed.PASSWORD).
+"""
+import itertools
+import random
+
+from locust import HttpUser, between, task
+
+from benchmarks.scenario import dashboard, shop
+from benchmarks.seed import PASSWORD
+
+customer_numbers = itertools.count()
+
+
+class LocustSession:
+    def __init__(self, client, token):
+        self.client = client
+        self.headers = {'Authorization': f'Bearer {token}'}
+
+    def get(self, name, path):
+        response = self.client.get(path, name=name, headers=self.headers)
+        return response.json() if response.ok else None
+
+    def post(self, name, path, data):
+        response = self.client.post(path, json=data, name=name, headers=self.headers)
+        return response.json() if response.ok else None
+
+
+class ApiUser(HttpUser):
+    abstract = True
+    username = None
+
+    def on_start(self):
+        response = self.client.post('/api/login/', json={'username': self.get_username(), 'password': PASSWORD},
+                                    name='Đăng nhập')
+        self.session = LocustSession(self.client, response.json()['access'])
+        self.rng = random.Random()
+
+    def get_username(self):
+        return self.username
+
+
+class Customer(ApiUser):
+    weight = 10
+    wait_time = between(0.5, 2)
+
+    def get_username(self):
+        return f'khach{next(customer_numbers) % 200}'
+
+    @task
+    def browse_and_buy(self):
+        shop(self.session, self.rng)
+
+
+class Admin(ApiUser):
+    weight = 1
+    wait_time = between(2, 5)
+    username = 'quantri'
+
+    @task
+    def view_dashboard(self):
+        dashboard(self.session, self.rng)
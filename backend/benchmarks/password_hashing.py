@@ -0,0 +1,95 @@
+"""
+So sánh chi phí băm mật khẩu + số lượt đăng nhập / giây / core trước (PBKDF2 mặc định của Django)
+và sau (scrypt trong pool, api/passwords.py).
+
+    cd backend && python -m benchmarks.password_hashing [--repeat 20] [--concurrency 8]
+
+- Hasher: thời gian median 1 lần kiểm tra mật khẩu (= CPU 1 lượt đăng nhập) -> lượt / giây / core.
+- /api/login/: gọi tuần tự qua test client (1 thread = 1 core), rồi `--concurrency` thread cùng lúc
+  để thấy pool PASSWORD_HASH_WORKERS giới hạn số core bị chiếm.
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.utils import scratch_database, setup_django, timed
+
+PASSWORD = 'Matkhau123.'
+HASHERS = [
+    ('Trước: PBKDF2', 'django.contrib.auth.hashers.PBKDF2PasswordHasher'),
+    ('Sau: scrypt', 'api.passwords.ConfigurableScryptPasswordHasher'),
+    ('Argon2 (nếu có argon2-cffi)', 'django.contrib.auth.hashers.Argon2PasswordHasher'),
+]
+
+
+def hasher_available(path):
+    from django.utils.module_loading import import_string
+
+    hasher = import_string(path)()
+    try:
+        hasher.encode(PASSWORD, hasher.salt())
+    except ValueError:  # Thiếu thư viện (argon2-cffi)
+        return False
+    return True
+
+
+def measure_hasher(path, repeat):
+    from django.contrib.auth.hashers import check_password
+    from django.utils.module_loading import import_string
+
+    hasher = import_string(path)()
+    encoded = hasher.encode(PASSWORD, hasher.salt())
+    return timed(lambda: check_password(PASSWORD, encoded, preferred=hasher), repeat)
+
+
+def measure_login(path, repeat, concurrency):
+    from django.test import override_settings
+    from rest_framework.test import APIClient
+
+    from api.models import User
+    from api.throttling import get_store
+
+    rates = {'anon': '1000000/min', 'user': '1000000/min', 'login': '1000000/min'}
+    with override_settings(PASSWORD_HASHERS=[path], REST_FRAMEWORK={'DEFAULT_THROTTLE_RATES': rates}):
+        get_store().clear()
+        User.objects.filter(username='bench').delete()
+        User.objects.create_user(username='bench', password=PASSWORD)
+
+        def login():
+            response = APIClient().post('/api/login/', {'username': 'bench', 'password': PASSWORD})
+            assert response.status_code == 200, response.content
+
+        sequential = timed(login, repeat)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            list(pool.map(lambda _: login(), range(repeat)))
+        concurrent = repeat / (time.perf_counter() - start)
+    return sequential, concurrent
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=8)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+
+    print(f'{os.cpu_count()} core, PASSWORD_HASH_WORKERS = {settings.PASSWORD_HASH_WORKERS}\n')
+    print(f'{"Hasher":<30}{"Kiểm tra (ms)":>15}{"Lượt/s/core":>14}')
+    available = [(label, path) for label, path in HASHERS if hasher_available(path)]
+    for label, path in available:
+        ms = measure_hasher(path, args.repeat)
+        print(f'{label:<30}{ms:>15.1f}{1000 / ms:>14.1f}')
+
+    with scratch_database():
+        print(f'\n{"/api/login/":<30}{"Tuần tự (ms)":>15}{"Lượt/s/core":>14}{f"Lượt/s x{args.concurrency}":>16}')
+        for label, path in available:
+            ms, throughput = measure_login(path, args.repeat, args.concurrency)
+            print(f'{label:<30}{ms:>15.1f}{1000 / ms:>14.1f}{throughput:>16.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+So sánh query plan + thời gian của các truy vấn chính trước/sau migration 0005 (index ghép).
+
+    cd backend && python -m benchmarks.query_plans [--orders 50000]
+
+"Trước" = schema cũ (chỉ có index đơn trên FK), "Sau" = index trong Meta.indexes.
+"""
+import argparse
+
+from benchmarks.utils import scratch_database, setup_django, timed
+
+
+def patterns(data):
+    from api.models import ChatMessage, ConsultationRequest, Order, Product
+
+    user = data['customers'][0]
+    staff = data['staff'][0]
+    consultation = data['consultations'][0]
+    return [
+        ('Order lọc theo status', lambda: Order.objects.filter(status='pending').order_by('-created_at')[:20]),
+        ('Order của 1 user', lambda: Order.objects.filter(user=user).order_by('-created_at')[:20]),
+        ('Sản phẩm nổi bật', lambda: Product.objects.filter(is_featured=True).order_by('-created_at', '-id')),
+        ('Tư vấn của staff theo status', lambda: ConsultationRequest.objects.filter(assigned_staff=staff, status='new')),
+        ('Chat của 1 tư vấn', lambda: ChatMessage.objects.filter(consultation=consultation).order_by('timestamp')),
+    ]
+
+
+def baseline_indexes():
+    """Index của schema cũ: 1 index đơn trên mỗi FK (đã bỏ ở 0005)"""
+    from django.db import models
+
+    from api.models import ChatMessage, ConsultationRequest, Order
+
+    return [
+        (Order, models.Index(fields=['user'], name='bench_order_user')),
+        (ConsultationRequest, models.Index(fields=['assigned_staff'], name='bench_consult_staff')),
+        (ChatMessage, models.Index(fields=['consultation'], name='bench_chat_consult')),
+    ]
+
+
+def query_indexes():
+    from api.models import ChatMessage, ConsultationRequest, Order, Product
+
+    return [(model, index) for model in [Order, Product, ConsultationRequest, ChatMessage] for index in model._meta.indexes]
+
+
+def measure(queries, repeat):
+    results = []
+    for label, build in queries:
+        plan = build().explain().replace('\n', ' | ')
+        results.append((label, plan, timed(lambda: list(build()), repeat)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=30)
+    args = parser.parse_args()
+
+    setup_django()
+    from benchmarks.seed import seed
+
+    with scratch_database() as connection:
+        data = seed(orders=args.orders, consultations=args.orders // 4, messages=args.orders)
+        queries = patterns(data)
+
+        with connection.schema_editor() as editor:
+            for model, index in query_indexes():
+                editor.remove_index(model, index)
+            for model, index in baseline_indexes():
+                editor.add_index(model, index)
+        before = measure(queries, args.repeat)
+
+        with connection.schema_editor() as editor:
+            for model, index in baseline_indexes():
+                editor.remove_index(model, index)
+            for model, index in query_indexes():
+                editor.add_index(model, index)
+        after = measure(queries, args.repeat)
+
+    for (label, plan_before, ms_before), (_, plan_after, ms_after) in zip(before, after):
+        print(f'== {label}: {ms_before:.2f} ms -> {ms_after:.2f} ms')
+        print(f'   trước: {plan_before}')
+        print(f'   sau:   {plan_after}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,32 @@
+"""
+Kịch bản tải: khách xem catalog -> thêm giỏ -> mua ngay, admin xem dashboard.
+
+Dùng chung cho benchmarks.load (test client, SQLite local) và benchmarks/locustfile.py (server thật):
+`session` chỉ cần get(name, path) / post(name, path, data) trả JSON (None nếu lỗi).
+"""
+BROWSE_LIMIT = 20
+
+
+def browse(session, rng):
+    """Danh sách sản phẩm -> 1 sản phẩm -> trả 1 gói để mua"""
+    page = session.get('Danh sách sản phẩm', f'/api/products/?limit={BROWSE_LIMIT}&offset={rng.randrange(0, 60, 20)}')
+    products = (page or {}).get('results') or []
+    if not products:
+        return None
+    product = session.get('Chi tiết sản phẩm', f'/api/products/{rng.choice(products)["id"]}/')
+    packages = (product or {}).get('packages') or []
+    return rng.choice(packages)['id'] if packages else None
+
+
+def shop(session, rng):
+    session.get('Danh mục', '/api/categories/')
+    package_id = browse(session, rng)
+    if package_id is None:
+        return
+    session.post('Thêm giỏ', '/api/cart/add/', {'package_id': package_id, 'quantity': 1})
+    session.get('Xem giỏ', '/api/cart/')
+    session.post('Mua ngay', '/api/orders/buy_now/', {'package_id': package_id, 'quantity': 1})
+
+
+def dashboard(session, rng):
+    session.get('Dashboard', '/api/dashboard/summary/')
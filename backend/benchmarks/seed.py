@@ -0,0 +1,103 @@
+"""
+Sinh dữ liệu giả lập bằng bulk_create (nhanh, bỏ qua signal -> rebuild=True để tính lại bảng tổng hợp).
+
+Import Django bên trong seed(): benchmarks/locustfile.py (không setup Django) vẫn đọc được PASSWORD.
+"""
+import random
+from datetime import timedelta
+
+SPECIALIZATIONS = ['health', 'vehicle', 'property', 'marine']
+STATUSES = ['pending', 'confirmed', 'active', 'expired', 'cancelled']
+PASSWORD = 'Matkhau123.'
+
+
+def seed(users=200, staff=8, products=100, orders=20000, consultations=5000, messages=20000, news=20,
+         seed_value=2026, rebuild=False):
+    from django.contrib.auth.hashers import make_password
+    from django.utils import timezone
+
+    from api.models import (
+        Category, ChatMessage, ConsultationRequest, News, Order, OrderItem, Product, ProductPackage, User
+    )
+
+    rng = random.Random(seed_value)
+    password = make_password(PASSWORD)
+    now = timezone.now()
+
+    categories = Category.objects.bulk_create([
+        Category(name=code.title(), slug=code, specialization_code=code) for code in SPECIALIZATIONS
+    ])
+    admin = User.objects.create(
+        username='quantri', password=password, role='admin', email='quantri@tisbroker.com', is_staff=True
+    )
+    customers = User.objects.bulk_create([
+        User(username=f'khach{i}', password=password, role='customer', user_type=rng.choice(['individual', 'enterprise']))
+        for i in range(users)
+    ])
+    staff_members = User.objects.bulk_create([
+        User(username=f'nhanvien{i}', password=password, role='staff', email=f'nhanvien{i}@tisbroker.com',
+             specialization=SPECIALIZATIONS[i % len(SPECIALIZATIONS)])
+        for i in range(staff)
+    ])
+    product_rows = Product.objects.bulk_create([
+        Product(category=rng.choice(categories), name=f'Sản phẩm {i}', provider_name='TIS', description='...',
+                is_featured=rng.random() < 0.05, target_audience=rng.choice(['ind', 'ent']))
+        for i in range(products)
+    ])
+    packages = ProductPackage.objects.bulk_create([
+        ProductPackage(product=product, duration_label=label, price=price, duration_days=days)
+        for product in product_rows
+        for label, price, days in [('6 Tháng', 600000, 180), ('1 Năm', 1000000, 365)]
+    ])
+    News.objects.bulk_create([
+        News(title=f'Tin {i}', image=f'news/{i}.jpg', content='...') for i in range(news)
+    ])
+
+    order_rows, item_rows = [], []
+    for i in range(orders):
+        package, quantity = rng.choice(packages), rng.randint(1, 3)
+        start, status = now - timedelta(days=rng.randint(0, 400)), rng.choice(STATUSES)
+        # Hiệu lực chỉ có từ khi đơn được xác nhận
+        window = {} if status in ('pending', 'cancelled') else {
+            'coverage_start': start, 'coverage_end': start + timedelta(days=package.duration_days),
+        }
+        order_rows.append(Order(
+            code=f'SEED-{i}', user=rng.choice(customers), status=status,
+            total_amount=package.price * quantity, **window,
+        ))
+        item_rows.append((package, quantity))
+    order_rows = Order.objects.bulk_create(order_rows, batch_size=2000)
+    OrderItem.objects.bulk_create([
+        OrderItem(order=order, package=package, quantity=quantity, unit_price=package.price)
+        for order, (package, quantity) in zip(order_rows, item_rows)
+    ], batch_size=2000)
+
+    consultation_rows = ConsultationRequest.objects.bulk_create([
+        ConsultationRequest(customer_name=f'KH {i}', customer_contact='0900000000', product=rng.choice(product_rows),
+                            user=rng.choice(customers), assigned_staff=rng.choice(staff_members),
+                            status=rng.choice(['new', 'in_progress', 'closed']))
+        for i in range(consultations)
+    ], batch_size=2000)
+    ChatMessage.objects.bulk_create([
+        ChatMessage(consultation=rng.choice(consultation_rows), sender=rng.choice(customers), message=f'Tin nhắn {i}')
+        for i in range(messages)
+    ], batch_size=2000)
+
+    if rebuild:
+        # Dashboard, analytics, tìm kiếm đọc bảng tổng hợp -> tính lại như sau khi import dữ liệu thật
+        from api.analytics import rebuild_sales_buckets
+        from api.metrics import rebuild_order_metrics
+        from api.search import reindex_all
+
+        rebuild_order_metrics()
+        rebuild_sales_buckets()
+        reindex_all()
+    return {
+        'admin': admin,
+        'categories': categories,
+        'customers': customers,
+        'staff': staff_members,
+        'products': product_rows,
+        'packages': packages,
+        'consultations': consultation_rows,
+    }
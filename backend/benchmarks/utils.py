@@ -0,0 +1,86 @@
+"""Khởi tạo Django + DB tạm cho các script benchmark (không đụng tới db.sqlite3)"""
+import os
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_django():
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'insurance_project.settings')
+    import django
+    django.setup()
+
+
+@contextmanager
+def scratch_database(path=None):
+    """
+    Tạo DB test (SQLite in-memory như test runner), chạy migrate, hủy khi xong.
+    `path`: dùng file SQLite (WAL) thay vì in-memory -> nhiều thread ghi đồng thời được (benchmarks.load).
+    """
+    from django.conf import settings
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    if path:
+        database = settings.DATABASES[connection.alias]
+        database.setdefault('TEST', {})['NAME'] = path
+        # Kết nối của thread khác đọc lại dict này; IMMEDIATE: transaction ghi xếp hàng thay vì lỗi "locked"
+        database['OPTIONS'] = {
+            **database.get('OPTIONS', {}),
+            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=OFF;',
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 30,
+        }
+        connection.settings_dict.update({'TEST': database['TEST'], 'OPTIONS': database['OPTIONS']})
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+@contextmanager
+def isolated_settings(tmp_dir):
+    """
+    Cache locmem + store throttle tạm (không ghi vào .cache của máy dev), throttle rộng
+    (vẫn chạy qua store như production nhưng không chặn benchmark).
+    """
+    from django.conf import settings
+    from django.test import override_settings
+
+    rates = {scope: '1000000/min' for scope in settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']}
+    with override_settings(
+        CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'bench-default'},
+            'catalog': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'bench-catalog'},
+            'auth': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'bench-auth'},
+        },
+        THROTTLE_STORE_PATH=os.path.join(tmp_dir, 'throttle.sqlite3'),
+        REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates},
+    ):
+        yield
+
+
+def percentiles(samples, points=(50, 95, 99)):
+    """{50: ms, 95: ms, 99: ms} (nội suy, như locust)"""
+    if len(samples) < 2:
+        return {point: samples[0] if samples else 0.0 for point in points}
+    cuts = statistics.quantiles(samples, n=100, method='inclusive')
+    return {point: cuts[point - 1] for point in points}
+
+
+def timed(func, repeat=50):
+    """Trả về thời gian median (ms) của `repeat` lần gọi"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
@@ -2,6 +2,7 @@
 ASGI config for insurance_project project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP đi vào Django, WebSocket (/ws/consultations/<id>/) đi vào chat tư vấn (api/chat.py).
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -13,4 +14,13 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'insurance_project.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Import sau get_asgi_application(): api.chat cần app registry đã sẵn sàng
+from api.chat import websocket_application  # noqa: E402
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'websocket':
+        return await websocket_application(scope, receive, send)
+    return await django_application(scope, receive, send)
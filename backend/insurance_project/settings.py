@@ -45,7 +45,6 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     # Third party
     'rest_framework',
-    'rest_framework.authtoken',
     'drf_yasg',
     'corsheaders',
     'django_filters',
@@ -55,6 +54,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware', # Đặt đầu tiên
+    'api.instrumentation.InstrumentationMiddleware',  # Thời gian, số query, N+1 theo view -> /api/metrics/
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -72,19 +72,31 @@ CORS_ALLOW_ALL_ORIGINS = True # Dev only
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # JWTAuthentication + cache User (api/authentication.py): không query DB mỗi request
+        'api.authentication.CachedJWTAuthentication',
     ),
     # --- THÊM PHẦN NÀY ---
+    # Token bucket dùng chung giữa các worker (api/throttling.py), không dùng cache mặc định
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.AnonRateThrottle', # Khách vãng lai
-        'rest_framework.throttling.UserRateThrottle'  # User đã đăng nhập
+        'api.throttling.SharedAnonRateThrottle', # Khách vãng lai
+        'api.throttling.SharedUserRateThrottle'  # User đã đăng nhập
     ],
     'DEFAULT_THROTTLE_RATES': {
         'anon': '100/day',   # Khách chỉ được gọi 100 lần/ngày
         'user': '1000/day',  # User được gọi 1000 lần/ngày
-    }
+        # Scope riêng theo endpoint
+        'catalog': '120/min',      # Sản phẩm, danh mục, tin tức (thay cho anon/user)
+        'login': '10/min',         # Chống dò mật khẩu, theo IP
+        'buy_now': '20/min',       # buy_now + checkout
+        'consultation': '10/hour', # Gửi yêu cầu tư vấn
+        'chat': '120/min',         # Long-poll + gửi tin chat tư vấn
+    },
+    # Phân trang: mặc định limit/offset, bảng append (Order, tư vấn, chat) dùng cursor
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.CatalogPagination',
 }
 
+API_MAX_PAGE_SIZE = 100  # Giới hạn cứng số dòng / trang
+
 
 
 # settings.py
@@ -131,6 +143,61 @@ DATABASES = {
 }
 
 
+# Cache
+# 'catalog' và 'auth' phải dùng chung giữa các worker (version counter + payload catalog;
+# User đã xác thực + jti đã thu hồi: lưu / đăng xuất ở worker này, worker khác phải thấy ngay).
+# File chỉ dùng chung trên 1 máy -> production nên trỏ sang Redis/Memcached.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'catalog': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / '.cache' / 'catalog',
+    },
+    'auth': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / '.cache' / 'auth',
+    },
+}
+
+THROTTLE_STORE_PATH = BASE_DIR / '.cache' / 'throttle.sqlite3'  # File chung cho mọi worker trên máy
+
+# Test: cache file + store SQLite ở trên nằm trong thư mục tạm (không xóa .cache của máy dev)
+TEST_RUNNER = 'api.test_runner.IsolatedStoresTestRunner'
+
+# Chat tư vấn qua WebSocket (api/chat.py, chạy bằng ASGI server: uvicorn/daphne)
+CHAT_CHANNEL_LAYER = 'api.chat.InMemoryChannelLayer'  # 1 process; nhiều process cần layer dùng chung
+CHAT_BATCH_SIZE = 50         # Số tin tối đa / lần bulk_create
+CHAT_FLUSH_INTERVAL = 0.05   # Giây chờ gom tin trước khi lưu
+CHAT_MAX_MESSAGE_LENGTH = 4000  # Ký tự / tin (WebSocket và POST /consultations/<id>/messages/)
+CHAT_LONG_POLL_MAX_WAIT = 25  # Giây tối đa giữ request long-poll (/consultations/<id>/messages/?wait=)
+CHAT_LONG_POLL_RECHECK = 10   # Giây; long-poll (dự phòng) đọc lại DB để thấy tin từ process khác
+
+ROSTER_CHUNK_SIZE = 1000  # Số dòng kiểm tra trùng / lần khi import danh sách nhân viên
+ROSTER_BATCH_SIZE = 500   # Số dòng / câu INSERT (bulk_create)
+
+IMAGE_VARIANT_WIDTHS = (320, 640, 1280)  # Chiều rộng ảnh thu nhỏ (srcset)
+IMAGE_WORKERS = 2                # Thread xử lý ảnh nền / process
+IMAGE_PROCESSING_SYNC = False    # True: xử lý ngay trong on_commit (test)
+
+STAFF_LOAD_INDEX_TTL = 60  # Giây; nạp lại số tư vấn mở của staff từ DB (đồng bộ giữa các worker)
+
+# Đo request (api/instrumentation.py)
+INSTRUMENTATION_ENABLED = True
+INSTRUMENTATION_STORE_PATH = BASE_DIR / '.cache' / 'metrics.sqlite3'  # Gộp số liệu các worker trên máy
+INSTRUMENTATION_FLUSH_INTERVAL = 10        # Giây giữa 2 lần ghi số liệu của 1 process vào store
+INSTRUMENTATION_QUERY_SAMPLE_RATE = 0.1    # Tỉ lệ request được đếm / gom SQL (mọi request vẫn đo thời gian)
+INSTRUMENTATION_SLOW_REQUEST_MS = 1000     # Chậm hơn -> log 'api.slow_requests'
+INSTRUMENTATION_EXPLAIN_SAMPLE_RATE = 0.1  # Tỉ lệ request chậm được EXPLAIN câu SQL chậm nhất
+INSTRUMENTATION_DUPLICATE_THRESHOLD = 5    # 1 câu SQL lặp từ ngần này lần / request -> cảnh báo N+1
+METRICS_TOKEN = None  # Prometheus gửi header X-Metrics-Token (ngoài admin đăng nhập)
+
+CATALOG_CACHE_ALIAS = 'catalog'
+CATALOG_CACHE_TIMEOUT = 60 * 60  # 1 giờ, invalidate bằng signal khi admin sửa
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -150,6 +217,23 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Mật khẩu: hasher đầu tiên băm mật khẩu mới, các hasher sau chỉ để kiểm tra hash cũ
+# (đăng nhập đúng -> tự băm lại bằng hasher đầu tiên). Có argon2-cffi thì có thể đưa Argon2 lên đầu.
+# ModelBackend + aauthenticate băm mật khẩu trong pool (LoginView async)
+AUTHENTICATION_BACKENDS = ['api.passwords.PooledModelBackend']
+
+PASSWORD_HASHERS = [
+    'api.passwords.ConfigurableScryptPasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',  # Hash cũ trong DB
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+PASSWORD_SCRYPT_WORK_FACTOR = 2**14  # N; tăng dần theo phần cứng (hash cũ tự nâng cấp khi đăng nhập)
+PASSWORD_SCRYPT_BLOCK_SIZE = 8
+PASSWORD_SCRYPT_PARALLELISM = 1
+PASSWORD_HASH_WORKERS = 2  # Thread băm mật khẩu / process, ~ số core dành cho đăng nhập
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -163,6 +247,27 @@ USE_TZ = True
 
 
 STATIC_URL = 'static/'
+STATIC_ROOT = BASE_DIR / 'staticfiles'  # collectstatic
+
+# File upload (ảnh sản phẩm, tin tức, avatar) tách khỏi thư mục code
+MEDIA_URL = '/media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
+STORAGES = {
+    # Tên file kèm hash nội dung -> URL bất biến, cache vĩnh viễn (api/storage.py)
+    'default': {'BACKEND': 'api.storage.HashedMediaStorage'},
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+        else 'django.contrib.staticfiles.storage.ManifestStaticFilesStorage',
+    },
+}
+
+# None: Django tự gửi file (hỗ trợ Range); 'x-accel': nginx (X-Accel-Redirect); 'x-sendfile': Apache/lighttpd
+MEDIA_SENDFILE = None
+MEDIA_ACCEL_PREFIX = '/protected-media/'    # location internal trỏ tới MEDIA_ROOT
+STATIC_ACCEL_PREFIX = '/protected-static/'  # location internal trỏ tới STATIC_ROOT
+MEDIA_UNHASHED_MAX_AGE = 24 * 60 * 60       # File cũ không có hash trong tên
+SERVE_STATIC = not DEBUG                    # Tắt nếu web server phục vụ STATIC_ROOT trực tiếp
 
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -180,5 +285,13 @@ SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=10),  # Token chính sống 10 phút
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),     # Token dự phòng sống 1 ngày
     'ROTATE_REFRESH_TOKENS': True,
-    'BLACKLIST_AFTER_ROTATION': True,
-}
\ No newline at end of file
+    'BLACKLIST_AFTER_ROTATION': True,  # Lưu jti cũ vào RevokedToken (api/tokens.py), không dùng app token_blacklist
+    'TOKEN_REFRESH_SERIALIZER': 'api.authentication.RotatingTokenRefreshSerializer',
+    # Thêm role / specialization / user_type vào token
+    'TOKEN_OBTAIN_SERIALIZER': 'api.authentication.ClaimsTokenObtainPairSerializer',
+}
+
+AUTH_USER_CACHE_ALIAS = 'auth'     # Phải là cache dùng chung giữa các worker (xóa khi lưu User)
+AUTH_USER_CACHE_TTL = 5             # Giây, cache User trong process (L1): process khác thấy User đổi chậm tối đa chừng này
+AUTH_USER_SHARED_CACHE_TTL = 60     # Giây, cache User dùng chung (L2); phòng UPDATE hàng loạt không qua signal
+REVOKED_TOKEN_NEGATIVE_TTL = 60     # Giây, cache kết quả "jti chưa bị thu hồi"
\ No newline at end of file